@@ -2,32 +2,238 @@
 '''
 
 import os
+import json
+import shutil
+import argparse
 import numpy as np
-from torch.utils.data import Dataset
+from torch.utils.data import Dataset, IterableDataset, DataLoader, BatchSampler, RandomSampler, SequentialSampler, get_worker_info
+from default import Default
 
 
 class QuantumSensingDataset(Dataset):
+    '''A split of the QML data (e.g. qml-data/16x16.8.two/level-0-set-0/train), in one of the two layouts:
+           packed    -- header.json, phase.npy (N, n_sensor), label.npy (N,) or (N, 2), loc.npy (N, 2) optional. The arrays are memory mapped
+           directory -- phase/{i}.npy, label/{i}.npy, loc/{i}.npy (optional), one file per sample. See convert()
+       A packed dataset also accepts a list (or array, slice) of indices and returns the whole batch, see dataloader()
+    '''
+    header_file = 'header.json'
+    names = ['phase', 'label', 'loc']
+
     def __init__(self, root_dir: str):
         self.root_dir = root_dir
         self.phase_dir = os.path.join(root_dir, 'phase')
         self.label_dir = os.path.join(root_dir, 'label')
         self.loc_dir   = os.path.join(root_dir, 'loc')
+        self.arrays = None
+        if os.path.exists(os.path.join(root_dir, QuantumSensingDataset.header_file)):
+            with open(os.path.join(root_dir, QuantumSensingDataset.header_file), 'r') as f:
+                header = json.load(f)
+            self.arrays = {name: np.load(os.path.join(root_dir, f'{name}.npy'), mmap_mode='r') for name in header['arrays']}
+            self.length = header['length']
+            return
         if len(os.listdir(self.phase_dir)) != len(os.listdir(self.label_dir)):
             raise Exception('phase and label number are not equal')
         self.length = len(os.listdir(self.phase_dir))
-    
+        self.has_loc = os.path.exists(self.loc_dir)
+
+    @property
+    def packed(self) -> bool:
+        return self.arrays is not None
+
     def __len__(self):
         return self.length
 
     def __getitem__(self, idx):
+        if self.packed:
+            index = idx if isinstance(idx, slice) else np.asarray(idx)
+            phase = np.array(self.arrays['phase'][index])
+            label = np.array(self.arrays['label'][index])
+            if 'loc' in self.arrays:
+                loc = np.array(self.arrays['loc'][index])
+            else:
+                loc = np.full(phase.shape[:-1] + (1,), -1)
+            return {'phase': phase, 'label': label, 'loc': loc}
         phase_path = os.path.join(self.phase_dir, f'{idx}.npy')
         label_path = os.path.join(self.label_dir, f'{idx}.npy')
         loc_path   = os.path.join(self.loc_dir,   f'{idx}.npy')
         phase = np.load(phase_path)
         label = np.load(label_path)
-        if os.path.exists(loc_path):
+        if self.has_loc:
             loc = np.load(loc_path)
         else:
             loc = np.array([-1])
         sample = {'phase': phase, 'label': label, 'loc': loc}
         return sample
+
+    def dataloader(self, batch_size: int, shuffle: bool, num_workers: int = 0) -> DataLoader:
+        '''the DataLoader of the dataset. A packed dataset is read a whole batch at a time instead of sample by sample
+        '''
+        if not self.packed:
+            return DataLoader(self, batch_size=batch_size, shuffle=shuffle, num_workers=num_workers)
+        sampler = RandomSampler(self) if shuffle else SequentialSampler(self)
+        return DataLoader(self, sampler=BatchSampler(sampler, batch_size=batch_size, drop_last=False), batch_size=None,
+                          num_workers=num_workers)
+
+    @staticmethod
+    def save(root_dir: str, phase: np.array, label: np.array, loc: np.array = None):
+        '''save a split in the packed layout
+        Args:
+            root_dir -- the directory of the split, e.g. qml-data/16x16.8.two/level-0-set-0/train
+            phase    -- shape (N, n_sensor), the phase shifts
+            label    -- shape (N,) the cell index, or (N, 2) the normalized location
+            loc      -- shape (N, 2), the tx location. Optional
+        '''
+        arrays = {'phase': np.asarray(phase, dtype=np.float32), 'label': np.asarray(label), 'loc': loc}
+        if arrays['label'].dtype.kind == 'f':
+            arrays['label'] = arrays['label'].astype(np.float32)
+        else:
+            arrays['label'] = arrays['label'].astype(np.int64)
+        if loc is None:
+            del arrays['loc']
+        else:
+            arrays['loc'] = np.asarray(loc, dtype=np.float32)
+        length = len(arrays['phase'])
+        for name, array in arrays.items():
+            if len(array) != length:
+                raise Exception(f'{name} has {len(array)} samples, phase has {length}')
+        os.makedirs(root_dir, exist_ok=True)
+        for name, array in arrays.items():
+            np.save(os.path.join(root_dir, f'{name}.npy'), np.ascontiguousarray(array))
+        header = {'length': length, 'arrays': list(arrays.keys()),
+                  'shapes': {name: list(array.shape[1:]) for name, array in arrays.items()},
+                  'dtypes': {name: array.dtype.str for name, array in arrays.items()}}
+        with open(os.path.join(root_dir, QuantumSensingDataset.header_file), 'w') as f:   # the header is the last
+            json.dump(header, f)
+
+    @staticmethod
+    def convert(root_dir: str, remove: bool = False):
+        '''convert a split from the directory layout (one file per sample) to the packed layout
+        Args:
+            root_dir -- the directory of the split, which has the phase and label subdirectories
+            remove   -- whether to remove the subdirectories after the conversion
+        '''
+        dataset = QuantumSensingDataset(root_dir)
+        if dataset.packed:
+            return
+        samples = [dataset[i] for i in range(len(dataset))]
+        loc = np.stack([sample['loc'] for sample in samples]) if dataset.has_loc else None
+        QuantumSensingDataset.save(root_dir, np.stack([sample['phase'] for sample in samples]),
+                                   np.stack([sample['label'] for sample in samples]), loc)
+        if remove:
+            for directory in [dataset.phase_dir, dataset.label_dir, dataset.loc_dir]:
+                shutil.rmtree(directory, ignore_errors=True)
+
+
+class SyntheticPhaseDataset(IterableDataset):
+    '''The QML training data generated in memory: every epoch draws new TX locations and new noisy phase shifts, nothing is saved to the disk.
+       The iterator yields batches {'phase': (B, n_sensor) float32, 'label': (B,) int64 or (B, 2) float32, 'loc': (B, 2) float32},
+       so use it with DataLoader(dataset, batch_size=None), see dataloader().
+       Discrete:   the TX is at the center of a random cell, the label is the block of the cell
+       Continuous: the TX is uniform in a random cell, at least exclusion meters away from all the sensors (see QuantumLocalization.generate_tx),
+                   the label is the location relative to the area, normalized to [0, 1]
+       Each worker of the DataLoader has its own random generator, seeded by (seed, epoch, worker id), see set_epoch().
+       If seed is None, every iteration draws a fresh seed from the OS, so the samples never repeat
+    '''
+    def __init__(self, unitary_operator, sensors: np.array, cells: np.array, labels: np.array = None, origin: tuple = (0, 0),
+                 area_length: float = 1, exclusion: float = 0, exclusion_sensors: np.array = None, cell_length: float = Default.cell_length,
+                 samples_per_epoch: int = 10_000, batch_size: int = 32, seed: int = None):
+        '''
+        Args:
+            unitary_operator  -- the UnitaryOperator that computes the phase shifts (with noise)
+            sensors           -- shape (n_sensor, 2), the coordinates of the sensors of the set
+            cells             -- shape (C, 2), the centers of the cells where the TX can be
+            labels            -- shape (C,), the label of each cell for the discrete case. None for the continuous case
+            origin            -- the top left corner of the area, for the continuous label
+            area_length       -- the length of the area, for the continuous label
+            exclusion         -- the minimum distance (meters) between a continuous TX and all the sensors in exclusion_sensors
+            exclusion_sensors -- shape (M, 2), default is sensors
+            cell_length       -- the length of a grid cell in meters
+            samples_per_epoch -- the number of samples of an epoch (over all the workers)
+            batch_size        -- the number of samples of a batch
+            seed              -- the seed of the random generators
+        '''
+        self.unitary_operator = unitary_operator
+        self.sensors = np.asarray(sensors, dtype=float).reshape(-1, 2)
+        self.cells = np.asarray(cells, dtype=float).reshape(-1, 2)
+        self.labels = None if labels is None else np.asarray(labels, dtype=np.int64)
+        self.origin = np.asarray(origin, dtype=float)
+        self.area_length = area_length
+        self.exclusion = exclusion
+        self.exclusion_sensors = self.sensors if exclusion_sensors is None else np.asarray(exclusion_sensors, dtype=float).reshape(-1, 2)
+        self.cell_length = cell_length
+        self.samples_per_epoch = samples_per_epoch
+        self.batch_size = batch_size
+        self.seed = seed
+        self.epoch = 0
+
+    @property
+    def continuous(self) -> bool:
+        return self.labels is None
+
+    def set_epoch(self, epoch: int):
+        '''with a seed, the samples of an epoch only depend on (seed, epoch). Call it before iterating each epoch
+        '''
+        self.epoch = epoch
+
+    def __len__(self):
+        '''the number of batches of an epoch (if not split among the workers)
+        '''
+        return -(-self.samples_per_epoch // self.batch_size)
+
+    def sample_txs(self, cells: np.array, rng: np.random.Generator) -> np.array:
+        '''uniform TX locations inside the cells, redrawing the ones that are closer than self.exclusion to a sensor
+        Args:
+            cells -- shape (B, 2), the centers of the cells
+        Return:
+            np.array -- shape (B, 2)
+        '''
+        txs = cells + rng.uniform(-0.5, 0.5, size=cells.shape)
+        while True:
+            distances = self.cell_length * np.sqrt(((txs[:, np.newaxis, :] - self.exclusion_sensors[np.newaxis, :, :]) ** 2).sum(axis=2))
+            inside = np.any(distances < self.exclusion, axis=1)
+            if not np.any(inside):
+                return txs
+            txs[inside] = cells[inside] + rng.uniform(-0.5, 0.5, size=(int(inside.sum()), 2))
+
+    def batch(self, size: int, rng: np.random.Generator) -> dict:
+        '''generate a batch of samples
+        '''
+        index = rng.integers(len(self.cells), size=size)
+        cells = self.cells[index]
+        txs = self.sample_txs(cells, rng) if self.continuous else cells
+        distances = self.cell_length * np.sqrt(((txs[:, np.newaxis, :] - self.sensors[np.newaxis, :, :]) ** 2).sum(axis=2))
+        phases, _ = self.unitary_operator.compute_H_batch(distances, noise=True, rng=rng)
+        if self.continuous:
+            label = ((txs - self.origin) / self.area_length).astype(np.float32)
+        else:
+            label = self.labels[index]
+        return {'phase': phases.astype(np.float32), 'label': label, 'loc': txs.astype(np.float32)}
+
+    def __iter__(self):
+        worker = get_worker_info()
+        worker_id, num_workers = (0, 1) if worker is None else (worker.id, worker.num_workers)
+        entropy = None if self.seed is None else [self.seed, self.epoch, worker_id]
+        rng = np.random.default_rng(np.random.SeedSequence(entropy))
+        # the batches of an epoch are split among the workers
+        num_batches = len(self)
+        for i in range(worker_id, num_batches, num_workers):
+            size = min(self.batch_size, self.samples_per_epoch - i * self.batch_size)
+            yield self.batch(size, rng)
+
+    def dataloader(self, num_workers: int = 0) -> DataLoader:
+        '''the DataLoader of the batches. The workers are not persistent, so that every epoch they get the epoch of set_epoch()
+        '''
+        return DataLoader(self, batch_size=None, num_workers=num_workers)
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Convert the QML datasets from one file per sample to the packed layout')
+    parser.add_argument('-rd', '--root_dir', type=str, nargs=1, default=['qml-data'], help='the directory of the datasets, searched recursively')
+    parser.add_argument('-rm', '--remove', action='store_true', default=False, help='remove the per sample files after the conversion')
+    args = parser.parse_args()
+    for dirpath, dirnames, _ in os.walk(args.root_dir[0]):
+        if 'phase' in dirnames and 'label' in dirnames:
+            print(f'converting {dirpath}')
+            QuantumSensingDataset.convert(dirpath, args.remove)
+            dirnames.clear()
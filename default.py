@@ -8,6 +8,7 @@ from dataclasses import dataclass
 class Default:
     EPSILON: float       = 1e-8         # the epsilon for zero
     EPSILON_SEMIDEFINITE = 8e-4         # relaxed for semidefinate programming optimal condition checking......
+    EPSILON_RANK: float  = 1e-10        # relative eigenvalue cutoff of the pseudo-inverse in the pretty good measurement
     grid_length: int     = 4            # 4 x 4 grid
     cell_length: int     = 10           # in meters
     frequency: int       = 10**9        # 1 GHz
@@ -27,9 +28,20 @@ class Default:
     grid_length: int     = 16           # the grid's size is grid_length x grid_length
     sensor_num: int      = 4            # the number of sensors for the one level case
     repeat: int          = 1000         # repeat how many shots during the sensing protocol
+    sense_chunk: int     = 100          # the number of shots processed in one batch during the sensing protocol
+    stop_rule: str       = 'heuristic'  # the early stop rule of the sensing protocol, 'heuristic' or 'bayes'
+    stop_error: float    = 0.01         # for the 'bayes' stop rule, the target posterior probability that the most frequent outcome is wrong
+    oracle_votes: int    = 2000         # the number of sampled histograms per TX when the oracle estimates the majority vote
+    oracle_noise: int    = 200          # the number of noise draws per TX when the oracle averages the outcome probabilities
+    oracle_bytes: int    = 64 * 2**20   # the memory of the multinomial histograms the oracle samples at once
+    train_workers: int   = 1            # the number of processes that train the POVMs of the sets in parallel
+    blas_threads: int    = 1            # the number of BLAS threads in each training process
+    test_workers: int    = 1            # the number of processes that localize the testing txs in parallel
 
     output_dir: str      = 'results'    # the director of of the logged output file
     output_file: str     = 'tmp'        # the filename of the logged output file
+    povm_cache_dir: str  = 'povm-cache' # the directory of the trained POVM cache
+    povm_cache_size: int = 2 * 1024**3  # the maximum total bytes of the trained POVM cache, least recently used are evicted
 
     # below are for simulated annealing
     init_step = 0.2                 # initial step size
@@ -40,5 +52,7 @@ class Default:
 
     # below are for quantum ml
     root_dir = 'qml-data/toy'
+    model_cache_size = 64           # the maximum number of loaded QML models, the least recently used are evicted
+    synthetic_samples = 25_600      # the number of generated QML training samples per epoch, 100 per cell of a 16x16 grid
 
     DEBUG = False
@@ -43,11 +43,12 @@ class Input:
 
 @dataclass
 class Output:
-    method: str               # 'POVM-Loc One', 'POVM-Loc', 'POVM-Loc Pro', 'POVM_Loc Max'
+    method: str               # 'POVM-Loc One', 'POVM-Loc', 'POVM-Loc Pro', 'POVM_Loc Max'. The expected accuracy of the oracle is '{method}-oracle'
     correct: float            # the metric when continuous == False, either correct or incorrect
     localization_error: float # the metric when continuous == True
     pred: Tuple               # the predicted location
     elapse: float             # the time
+    shots: int = -1           # the number of sensing shots used by the localization, -1 if not applicable
 
     def __str__(self):
         return self.to_json_str()
@@ -58,11 +59,13 @@ class Output:
             'correct': self.correct,
             'localization_error': self.localization_error,
             'pred': self.pred,
-            'elapse': self.elapse
+            'elapse': self.elapse,
+            'shots': self.shots
         }
         return json.dumps(outputdict)
 
     @classmethod
     def from_json_str(cls, json_str) -> 'Output':
         outdict = json.loads(json_str)
-        return cls(outdict['method'], outdict['correct'], outdict['localization_error'], outdict['pred'], outdict['elapse'])
+        shots = outdict.get('shots', -1)
+        return cls(outdict['method'], outdict['correct'], outdict['localization_error'], outdict['pred'], outdict['elapse'], shots)
@@ -0,0 +1,77 @@
+'''
+The trained POVMs of the sets of sensors, each one is trained on its first access
+'''
+
+import threading
+from collections.abc import MutableMapping
+from typing import Callable
+
+
+class LazyPovms(MutableMapping):
+    '''A dictionary, e.g. {f'{level}-{set}': {'povm': Povm, 'tx_loc': dict}}, whose values can be registered as a function,
+       which trains (or loads from the cache) the POVM the first time the key is accessed.
+       Concurrent first accesses of the same key are deduplicated, i.e., the function is called once
+    '''
+    def __init__(self):
+        self._povms = {}         # the materialized values
+        self._factories = {}     # key --> function that returns the value
+        self._locks = {}         # key --> the lock of the first access
+        self._lock = threading.Lock()
+
+    def register(self, key: str, factory: Callable[[], dict]):
+        '''register a key whose value is factory(), called on the first access
+        '''
+        with self._lock:
+            self._povms.pop(key, None)
+            self._factories[key] = factory
+            self._locks[key] = threading.Lock()
+
+    def register_default(self, key: str, factory: Callable[[], dict]):
+        '''register a key whose value is factory(), unless the key is already registered or has a value
+        '''
+        with self._lock:
+            if key in self._povms or key in self._factories:
+                return
+            self._factories[key] = factory
+            self._locks[key] = threading.Lock()
+
+    def is_trained(self, key: str) -> bool:
+        return key in self._povms
+
+    def __getitem__(self, key: str) -> dict:
+        try:
+            return self._povms[key]
+        except KeyError:
+            pass
+        with self._lock:
+            if key not in self._factories:
+                raise KeyError(key)
+            lock = self._locks[key]
+        with lock:
+            if key not in self._povms:
+                self._povms[key] = self._factories[key]()
+        return self._povms[key]
+
+    def __setitem__(self, key: str, value: dict):
+        with self._lock:
+            self._factories.pop(key, None)
+            self._locks.pop(key, None)
+            self._povms[key] = value
+
+    def __delitem__(self, key: str):
+        with self._lock:
+            if key not in self._povms and key not in self._factories:
+                raise KeyError(key)
+            self._povms.pop(key, None)
+            self._factories.pop(key, None)
+            self._locks.pop(key, None)
+
+    def __iter__(self):
+        keys = list(self._factories) + [key for key in self._povms if key not in self._factories]
+        return iter(keys)
+
+    def __len__(self) -> int:
+        return len(self._factories) + len([key for key in self._povms if key not in self._factories])
+
+    def __contains__(self, key) -> bool:
+        return key in self._povms or key in self._factories
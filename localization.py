@@ -7,20 +7,27 @@ import numpy as np
 import json
 import torch
 import os
-import pickle
+import hashlib
+import multiprocessing
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
 import torchquantum as tq
 from typing import Tuple
-from bisect import bisect_left
-from itertools import accumulate
 from collections import Counter
+from scipy.special import betainc
 from torch.utils.data import DataLoader
 from utility import Utility
 from unitary_operator import UnitaryOperator
 from povm import Povm
-from quantum_state import QuantumState
+from quantum_state import QuantumState, StateBatch
 from default import Default
 from qnn import QuantumSensing, QuantumMLclassification
-from dataset import QuantumSensingDataset
+from dataset import QuantumSensingDataset, SyntheticPhaseDataset
+from sensor_network import SensorNetwork
+from povm_cache import PovmCache
+from lazy_povms import LazyPovms
+from model_cache import ModelCache
+from model_artifact import ModelArtifact
 
 
 
@@ -28,13 +35,31 @@ class QuantumLocalization:
     ''' Assumption 1: dividing a N x N grid into sqrt(N) row sqrt(N) column of blocks, where each block is sqrt(N) x sqrt(N)
                     So the number of tx equals sqrt(N) x sqrt(N) = N = grid_length
     '''
-    def __init__(self, grid_length: int, cell_length: int, sensordata: str, unitary_operator: UnitaryOperator):
+    def __init__(self, grid_length: int, cell_length: int, sensordata: str, unitary_operator: UnitaryOperator, povm_cache: PovmCache = None):
         self.grid_length = grid_length               # assume the grid is a square, size is (grid_len, grid_len)
         self.cell_length = cell_length               # the length of grid cell
         self.unitary_operator = unitary_operator     # the model for unitary operator
-        with open(sensordata, 'r') as f:
-            self.sensordata = json.load(f)
-        self.povms = {}                              # the trained POVMs
+        self.sensordata_file = sensordata            # the sensordata json filename
+        self.network = SensorNetwork.load(sensordata)  # the compiled sensor network
+        self._sensordata = None                      # the raw sensordata json, only loaded on request
+        self.povms = LazyPovms()                     # the trained POVMs, a set's POVM can be trained on its first access
+        self.povm_cache = povm_cache                 # the on-disk cache of the trained POVMs, None means no caching
+        self._shared_povms = LazyPovms()             # the POVM cache key --> Povm, shared by the sets with the same canonical geometry
+        self.stop_rule = Default.stop_rule           # the early stop rule of the sensing protocol, 'heuristic' or 'bayes'
+        self.stop_error = Default.stop_error         # the error target of the 'bayes' stop rule
+        self.shots = 0                               # the number of shots used by the last localization
+        self._levels = {}                            # the level results of the last localized TX, shared by povmloc and povmloc_pro
+        self.model_cache = ModelCache.shared()       # the loaded QML models
+
+
+    @property
+    def sensordata(self) -> dict:
+        '''the raw sensordata json dictionary. Prefer self.network, which does not parse the json file
+        '''
+        if self._sensordata is None:
+            with open(self.sensordata_file, 'r') as f:
+                self._sensordata = json.load(f)
+        return self._sensordata
 
 
     def get_simple_initial_state(self, num: int) -> np.array:
@@ -70,24 +95,52 @@ class QuantumLocalization:
         return False
 
 
-    def get_sensor_data(self, tx: tuple, sensors: list, noise: bool = False) -> QuantumState:
-        '''Given the Tx and sensors, return the sensing data of the sensors, i.e., a quantum state of sensors
-           Assuming a simple initial state
+    def get_distances(self, txs: list, sensors: list) -> np.array:
+        '''the pairwise distances between some tx locations and some sensors
+        Args:
+            txs -- a list of tx locations (x, y)
+            sensors -- a list of sensor index
+        Return:
+            np.array -- shape (len(txs), len(sensors))
+        '''
+        return self.network.distances(txs, sensors, self.cell_length)
+
+
+    def get_sensor_phases(self, tx: tuple, sensors: list, noise: bool = False) -> np.array:
+        '''Given the Tx and sensors, return the phase shift at each sensor
+        Args:
+            tx -- tx location
+            sensors -- a list of sensor index
+            noise -- noise or no noise
+        Return:
+            an array of phase shifts
+        '''
+        distances = self.get_distances([tx], sensors)[0]
+        phases, _ = self.unitary_operator.compute_H_batch(distances, noise)
+        return phases
+
+
+    def get_sensor_data(self, tx: tuple, sensors: list, noise: bool = False, init_state: QuantumState = None) -> QuantumState:
+        '''Given the Tx and sensors, return the sensing data of the sensors, i.e., a quantum state of sensors.
+           The simple initial state evolves into the product state of Utility.rz_product_state (no 2^N x 2^N operator),
+           any other initial state is evolved by the diagonal of the sensors' evolution operator (see StateBatch.evolve).
+           The localization methods sense a batch of states (see StateBatch.from_phases), this is the single state version,
+           e.g. for measure_maxprob_index()
         Args:
             tx -- tx location
             sensors -- a list of sensor index
             noise -- noise or no noise
+            init_state -- the initial state, a QuantumState or a state vector. If None, the simple initial state (a product state)
         Return:
             the QuantumState of the sensors
         '''
-        evolve = 1
-        for rx_i in sensors:
-            rx = self.sensordata['sensors'][f'{rx_i}']
-            distance = Utility.distance(tx, rx, self.cell_length)
-            _, uo = self.unitary_operator.compute_H(distance, noise)
-            evolve = np.kron(evolve, uo)
-        init_state = self.get_simple_initial_state(num=len(sensors))
-        return QuantumState(num_sensor=len(sensors), state_vector=np.dot(evolve, init_state))
+        phases = self.get_sensor_phases(tx, sensors, noise)
+        if init_state is None:
+            return QuantumState(num_sensor=len(sensors), state_vector=Utility.rz_product_state(phases))
+        state_vector = init_state.state_vector if isinstance(init_state, QuantumState) else np.asarray(init_state)
+        states = StateBatch(len(sensors), state_vector)
+        states.evolve(Utility.rz_diagonal(phases))
+        return states[0]
 
 
     def get_sensor_data_qml(self, tx: tuple, sensors: list, noise: bool = False, Hamiltonian: bool = False) -> tq.QuantumDevice:
@@ -101,16 +154,12 @@ class QuantumLocalization:
             tq.QuantumDevice
         '''
         # step 1: get the phases
-        thetas = []
-        for rx_i in sensors:
-            rx = self.sensordata['sensors'][f'{rx_i}']
-            distance = Utility.distance(tx, rx, self.cell_length)
-            if Hamiltonian:
-                phase_shift, _ = self.unitary_operator.compute_H(distance, noise=noise)
-            else:
-                phase_shift, _ = self.unitary_operator.compute(distance, noise=noise)
-            thetas.append(phase_shift)
-        thetas = torch.Tensor([thetas])  # add a batch dimension
+        distances = self.get_distances([tx], sensors)
+        if Hamiltonian:
+            thetas, _ = self.unitary_operator.compute_H_batch(distances, noise=noise)
+        else:
+            thetas, _ = self.unitary_operator.compute_batch(distances, noise=noise)
+        thetas = torch.Tensor(thetas)  # with a batch dimension
         n_qubits = len(sensors)
         use_cuda = torch.cuda.is_available()
         device = torch.device('cuda' if use_cuda else 'cpu')
@@ -119,25 +168,17 @@ class QuantumLocalization:
         return q_device
 
 
-    def measure_maxprob_index(self, qstate: QuantumState, povm: list) -> Tuple[int, list]:
+    def measure_maxprob_index(self, qstate: QuantumState, povm: Povm) -> Tuple[int, list]:
         '''do measurement using POVM and get the max probability
         Args:
             qstate -- the quantum sensing data
-            povm   -- a list of measurement operators
+            povm   -- the measurement
         Return:
             the index of the max probability, also the list of probabilities
         '''
-        probs = []
-        for operator in povm:
-            prob = np.trace(np.dot(operator.data, qstate.density_matrix))
-            probs.append(prob)
-        max_i = 0
-        maxx = 0
-        for i, prob in enumerate(probs):
-            if prob > maxx:
-                max_i = i
-                maxx = prob
-        return max_i, probs
+        probs = povm.probabilities(qstate.state_vector)
+        max_i = int(np.argmax(probs)) if np.max(probs) > 0 else 0
+        return max_i, list(probs)
 
 
     def sense_early_stop(self, count: Counter):
@@ -148,27 +189,82 @@ class QuantumLocalization:
         return False
 
 
-    def sense_measure_index(self, tx: tuple, sensors: list, povm: list, repeat: int, early_stop: bool) -> Tuple[int, list]:
-        '''the quantum sensing protocol
+    def sense_early_stop_bayes(self, count: Counter, num_outcome: int, error: float) -> bool:
+        '''stop when the most frequent outcome is the most probable outcome with posterior probability at least 1 - error.
+           With a uniform Dirichlet prior on the outcome probabilities, p_top / (p_top + p_j) ~ Beta(n_top + 1, n_j + 1), so
+           P(p_j > p_top) = I_0.5(n_top + 1, n_j + 1). The union bound over all the other outcomes j (including the unobserved ones)
+           is an upper bound of the posterior probability that the most frequent outcome is wrong
+        Args:
+            count       -- the counts of the outcomes so far
+            num_outcome -- the number of POVM outcomes
+            error       -- the target error
+        '''
+        values = np.array(sorted(count.values(), reverse=True), dtype=float)
+        top, others = values[0], values[1:]
+        bound = np.sum(betainc(top + 1, others + 1, 0.5))
+        bound += (num_outcome - len(values)) * 0.5 ** (top + 1)    # the unobserved outcomes, I_0.5(n + 1, 1) = 0.5^(n + 1)
+        return bound <= error
+
+
+    def sense_stop(self, count: Counter, shots: int, early_stop: bool, num_outcome: int) -> bool:
+        '''whether the sensing protocol stops after the current chunk of shots
+           The 'heuristic' rule applies if early_stop is True, after 500 shots.
+           The 'bayes' rule always applies, it stops as soon as the outcome is decided at the confidence 1 - self.stop_error
+        '''
+        if self.stop_rule == 'bayes':
+            return self.sense_early_stop_bayes(count, num_outcome, self.stop_error)
+        if self.stop_rule == 'heuristic':
+            return early_stop and shots >= 500 and self.sense_early_stop(count)
+        raise Exception(f'stop rule {self.stop_rule} not implemented')
+
+
+    def sense_measure_index(self, tx: tuple, sensors: list, povm: Povm, repeat: int, early_stop: bool, chunk: int = Default.sense_chunk) -> Tuple[int, list]:
+        '''the quantum sensing protocol, the shots are processed in batches of chunk shots.
+           The number of shots used is added to self.shots
+        Args:
+            tx -- tx location
+            sensors -- a list of sensor index
+            povm -- the measurement
+            repeat -- the (maximum) number of shots
+            early_stop -- whether to stop early by the 'heuristic' rule, checked after every chunk (see sense_stop)
+            chunk -- the number of shots in a batch
+        Return:
+            the index of the most frequent outcome, also the Counter of the outcomes
         '''
         count = Counter()
-        for it in range(repeat):
-            qstate = self.get_sensor_data(tx, sensors, noise=True)
-            probs = []
-            for operator in povm:
-                prob = np.trace(np.dot(operator.data, qstate.density_matrix))
-                probs.append(prob.real if prob.real > 0 else 0)    # ignore the negative real numbers...
-            cumulate = list(accumulate(probs))
-            maxx = max(cumulate)
-            pick = np.random.uniform(0, maxx)
-            i = bisect_left(cumulate, pick)
-            if Default.DEBUG and it % 100 == 0:
-                print(f'{it}, probs = {[round(p, 3) for p in probs]}, max = {maxx:0.5f}, pick = {pick:0.5f}, i = {i}')
-            count[i] += 1
-            # early stop
-            if early_stop and it % 100 == 99 and it >= 400 and self.sense_early_stop(count):
-                break
+        distances = self.get_distances([tx], sensors)[0]
+        shots = 0
+        if self.unitary_operator.is_deterministic(noise=True):
+            # every shot has the same state: evaluate the probabilities once, then sample the histogram of the shots
+            phases, _ = self.unitary_operator.compute_H_batch(distances, noise=True)
+            probs = np.maximum(povm.probabilities_from_phases(phases), 0)
+            probs /= probs.sum()
+            while shots < repeat:
+                size = min(chunk, repeat - shots) if early_stop or self.stop_rule != 'heuristic' else repeat - shots
+                histogram = np.random.multinomial(size, probs)
+                count.update({i: int(c) for i, c in enumerate(histogram) if c > 0})
+                shots += size
+                if self.sense_stop(count, shots, early_stop, povm.num_elements):
+                    break
+        else:
+            while shots < repeat:
+                size = min(chunk, repeat - shots)
+                # step 1: the noise of all the shots in the chunk at once, (size, N) phases
+                phases, _ = self.unitary_operator.compute_H_batch(np.tile(distances, (size, 1)), noise=True)
+                # step 2: the (size, K) probabilities, ignore the negative real numbers...
+                #         a POVM trained by overlaps never forms the (size, 2^N) states
+                probs = np.maximum(povm.probabilities_from_phases(phases), 0)
+                # step 3: sample one outcome per shot
+                outcomes = Utility.sample_outcomes(probs)
+                if Default.DEBUG:
+                    print(f'{shots}, probs = {[round(p, 3) for p in probs[0]]}, i = {outcomes[0]}')
+                count.update(outcomes.tolist())
+                shots += size
+                # early stop
+                if self.sense_stop(count, shots, early_stop, povm.num_elements):
+                    break
 
+        self.shots += shots
         max_i = -1
         maxx  = -1
         for i, c in count.items():
@@ -178,36 +274,164 @@ class QuantumLocalization:
         return max_i, count
 
 
-    def train_povmloc_one(self):
+    def train_povm(self, txs: list, sensors: list, overlap: bool = False) -> Povm:
+        '''train the pretty good measurement that discriminates the txs (equal priors), training has no noise
+        Args:
+            txs -- a list of tx locations, i.e., the hypotheses
+            sensors -- a list of sensor index
+            overlap -- if True, train in the span of the hypothesis states by their overlaps, no 2^N state vectors
+        Return:
+            Povm
+        '''
+        priors = [1 / len(txs)] * len(txs)    # equal prior
+        phases, _ = self.unitary_operator.compute_H_batch(self.get_distances(txs, sensors), noise=False)
+        return Povm.train_pretty_good(phases, priors, overlap)
+
+
+    def canonical_geometry(self, level: str, set_: str, txs: list) -> str:
+        '''the hash of a set's geometry up to translation, i.e., the sensor locations and the tx locations (hypotheses) relative
+           to the top left corner of the set's area. Sets with the same canonical geometry have the same POVM
+        '''
+        origin = np.array(self.network.area(level, set_)[0], dtype=float)
+        sensors = np.round(self.network.sensor_coordinates(self.network.sensors(level, set_)) - origin, 9) + 0.   # + 0. turns -0. to 0.
+        txs = np.round(np.asarray(txs, dtype=float).reshape(-1, 2) - origin, 9) + 0.
+        string = json.dumps({'sensors': sensors.tolist(), 'txs': txs.tolist()})
+        return hashlib.sha256(string.encode()).hexdigest()
+
+
+    def povm_config(self, geometry: str, overlap: bool) -> dict:
+        '''everything that the training of a POVM depends on, i.e., the key of the POVM cache.
+           The noise (std) is not included, because the training has no noise
+        Args:
+            geometry -- from canonical_geometry()
+            overlap  -- see train_povm()
+        '''
+        return {
+            'geometry': geometry,
+            'cell_length': self.cell_length,
+            'alpha': self.unitary_operator.alpha,
+            'power_reference': self.unitary_operator.power_reference,
+            'frequency': Default.frequency,
+            'sensing_time': Default.sensing_time,
+            'tx_power': Default.tx_power,
+            'default_cell_length': Default.cell_length,
+            'epsilon_rank': Default.EPSILON_RANK,
+            'method': 'pretty-good-overlap' if overlap else 'pretty-good-thin'
+        }
+
+
+    def povm_key(self, level: str, set_: str, txs: list, overlap: bool) -> Tuple[str, dict]:
+        '''the key of a set's POVM, shared by the sets with the same canonical geometry
+        Return:
+            (key, config)
+        '''
+        config = self.povm_config(self.canonical_geometry(level, set_, txs), overlap)
+        return PovmCache.make_key(config), config
+
+
+    def load_or_train_povm(self, key: str, config: dict, level: str, set_: str, txs: list, overlap: bool) -> Povm:
+        '''load a POVM from the POVM cache, or train it and save it to the cache
+        '''
+        if self.povm_cache is not None:
+            cached = self.povm_cache.load(key)
+            if cached is not None:
+                return cached[0]
+        sensors = self.network.sensors(level, set_)
+        povm = self.train_povm(txs, sensors, overlap)   # training has no noise
+        self.save_povm(key, config, level, set_, txs, povm)
+        return povm
+
+
+    def save_povm(self, key: str, config: dict, level: str, set_: str, txs: list, povm: Povm):
+        '''save a POVM to the POVM cache, if any. The tx locations are saved relative to the set's area
+        '''
+        if self.povm_cache is not None:
+            origin = self.network.area(level, set_)[0]
+            tx_loc = {i: (tx[0] - origin[0], tx[1] - origin[1]) for i, tx in enumerate(txs)}
+            self.povm_cache.save(key, povm, tx_loc, config)
+
+
+    def train_povm_set(self, level: str, set_: str, txs: list, overlap: bool = False) -> dict:
+        '''train the POVM of a set of sensors, or load it from the POVM cache.
+           The POVM is shared with the sets that have the same canonical geometry, only tx_loc differs (translated)
+        Args:
+            level   -- e.g. 'level-0'
+            set_    -- e.g. 'set-0'
+            txs     -- a list of tx locations, i.e., the hypotheses
+            overlap -- see train_povm()
+        Return:
+            {'povm': Povm, 'tx_loc': {outcome index: tx location}}
+        '''
+        key, config = self.povm_key(level, set_, txs, overlap)
+        self._shared_povms.register_default(key, partial(self.load_or_train_povm, key, config, level, set_, txs, overlap))
+        return {'povm': self._shared_povms[key], 'tx_loc': {i: tx for i, tx in enumerate(txs)}}
+
+
+    def train_povm_sets_parallel(self, jobs: list, overlap: bool, workers: int, blas_threads: int) -> dict:
+        '''train the POVMs of many sets of sensors in a pool of processes.
+           The POVMs in the cache are not retrained, and the sets with the same canonical geometry are trained once
+        Args:
+            jobs         -- a list of (level, set, txs)
+            overlap      -- see train_povm()
+            workers      -- the number of processes
+            blas_threads -- the number of BLAS threads in each process, workers * blas_threads should not exceed the cores
+        Return:
+            {f'{level}-{set}': {'povm': Povm, 'tx_loc': {outcome index: tx location}}}, in the order of jobs
+        '''
+        todo = {}   # key --> (config, level, set, txs), one set for each canonical geometry
+        for level_, set_, txs in jobs:
+            key, config = self.povm_key(level_, set_, txs, overlap)
+            if key in todo or self._shared_povms.is_trained(key):
+                continue
+            cached = self.povm_cache.load(key) if self.povm_cache is not None else None
+            if cached is not None:
+                self._shared_povms[key] = cached[0]
+            else:
+                todo[key] = (config, level_, set_, txs)
+        # the largest sets first, so that the total time is close to the time of the largest set
+        order = sorted(todo, key=lambda key: -len(todo[key][3]) * 2**len(self.network.sensors(todo[key][1], todo[key][2])))
+        blas_env = ['OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS', 'VECLIB_MAXIMUM_THREADS', 'NUMEXPR_NUM_THREADS']
+        saved_env = {var: os.environ.get(var) for var in blas_env}
+        try:
+            for var in blas_env:      # the workers are spawned during submit, and inherit the environment
+                os.environ[var] = str(blas_threads)
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+                futures = []
+                for key in order:
+                    config, level_, set_, txs = todo[key]
+                    sensors = self.network.sensors(level_, set_)
+                    phases, _ = self.unitary_operator.compute_H_batch(self.get_distances(txs, sensors), noise=False)
+                    priors = [1 / len(txs)] * len(txs)    # equal prior
+                    futures.append((key, pool.submit(Povm.train_pretty_good, phases, priors, overlap)))
+                for key, future in futures:
+                    config, level_, set_, txs = todo[key]
+                    povm = future.result()
+                    self.save_povm(key, config, level_, set_, txs, povm)
+                    self._shared_povms[key] = povm
+        finally:
+            for var, value in saved_env.items():
+                if value is None:
+                    os.environ.pop(var, None)
+                else:
+                    os.environ[var] = value
+        return {f'{level_}-{set_}': self.train_povm_set(level_, set_, txs, overlap) for level_, set_, txs in jobs}
+
+
+    def train_povmloc_one(self, overlap: bool = False):
         '''train the one level POVM localization method
+        Args:
+            overlap -- if True, the POVM never forms 2^N state vectors, for a large number of sensors
         '''
-        povm = Povm()
         txs = []
-        tx_loc = {}
-        for i in range(self.grid_length):     # the transmitter locations
+        for i in range(self.grid_length):     # the transmitter locations, tx i*grid_length + j is (i + 0.5, j + 0.5)
             for j in range(self.grid_length):
                 x = i + 0.5
                 y = j + 0.5
                 txs.append((x, y))
-                tx_loc[i*self.grid_length + j] = (x, y)
-        qstates = []                          # the quantum states for discrimination
         level_i = 0
         set_i   = 0
-        set_data = self.sensordata['levels'][f'level-{level_i}'][f'set-{set_i}']
-        sensors = set_data['sensors']
-        for tx in txs:
-            evolve = 1
-            for rx_i in sensors:  # rx_i is in str
-                rx = self.sensordata['sensors'][f'{rx_i}']
-                distance = Utility.distance(tx, rx, self.cell_length)
-                _, uo = self.unitary_operator.compute_H(distance, noise=False)  # assume noise is zero during training
-                evolve = np.kron(evolve, uo)
-            initial_state = self.get_simple_initial_state(len(sensors))
-            qstates.append(QuantumState(num_sensor=len(sensors), state_vector=np.dot(evolve, initial_state)))
-        priors = [1/len(qstates)] * len(qstates)
-        povm.pretty_good_measurement(qstates, priors, debug=False)
         key = f'level-{level_i}-set-{set_i}'
-        self.povms[key] = {'povm': povm.operators, 'tx_loc': tx_loc}
+        self.povms[key] = self.train_povm_set(f'level-{level_i}', f'set-{set_i}', txs, overlap)   # assume noise is zero during training
         print('training POVM done!')
 
 
@@ -218,10 +442,10 @@ class QuantumLocalization:
         '''
         seed = int(tx_truth[0]) * self.grid_length + int(tx_truth[1])
         np.random.seed(seed)
+        self.shots = 0
         level_i = 0
         set_i   = 0
-        set_data = self.sensordata['levels'][f'level-{level_i}'][f'set-{set_i}']
-        sensors = set_data['sensors']
+        sensors = self.network.sensors(f'level-{level_i}', f'set-{set_i}')
         key = f'level-{level_i}-set-{set_i}'
         povm = self.povms[key]
         early_stop = True if len(sensors) >= 8 else False
@@ -277,43 +501,95 @@ class QuantumLocalization:
         return tx_list
 
 
-    def train_povmloc(self):
+    def train_povmloc(self, overlap: bool = False, workers: int = Default.train_workers, blas_threads: int = Default.blas_threads,
+                      lazy: bool = True):
         '''training the POVMs for two level POVMLoc, including POVMLoc and POVMLoc Pro
+        Args:
+            overlap      -- if True, the POVMs never form 2^N state vectors, for a large number of sensors
+            workers      -- the number of processes that train the sets in parallel, 1 means serial
+            blas_threads -- the number of BLAS threads in each process when workers > 1
+            lazy         -- if True, a set's POVM is trained (or loaded from the cache) when povmloc/povmloc_pro first needs it.
+                            Ignored when workers > 1, which trains all the sets up front
         '''
-        povm = Povm()
-        levels = self.sensordata['levels']
-        for level_, sets in levels.items():
-            for set_, set_data in sets.items():
-                sensors = set_data['sensors']
-                area = set_data['area']
-                block_cell_ratio = set_data['block_cell_ratio']
-                info = f'level={level_}, set={set_}, sensors={sensors}, area={area}'
+        jobs = []
+        for level_ in self.network.levels:
+            for set_ in self.network.sets(level_):
+                sensors = self.network.sensors(level_, set_)   # only for printing
+                area = self.network.area(level_, set_)
+                block_cell_ratio = self.network.block_cell_ratio(level_, set_)
+                info = f'level={level_}, set={set_}, sensors={sensors.tolist()}, area={area}'
                 print(info)
                 a, b = area[0], area[1]  # a is top left, b is bottom right
                 tx_list = self.get_txloc(a, b, block_cell_ratio)
                 if level_ == 'level-1.5':
                     tx_list = self.filter_tx(a, b, tx_list)
-                evolve_operators = []
-                tx_loc = {}
-                qstates = []
-                init_state = self.get_simple_initial_state(num=len(sensors))
-                for i, tx in enumerate(tx_list):  # each tx leads to one evolve operator
-                    tx_loc[i] = tx
-                    evolve = 1
-                    for rx_i in sensors:          # each evolve operator is a product state of some unitary operators
-                        rx = self.sensordata['sensors'][f'{rx_i}']
-                        distance = Utility.distance(tx, rx, self.cell_length)
-                        _, uo = self.unitary_operator.compute_H(distance, noise=False)  # training has no noise
-                        evolve = np.kron(evolve, uo)
-                    evolve_operators.append(evolve)
-                    qstates.append(QuantumState(num_sensor=len(sensors), state_vector=np.dot(evolve, init_state)))
-                priors = [1 / len(qstates)] * len(qstates)    # equal prior
-                povm.pretty_good_measurement(qstates, priors, debug=False)
+                jobs.append((level_, set_, tx_list))
+        if workers > 1:
+            self.povms.update(self.train_povm_sets_parallel(jobs, overlap, workers, blas_threads))
+        elif lazy:
+            for level_, set_, tx_list in jobs:
+                key = f'{level_}-{set_}'
+                self.povms.register(key, partial(self.train_povm_set, level_, set_, tx_list, overlap))
+            print('POVMs will be trained on demand')
+            return
+        else:
+            for level_, set_, tx_list in jobs:
                 key = f'{level_}-{set_}'
-                self.povms[key] = {'povm': povm.operators, 'tx_loc':tx_loc}
+                self.povms[key] = self.train_povm_set(level_, set_, tx_list, overlap)
         print('training POVM done!')
 
 
+    def nearest_set(self, level: str, tx: tuple) -> str:
+        '''the set in a level whose area center is the nearest to tx
+        '''
+        sets = self.network.sets(level)
+        areas = self.network.level_areas(level).astype(float)
+        centers = areas.mean(axis=1)
+        distances = np.sqrt(((centers - np.array(tx)) ** 2).sum(axis=1))
+        return sets[int(np.argmin(distances))]
+
+
+    def containing_set(self, level: str, tx: tuple) -> str:
+        '''the first set in a level whose area contains tx, None if no such set
+        '''
+        sets = self.network.sets(level)
+        areas = self.network.level_areas(level).astype(float)
+        inside = np.all((areas[:, 0] <= np.array(tx)) & (np.array(tx) <= areas[:, 1]), axis=1)
+        indices = np.nonzero(inside)[0]
+        return sets[indices[0]] if len(indices) > 0 else None
+
+
+    def sense_level(self, tx_truth: tuple, level: str, set_: str, early_stop: bool) -> dict:
+        '''one level of the two level POVM-Loc: the sensing protocol with the POVM of a set.
+           povmloc() and povmloc_pro() seed the same way, so for the same TX they share the level 0 and level 1 results.
+           These results are kept for the last TX, together with the random state after the sensing,
+           so a method that continues from a kept result is identical to sensing again
+        Args:
+            tx_truth   -- the location of the transmitter
+            level      -- e.g. 'level-0'
+            set_       -- e.g. 'set-0'
+            early_stop -- see sense_measure_index()
+        Return:
+            {'tx': the predicted tx location, 'freqs': the Counter of the outcomes, 'shots': self.shots after the sensing,
+             'random_state': np.random.get_state() after the sensing}
+        '''
+        key = (tuple(tx_truth), self.stop_rule, self.stop_error)
+        if self._levels.get('key') != key:
+            self._levels = {'key': key}
+        if (level, set_, early_stop) in self._levels:
+            result = self._levels[(level, set_, early_stop)]
+            np.random.set_state(result['random_state'])
+            self.shots = result['shots']
+            return result
+        sensors = self.network.sensors(level, set_)
+        povm = self.povms[f'{level}-{set_}']
+        max_i, freqs = self.sense_measure_index(tx_truth, sensors, povm['povm'], Default.repeat, early_stop=early_stop)
+        result = {'tx': povm['tx_loc'][max_i], 'freqs': freqs, 'shots': self.shots, 'random_state': np.random.get_state()}
+        if level in ['level-0', 'level-1']:    # the common prefix of povmloc and povmloc_pro
+            self._levels[(level, set_, early_stop)] = result
+        return result
+
+
     def povmloc(self, tx_truth: tuple, continuous: bool = False) -> tuple:
         '''the two level POVM-Loc
         Args:
@@ -325,40 +601,25 @@ class QuantumLocalization:
         '''
         seed = int(tx_truth[0]) * self.grid_length + int(tx_truth[1])
         np.random.seed(seed)
+        self.shots = 0
         # level 0, only has one set of sensors
         block_length = int(math.sqrt(self.grid_length) + 10**-6)  # based on Assumption 1
         level_i = 0
         set_i = 0
-        set_ = self.sensordata['levels'][f'level-{level_i}'][f'set-{set_i}']
-        sensors = set_['sensors']
-        povm = self.povms[f'level-{level_i}-set-{set_i}']
         # the sensing protocol
-        max_i, freqs = self.sense_measure_index(tx_truth, sensors, povm['povm'], Default.repeat, early_stop=True)
+        result = self.sense_level(tx_truth, f'level-{level_i}', f'set-{set_i}', early_stop=True)
+        freqs = result['freqs']
         print(f'({round(tx_truth[0], 3)}, {round(tx_truth[1], 3)})', sorted(list(freqs.items()), key=lambda x: -x[1])[:4], end='; ')
-        tx_level0 = povm['tx_loc'][max_i]
+        tx_level0 = result['tx']
         level_0_correct = self.check_correct(tx_truth, tx_level0, block_len=block_length)
         print('level-0 tx', tx_level0, level_0_correct, end='; ')
         
         # level 1
         # step 1: get the set in level 1 according to tx_level0
         level_i = 1
-        min_distance = float('inf')
-        mapping_set = 0
-        num_set = len(self.sensordata['levels'][f'level-1'])
-        for set_i in range(num_set):
-            set_ = self.sensordata['levels'][f'level-{level_i}'][f'set-{set_i}']
-            a, b = set_['area']
-            center = ((a[0] + b[0]) / 2, (a[1] + b[1]) / 2)
-            distance = Utility.distance(tx_level0, center, 1)
-            if distance < min_distance:
-                min_distance = distance
-                mapping_set = set_i
-        set_ = self.sensordata['levels'][f'level-{level_i}'][f'set-{mapping_set}']
+        mapping_set = self.nearest_set(f'level-{level_i}', tx_level0)
         # step 2: the sensing protocol
-        sensors = set_['sensors']
-        povm = self.povms[f'level-{level_i}-set-{mapping_set}']
-        max_i, freqs = self.sense_measure_index(tx_truth, sensors, povm['povm'], Default.repeat, early_stop=False)
-        tx_level1 = povm['tx_loc'][max_i]
+        tx_level1 = self.sense_level(tx_truth, f'level-{level_i}', mapping_set, early_stop=False)['tx']
         level_1_correct = self.check_correct(tx_truth, tx_level1, block_len=1)
         if not continuous:
             print('level-1 tx', tx_level1, level_1_correct)
@@ -381,39 +642,27 @@ class QuantumLocalization:
         '''
         seed = int(tx_truth[0]) * self.grid_length + int(tx_truth[1])
         np.random.seed(seed)
+        self.shots = 0
         # level 0, only has one set of sensors
         block_length = int(math.sqrt(self.grid_length) + 10**-6)   # based on Assumption 1
         level_i = 0
         set_i = 0
-        set_ = self.sensordata['levels'][f'level-{level_i}'][f'set-{set_i}']
-        sensors = set_['sensors']
-        povm = self.povms[f'level-{level_i}-set-{set_i}']
-        # the sensing protocol
-        max_i, freqs = self.sense_measure_index(tx_truth, sensors, povm['povm'], Default.repeat, early_stop=True)
+        # the sensing protocol, continues from povmloc() if it localized the same TX
+        result = self.sense_level(tx_truth, f'level-{level_i}', f'set-{set_i}', early_stop=True)
+        freqs = result['freqs']
         print(f'({round(tx_truth[0], 3)}, {round(tx_truth[1], 3)})', sorted(list(freqs.items()), key=lambda x: -x[1])[:4], end='; ')
-        tx_level0 = povm['tx_loc'][max_i]
+        tx_level0 = result['tx']
         level_0_correct = self.check_correct(tx_truth, tx_level0, block_len=block_length)
         print('level-0 tx', tx_level0, level_0_correct, end='; ')
         
         # level 1
         # step 1: get the set in level 1 according to tx_level0
         level_i = 1
-        mapping_set = -1
-        num_set = len(self.sensordata['levels'][f'level-{level_i}'])
-        for set_i in range(num_set):
-            set_ = self.sensordata['levels'][f'level-{level_i}'][f'set-{set_i}']
-            a, b = set_['area']
-            if a[0] <= tx_level0[0] <= b[0] and a[1] <= tx_level0[1] <= b[1]:
-                    mapping_set = set_i
-                    break
-        else:
+        mapping_set = self.containing_set(f'level-{level_i}', tx_level0)
+        if mapping_set is None:
             raise Exception('Error in level 1!')
-        set_ = self.sensordata['levels'][f'level-{level_i}'][f'set-{mapping_set}']
         # step 2: the sensing protocol
-        sensors = set_['sensors']
-        povm = self.povms[f'level-{level_i}-set-{mapping_set}']
-        max_i, freqs = self.sense_measure_index(tx_truth, sensors, povm['povm'], Default.repeat, early_stop=False)
-        tx_level1 = povm['tx_loc'][max_i]
+        tx_level1 = self.sense_level(tx_truth, f'level-{level_i}', mapping_set, early_stop=False)['tx']
         level_1_correct = self.check_correct(tx_truth, tx_level1, block_len=1)
         print('level-1 tx', tx_level1, level_1_correct, end='; ')
         
@@ -421,22 +670,11 @@ class QuantumLocalization:
         if self.is_blockedge(tx_level1, self.grid_length, block_length):
             # step 1: get the set in level 1.5 according to tx_level1
             level_i = 1.5
-            mapping_set = -1
-            num_set = len(self.sensordata['levels'][f'level-{level_i}'])
-            for set_i in range(num_set):
-                set_ = self.sensordata['levels'][f'level-{level_i}'][f'set-{set_i}']
-                a, b = set_['area']
-                if a[0] <= tx_level1[0] <= b[0] and a[1] <= tx_level1[1] <= b[1]:
-                    mapping_set = set_i
-                    break
-            else:
+            mapping_set = self.containing_set(f'level-{level_i}', tx_level1)
+            if mapping_set is None:
                 raise Exception('Error in level 1.5!')
-            set_ = self.sensordata['levels'][f'level-{level_i}'][f'set-{mapping_set}']
             # step 2: the sensing protocol
-            sensors = set_['sensors']
-            povm = self.povms[f'level-{level_i}-set-{mapping_set}']
-            max_i, freqs = self.sense_measure_index(tx_truth, sensors, povm['povm'], Default.repeat, early_stop=False)            
-            tx_level1 = povm['tx_loc'][max_i]
+            tx_level1 = self.sense_level(tx_truth, f'level-{level_i}', mapping_set, early_stop=False)['tx']
             # print(tx_truth, sorted(list(freqs.items()), key=lambda x: -x[1])[:4], end='; ')
             level_1_correct = self.check_correct(tx_truth, tx_level1, block_len=1)
             if not continuous:
@@ -456,6 +694,115 @@ class QuantumLocalization:
             return level_1_correct, level_1_locerror, tx_level1
 
 
+    def oracle_confusion(self, txs: list, sensors: list, povm: Povm, noise_samples: int = Default.oracle_noise,
+                         rng: np.random.Generator = None, chunk: int = Default.sense_chunk) -> np.array:
+        '''the confusion matrix p(outcome | TX) of a POVM, computed from the POVM instead of sampled.
+           Noise free sensing has one state per TX. Otherwise every shot has a new noise, so the probabilities of a TX are
+           averaged over noise_samples draws (Monte Carlo)
+        Args:
+            txs           -- the TX locations, shape (T, 2)
+            sensors       -- a list of sensor index
+            povm          -- the measurement
+            noise_samples -- the number of noise draws per TX, ignored if the sensing is noise free
+            rng           -- the random generator of the noise. If None, use the global np.random
+            chunk         -- the number of states processed in one batch
+        Return:
+            np.array -- shape (T, K), each row is normalized
+        '''
+        distances = self.get_distances(txs, sensors)
+        repeat = 1 if self.unitary_operator.is_deterministic(noise=True) else noise_samples
+        rows = np.repeat(np.arange(len(distances)), repeat)
+        confusion = np.zeros((len(distances), povm.num_elements))
+        for start in range(0, len(rows), chunk):
+            row = rows[start:start + chunk]
+            phases, _ = self.unitary_operator.compute_H_batch(distances[row], noise=True, rng=rng)
+            np.add.at(confusion, row, np.maximum(povm.probabilities_from_phases(phases), 0))
+        return confusion / confusion.sum(axis=1, keepdims=True)
+
+
+    def _oracle_route(self, level: str, find_set, tx_loc: dict, probs: np.array) -> dict:
+        '''the probability that the next level senses with each of its sets, given the probabilities of the current level's outcomes
+        Args:
+            level    -- the next level
+            find_set -- nearest_set or containing_set
+            tx_loc   -- the outcome index --> the tx location, only the outcomes that go to the next level
+            probs    -- shape (T, K), the probability of each outcome of the current level
+        Return:
+            the set of the next level --> shape (T,) probability
+        '''
+        weights = {}
+        for i, tx in tx_loc.items():
+            set_ = find_set(level, tx)
+            if set_ is None:
+                raise Exception(f'Error in {level}!')
+            weights[set_] = weights.get(set_, 0) + probs[:, i]
+        return weights
+
+
+    def oracle(self, method: str, txs: list = None, shots: int = Default.repeat, vote_samples: int = Default.oracle_votes,
+               noise_samples: int = Default.oracle_noise, seed: int = 0) -> dict:
+        '''the analytic counterpart of povmloc_one(), povmloc() and povmloc_pro(): the confusion matrix of every POVM on all the TXs at once,
+           the majority vote distribution of each level, and the composite distribution of the predicted location of every TX.
+           The POVMs need to be trained, see train_povmloc_one() and train_povmloc()
+        Args:
+            method        -- 'povmloc-one', 'povmloc' or 'povmloc-pro'
+            txs           -- the TX locations. If None, the centers of the cells
+            shots         -- the number of shots of the majority vote at each level, early stopping is not modeled
+            vote_samples  -- see Povm.majority_vote_distribution()
+            noise_samples -- see oracle_confusion()
+            seed          -- the seed of the random generator
+        Return:
+            {'txs': (T, 2) array, 'locations': a list of L predicted locations, 'predictions': (T, L) the probability of each predicted location,
+             'accuracy': (T,) the expected accuracy, 'error': (T,) the expected localization error,
+             'confusions': {f'{level}-{set}': (T, K) confusion matrix}}
+        '''
+        if txs is None:
+            txs = [(x + 0.5, y + 0.5) for x in range(self.grid_length) for y in range(self.grid_length)]
+        txs = np.asarray(txs, dtype=float).reshape(-1, 2)
+        rng = np.random.default_rng(seed)
+        confusions = {}
+        locations, columns = [], []
+
+        def votes(level: str, set_: str) -> Tuple[dict, np.array]:
+            key = f'{level}-{set_}'
+            povm = self.povms[key]
+            confusions[key] = self.oracle_confusion(txs, self.network.sensors(level, set_), povm['povm'], noise_samples, rng)
+            return povm['tx_loc'], Povm.majority_vote_distribution(confusions[key], shots, vote_samples, rng)
+
+        def predict(tx_loc: dict, probs: np.array):
+            locations.extend(tx_loc[i] for i in range(probs.shape[1]))
+            columns.append(probs)
+
+        tx_loc0, votes0 = votes('level-0', 'set-0')
+        if method == 'povmloc-one':
+            predict(tx_loc0, votes0)
+        elif method in ['povmloc', 'povmloc-pro']:
+            block_length = int(math.sqrt(self.grid_length) + 10**-6)   # based on Assumption 1
+            find_set = self.nearest_set if method == 'povmloc' else self.containing_set
+            weights_edge = {}
+            for set_, weight in self._oracle_route('level-1', find_set, tx_loc0, votes0).items():
+                tx_loc1, votes1 = votes('level-1', set_)
+                probs1 = weight[:, np.newaxis] * votes1
+                if method == 'povmloc-pro':   # the block edge outcomes do another POVM in level 1.5
+                    edge = {i: tx for i, tx in tx_loc1.items() if self.is_blockedge(tx, self.grid_length, block_length)}
+                    for set_edge, weight_edge in self._oracle_route('level-1.5', self.containing_set, edge, probs1).items():
+                        weights_edge[set_edge] = weights_edge.get(set_edge, 0) + weight_edge
+                    probs1[:, list(edge)] = 0
+                predict(tx_loc1, probs1)
+            for set_, weight in weights_edge.items():
+                tx_loc, votes_edge = votes('level-1.5', set_)
+                predict(tx_loc, weight[:, np.newaxis] * votes_edge)
+        else:
+            raise Exception(f'oracle of {method} not implemented')
+
+        predictions = np.concatenate(columns, axis=1)
+        locs = np.array(locations, dtype=float)
+        correct = np.all(np.floor(txs)[:, np.newaxis, :] == np.floor(locs)[np.newaxis, :, :], axis=2)   # check_correct(), block_len=1
+        distances = Default.cell_length * np.sqrt(((txs[:, np.newaxis, :] - locs[np.newaxis, :, :]) ** 2).sum(axis=2))
+        return {'txs': txs, 'locations': locations, 'predictions': predictions, 'accuracy': (predictions * correct).sum(axis=1),
+                'error': (predictions * distances).sum(axis=1), 'confusions': confusions}
+
+
     def train_quantum_ml(self, root_dir: str, generate_data: bool):
         '''train the one level quantum machine learning model, discrete case
         Args:
@@ -465,16 +812,6 @@ class QuantumLocalization:
         # step 1: generate simulated training data (also the testing data)
         if generate_data:
             Utility.remove_make(root_dir)
-            train_phase_dir = os.path.join(root_dir, 'train', 'phase')
-            train_label_dir = os.path.join(root_dir, 'train', 'label')
-            test_phase_dir = os.path.join(root_dir, 'test', 'phase')
-            test_label_dir = os.path.join(root_dir, 'test', 'label')
-            test_loc_dir   = os.path.join(root_dir, 'test', 'loc')
-            os.makedirs(train_phase_dir)
-            os.makedirs(train_label_dir)
-            os.makedirs(test_phase_dir)
-            os.makedirs(test_label_dir)
-            os.makedirs(test_loc_dir)
             txs = []
             tx_loc = {}
             for i in range(self.grid_length):     # the transmitter locations
@@ -485,43 +822,31 @@ class QuantumLocalization:
                     tx_loc[i*self.grid_length + j] = (x, y)
             level_i = 0
             set_i   = 0
-            set_data = self.sensordata['levels'][f'level-{level_i}'][f'set-{set_i}']
-            sensors = set_data['sensors']
-            area = set_data['area']
-            block_cell_ratio = set_data['block_cell_ratio']
-            info = {'level':level_i, 'set': set_i, 'sensors': sensors, 'sensor_num': len(sensors), 
+            sensors = self.network.sensors(f'level-{level_i}', f'set-{set_i}')
+            area = self.network.area(f'level-{level_i}', f'set-{set_i}')
+            block_cell_ratio = self.network.block_cell_ratio(f'level-{level_i}', f'set-{set_i}')
+            info = {'level':level_i, 'set': set_i, 'sensors': sensors.tolist(), 'sensor_num': len(sensors), 
                     'area': area, 'block_cell_ratio': block_cell_ratio}
             info_file = os.path.join(root_dir, 'info')
             with open(info_file, 'w') as f:
                 json.dump(info, f)
                 print(info)
+            distances = self.get_distances(txs, sensors)              # (len(txs), len(sensors))
             repeat = 100
-            counter = 0
+            phases, labels = [], []
             for i, tx in enumerate(txs):
-                for _ in range(repeat):
-                    thetas = []
-                    for rx_i in sensors:  # rx_i is in str
-                        rx = self.sensordata['sensors'][f'{rx_i}']
-                        distance = Utility.distance(tx, rx, self.cell_length)
-                        phase_shift, _ = self.unitary_operator.compute_H(distance, noise=True)  # there is noise for quantum ml
-                        thetas.append(phase_shift)
-                    np.save(f'{train_phase_dir}/{counter}.npy', np.array(thetas).astype(np.float32))
-                    np.save(f'{train_label_dir}/{counter}.npy', np.array(i).astype(np.int64))
-                    counter += 1
+                thetas_repeat, _ = self.unitary_operator.compute_H_batch(np.tile(distances[i], (repeat, 1)), noise=True)  # there is noise for quantum ml
+                phases.append(thetas_repeat)
+                labels.append(np.full(repeat, i))
+            QuantumSensingDataset.save(os.path.join(root_dir, 'train'), np.concatenate(phases), np.concatenate(labels))
             repeat = 6
-            counter = 0
+            phases, labels, locs = [], [], []
             for i, tx in enumerate(txs):
-                for _ in range(repeat):
-                    thetas = []
-                    for rx_i in sensors:  # rx_i is in str
-                        rx = self.sensordata['sensors'][f'{rx_i}']
-                        distance = Utility.distance(tx, rx, self.cell_length)
-                        phase_shift, _ = self.unitary_operator.compute_H(distance, noise=True)  # there is noise for quantum ml
-                        thetas.append(phase_shift)
-                    np.save(f'{test_phase_dir}/{counter}.npy', np.array(thetas).astype(np.float32))
-                    np.save(f'{test_label_dir}/{counter}.npy', np.array(i).astype(np.int64))
-                    np.save(f'{test_loc_dir}/{counter}.npy',   np.array(tx).astype(np.float32))
-                    counter += 1
+                thetas_repeat, _ = self.unitary_operator.compute_H_batch(np.tile(distances[i], (repeat, 1)), noise=True)  # there is noise for quantum ml
+                phases.append(thetas_repeat)
+                labels.append(np.full(repeat, i))
+                locs.append(np.tile(tx, (repeat, 1)))
+            QuantumSensingDataset.save(os.path.join(root_dir, 'test'), np.concatenate(phases), np.concatenate(labels), np.concatenate(locs))
         else:
             if os.path.exists(root_dir) is False:
                 raise Exception(f'directory {root_dir} does not exist')
@@ -541,14 +866,6 @@ class QuantumLocalization:
         # step 1: generate simulated training data (also the testing data)
         if generate_data:
             Utility.remove_make(root_dir)
-            train_phase_dir = os.path.join(root_dir, 'train', 'phase')
-            train_label_dir = os.path.join(root_dir, 'train', 'label')
-            test_phase_dir  = os.path.join(root_dir, 'test', 'phase')
-            test_label_dir  = os.path.join(root_dir, 'test', 'label')
-            os.makedirs(train_phase_dir)
-            os.makedirs(train_label_dir)
-            os.makedirs(test_phase_dir)
-            os.makedirs(test_label_dir)
             txs = []
             tx_loc = {}
             for i in range(self.grid_length):     # the transmitter locations
@@ -559,48 +876,31 @@ class QuantumLocalization:
                     tx_loc[i*self.grid_length + j] = (x, y)
             level_i = 0
             set_i   = 0
-            set_data = self.sensordata['levels'][f'level-{level_i}'][f'set-{set_i}']
-            sensors = set_data['sensors']
-            area = set_data['area']
-            block_cell_ratio = set_data['block_cell_ratio']
-            info = {'level':level_i, 'set': set_i, 'sensors': sensors, 'sensor_num': len(sensors), 
+            sensors = self.network.sensors(f'level-{level_i}', f'set-{set_i}')
+            area = self.network.area(f'level-{level_i}', f'set-{set_i}')
+            block_cell_ratio = self.network.block_cell_ratio(f'level-{level_i}', f'set-{set_i}')
+            info = {'level':level_i, 'set': set_i, 'sensors': sensors.tolist(), 'sensor_num': len(sensors), 
                     'area': area, 'block_cell_ratio': block_cell_ratio, 'continuous': True}
             info_file = os.path.join(root_dir, 'info')
             with open(info_file, 'w') as f:
                 json.dump(info, f)
                 print(info)
             repeat = 100
-            counter = 0
+            phases, labels = [], []
             for i, tx in enumerate(txs):
-                for _ in range(repeat):
-                    # tx_continuous = (tx[0] + np.random.uniform(-0.5, 0.5), tx[1] + np.random.uniform(-0.5, 0.5))
-                    tx_continuous = self.generate_tx(tx, threshold=5)
-                    tx_continuous_target = (tx_continuous[0] / self.grid_length, tx_continuous[1] / self.grid_length)  # normalize values to [0, 1]
-                    thetas = []
-                    for rx_i in sensors:  # rx_i is in str
-                        rx = self.sensordata['sensors'][f'{rx_i}']
-                        distance = Utility.distance(tx_continuous, rx, self.cell_length)
-                        phase_shift, _ = self.unitary_operator.compute_H(distance, noise=True)  # there is noise for quantum ml
-                        thetas.append(phase_shift)
-                    np.save(f'{train_phase_dir}/{counter}.npy', np.array(thetas).astype(np.float32))
-                    np.save(f'{train_label_dir}/{counter}.npy', np.array(tx_continuous_target).astype(np.float32))
-                    counter += 1
+                # tx_continuous = (tx[0] + np.random.uniform(-0.5, 0.5), tx[1] + np.random.uniform(-0.5, 0.5))
+                txs_continuous, thetas_repeat = self.generate_tx_phases(tx, sensors, repeat, threshold=5)  # there is noise for quantum ml
+                phases.append(thetas_repeat)
+                labels.append(np.array(txs_continuous) / self.grid_length)  # normalize values to [0, 1]
+            QuantumSensingDataset.save(os.path.join(root_dir, 'train'), np.concatenate(phases), np.concatenate(labels))
             repeat = 11
-            counter = 0
+            phases, labels = [], []
             for i, tx in enumerate(txs):
-                for _ in range(repeat):
-                    # tx_continuous = (tx[0] + np.random.uniform(-0.5, 0.5), tx[1] + np.random.uniform(-0.5, 0.5))
-                    tx_continuous = self.generate_tx(tx, threshold=5)
-                    tx_continuous_target = (tx_continuous[0] / self.grid_length, tx_continuous[1] / self.grid_length)  # normalize values to [0, 1]
-                    thetas = []
-                    for rx_i in sensors:  # rx_i is in str
-                        rx = self.sensordata['sensors'][f'{rx_i}']
-                        distance = Utility.distance(tx_continuous, rx, self.cell_length)
-                        phase_shift, _ = self.unitary_operator.compute_H(distance, noise=True)  # there is noise for quantum ml
-                        thetas.append(phase_shift)
-                    np.save(f'{test_phase_dir}/{counter}.npy', np.array(thetas).astype(np.float32))
-                    np.save(f'{test_label_dir}/{counter}.npy', np.array(tx_continuous_target).astype(np.float32))
-                    counter += 1
+                # tx_continuous = (tx[0] + np.random.uniform(-0.5, 0.5), tx[1] + np.random.uniform(-0.5, 0.5))
+                txs_continuous, thetas_repeat = self.generate_tx_phases(tx, sensors, repeat, threshold=5)  # there is noise for quantum ml
+                phases.append(thetas_repeat)
+                labels.append(np.array(txs_continuous) / self.grid_length)  # normalize values to [0, 1]
+            QuantumSensingDataset.save(os.path.join(root_dir, 'test'), np.concatenate(phases), np.concatenate(labels))
         else:
             if os.path.exists(root_dir) is False:
                 raise Exception(f'directory {root_dir} does not exist')
@@ -616,19 +916,15 @@ class QuantumLocalization:
             root_dir -- the root directory of the training data
         '''
         Utility.remove_make(root_dir)
-        levels = self.sensordata['levels']
-        for level_, sets in levels.items():
-            for set_, set_data in sets.items():
+        for level_ in self.network.levels:
+            for set_ in self.network.sets(level_):
                 key = f'{level_}-{set_}'
-                train_phase_dir = os.path.join(root_dir, key, 'train', 'phase')
-                train_label_dir = os.path.join(root_dir, key, 'train', 'label')
                 info_dir = os.path.join(root_dir, key)
-                os.makedirs(train_phase_dir)
-                os.makedirs(train_label_dir)
-                sensors = set_data['sensors']
-                area = set_data['area']
-                block_cell_ratio = set_data['block_cell_ratio']
-                info = {'level':level_, 'set': set_, 'sensors': sensors, 'sensor_num': len(sensors), 
+                os.makedirs(info_dir)
+                sensors = self.network.sensors(level_, set_)
+                area = self.network.area(level_, set_)
+                block_cell_ratio = self.network.block_cell_ratio(level_, set_)
+                info = {'level':level_, 'set': set_, 'sensors': sensors.tolist(), 'sensor_num': len(sensors), 
                         'area': area, 'block_cell_ratio': block_cell_ratio, 'continuous': False}
                 info_file = os.path.join(info_dir, 'info')
                 with open(info_file, 'w') as f:
@@ -637,20 +933,15 @@ class QuantumLocalization:
                 a, b = area[0], area[1]  # a is top left, b is bottom right
                 tx_list = self.get_txloc(a, b, block_cell_ratio)
                 repeat = 100
-                counter = 0
+                phases, labels = [], []
                 for i, block_center in enumerate(tx_list):
                     txs = self.generate_tx_qml_two(block_center, block_cell_ratio)
-                    for tx in txs:
-                        for _ in range(repeat):
-                            thetas = []
-                            for rx_i in sensors:
-                                rx = self.sensordata['sensors'][f'{rx_i}']
-                                distance = Utility.distance(tx, rx, self.cell_length)
-                                phase_shift, _ = self.unitary_operator.compute_H(distance, noise=True)
-                                thetas.append(phase_shift)
-                            np.save(f'{train_phase_dir}/{counter}.npy', np.array(thetas).astype(np.float32))
-                            np.save(f'{train_label_dir}/{counter}.npy', np.array(i).astype(np.int64))
-                            counter += 1
+                    distances = self.get_distances(txs, sensors)
+                    for j, tx in enumerate(txs):
+                        thetas_repeat, _ = self.unitary_operator.compute_H_batch(np.tile(distances[j], (repeat, 1)), noise=True)
+                        phases.append(thetas_repeat)
+                        labels.append(np.full(repeat, i))
+                QuantumSensingDataset.save(os.path.join(info_dir, 'train'), np.concatenate(phases), np.concatenate(labels))
         print('Generating data done!')
 
 
@@ -684,17 +975,15 @@ class QuantumLocalization:
             '''
             Args:
                 tx -- transmitter location (x, y)
-                sensor_list -- a list of sensor location (x, y)
+                sensor_list -- an array of sensor location (x, y), shape (M, 2)
                 threshold -- the minimum distance between the tx and all sensors
             Return:
                 if True the tx is threshold distance outside ALL sensors
             '''
-            for sen in sensor_list:
-                if Utility.distance(tx, sen, Default.cell_length) < threshold:
-                    return False
-            return True
+            distances = Default.cell_length * np.sqrt(((sensor_list - np.array(tx)) ** 2).sum(axis=1))
+            return bool(np.all(distances >= threshold))
 
-        sensor_list = list(self.sensordata['sensors'].values())
+        sensor_list = self.network.coordinates
         outside_5m = False
         while outside_5m is False:                    
             x = cell[0] + np.random.uniform(-0.5, 0.5)
@@ -703,6 +992,27 @@ class QuantumLocalization:
         return (x, y)
 
 
+    def generate_tx_phases(self, cell: tuple, sensors: list, repeat: int, threshold: float) -> Tuple[list, np.array]:
+        '''generate some tx locations in a cell and their noisy phase shifts at the sensors.
+           One tx at a time, then the phase shifts of that tx, so that the global np.random draws in the same order as
+           generate_tx() followed by compute_H() for each sensor
+        Args:
+            cell      -- the center of grid cell (x, y)
+            sensors   -- a list of sensor index
+            repeat    -- the number of tx locations
+            threshold -- minimum distance between a tx and all sensors
+        Return:
+            (a list of tx locations, the phase shifts of shape (repeat, len(sensors)))
+        '''
+        txs, phases = [], []
+        for _ in range(repeat):
+            tx = self.generate_tx(cell, threshold)
+            thetas, _ = self.unitary_operator.compute_H_batch(self.get_distances([tx], sensors)[0], noise=True)
+            txs.append(tx)
+            phases.append(thetas)
+        return txs, np.array(phases)
+
+
     def train_quantum_ml_two_continuous(self, root_dir: str):
         '''train the two level quantum machine learning model
            continuous version
@@ -710,21 +1020,17 @@ class QuantumLocalization:
             root_dir -- the root directory of the training data
         '''
         Utility.remove_make(root_dir)
-        levels = self.sensordata['levels']
-        for level_, sets in levels.items():
+        for level_ in self.network.levels:
             # if level_ == 'level-0':
             #     continue
-            for set_, set_data in sets.items():
+            for set_ in self.network.sets(level_):
                 key = f'{level_}-{set_}'
-                train_phase_dir = os.path.join(root_dir, key, 'train', 'phase')
-                train_label_dir = os.path.join(root_dir, key, 'train', 'label')
                 info_dir = os.path.join(root_dir, key)
-                os.makedirs(train_phase_dir)
-                os.makedirs(train_label_dir)
-                sensors = set_data['sensors']
-                area = set_data['area']
-                block_cell_ratio = set_data['block_cell_ratio']
-                info = {'level':level_, 'set': set_, 'sensors': sensors, 'sensor_num': len(sensors), 
+                os.makedirs(info_dir)
+                sensors = self.network.sensors(level_, set_)
+                area = self.network.area(level_, set_)
+                block_cell_ratio = self.network.block_cell_ratio(level_, set_)
+                info = {'level':level_, 'set': set_, 'sensors': sensors.tolist(), 'sensor_num': len(sensors), 
                         'area': area, 'block_cell_ratio': block_cell_ratio, 'continuous': True}
                 info_file = os.path.join(info_dir, 'info')
                 with open(info_file, 'w') as f:
@@ -734,46 +1040,73 @@ class QuantumLocalization:
                 area_length = b[0] - a[0]
                 tx_list = self.get_txloc(a, b, 1) # for the continuous case, tx are everywhere
                 repeat = 100
-                counter = 0
+                phases, labels = [], []
                 for tx in tx_list:
-                    for _ in range(repeat):
-                        # tx_continuous = (tx[0] + np.random.uniform(-0.5, 0.5), tx[1] + np.random.uniform(-0.5, 0.5))
-                        tx_continuous = self.generate_tx(tx, threshold=5)
-                        tx_continuous_target = ((tx_continuous[0] - a[0]) / area_length, (tx_continuous[1] - a[1]) / area_length)  # elrative location inside the block, normalize values to [0, 1]
-                        thetas = []
-                        for rx_i in sensors:
-                            rx = self.sensordata['sensors'][f'{rx_i}']
-                            distance = Utility.distance(tx_continuous, rx, self.cell_length)
-                            phase_shift, _ = self.unitary_operator.compute_H(distance, noise=True)
-                            thetas.append(phase_shift)
-                        np.save(f'{train_phase_dir}/{counter}.npy', np.array(thetas).astype(np.float32))
-                        np.save(f'{train_label_dir}/{counter}.npy', np.array(tx_continuous_target).astype(np.float32))
-                        counter += 1
+                    # tx_continuous = (tx[0] + np.random.uniform(-0.5, 0.5), tx[1] + np.random.uniform(-0.5, 0.5))
+                    txs_continuous, thetas_repeat = self.generate_tx_phases(tx, sensors, repeat, threshold=5)
+                    phases.append(thetas_repeat)
+                    labels.append((np.array(txs_continuous) - a) / area_length)  # relative location inside the block, normalize values to [0, 1]
+                QuantumSensingDataset.save(os.path.join(info_dir, 'train'), np.concatenate(phases), np.concatenate(labels))
                 # create a testing dataset only for the level-0
                 if key == 'level-0-set-0':
-                    test_phase_dir = os.path.join(root_dir, key, 'test', 'phase')
-                    test_label_dir = os.path.join(root_dir, key, 'test', 'label')
-                    os.makedirs(test_phase_dir)
-                    os.makedirs(test_label_dir)
                     repeat = 12
-                    counter = 0
+                    phases, labels = [], []
                     for tx in tx_list:
-                        for _ in range(repeat):
-                            tx_continuous = self.generate_tx(tx, threshold=5)
-                            tx_continuous_target = ((tx_continuous[0] - a[0]) / area_length, (tx_continuous[1] - a[1]) / area_length)  # elrative location inside the block, normalize values to [0, 1]
-                            thetas = []
-                            for rx_i in sensors:
-                                rx = self.sensordata['sensors'][f'{rx_i}']
-                                distance = Utility.distance(tx_continuous, rx, self.cell_length)
-                                phase_shift, _ = self.unitary_operator.compute_H(distance, noise=True)
-                                thetas.append(phase_shift)
-                            np.save(f'{test_phase_dir}/{counter}.npy', np.array(thetas).astype(np.float32))
-                            np.save(f'{test_label_dir}/{counter}.npy', np.array(tx_continuous_target).astype(np.float32))
-                            counter += 1
+                        txs_continuous, thetas_repeat = self.generate_tx_phases(tx, sensors, repeat, threshold=5)
+                        phases.append(thetas_repeat)
+                        labels.append((np.array(txs_continuous) - a) / area_length)  # relative location inside the block, normalize values to [0, 1]
+                    QuantumSensingDataset.save(os.path.join(info_dir, 'test'), np.concatenate(phases), np.concatenate(labels))
 
         print('Generating data done!')
 
 
+    def qml_info(self, level: str, set_: str, continuous: bool) -> dict:
+        '''the info of a set in the two level QML method, the same as the info file of train_quantum_ml_two(_continuous)
+        '''
+        sensors = self.network.sensors(level, set_)
+        return {'level': level, 'set': set_, 'sensors': sensors.tolist(), 'sensor_num': len(sensors),
+                'area': self.network.area(level, set_), 'block_cell_ratio': self.network.block_cell_ratio(level, set_),
+                'continuous': continuous}
+
+
+    def qml_synthetic_dataset(self, level: str, set_: str, continuous: bool, samples_per_epoch: int = Default.synthetic_samples,
+                              batch_size: int = 32, seed: int = None) -> SyntheticPhaseDataset:
+        '''the training data of a set in the two level QML method, generated in memory instead of train_quantum_ml_two(_continuous)
+        Args:
+            level             -- e.g. 'level-0'
+            set_              -- e.g. 'set-0'
+            continuous        -- the continuous (regression) or the discrete (classification) case
+            samples_per_epoch -- the number of samples of an epoch
+            batch_size        -- the number of samples of a batch
+            seed              -- the seed of the random generators, None for never repeating samples
+        Return:
+            SyntheticPhaseDataset
+        '''
+        sensors = self.network.sensor_coordinates(self.network.sensors(level, set_))
+        area = self.network.area(level, set_)
+        block_cell_ratio = self.network.block_cell_ratio(level, set_)
+        a, b = area[0], area[1]  # a is top left, b is bottom right
+        if continuous:
+            cells = self.get_txloc(a, b, 1)   # for the continuous case, tx are everywhere
+            return SyntheticPhaseDataset(self.unitary_operator, sensors, cells, origin=a, area_length=b[0] - a[0], exclusion=5,
+                                         exclusion_sensors=self.network.coordinates, cell_length=self.cell_length,
+                                         samples_per_epoch=samples_per_epoch, batch_size=batch_size, seed=seed)
+        cells, labels = [], []
+        for i, block_center in enumerate(self.get_txloc(a, b, block_cell_ratio)):
+            txs = self.generate_tx_qml_two(block_center, block_cell_ratio)
+            cells.extend(txs)
+            labels.extend([i] * len(txs))
+        return SyntheticPhaseDataset(self.unitary_operator, sensors, cells, labels, cell_length=self.cell_length,
+                                     samples_per_epoch=samples_per_epoch, batch_size=batch_size, seed=seed)
+
+
+    def qml_model_file(self, level_i: int, set_i: int, root_dir: str) -> str:
+        '''the model filename of a level and set in the two level QML method
+        '''
+        model_dir = os.path.join(os.getcwd(), root_dir.replace('data', 'model'), f'level-{level_i}-set-{set_i}')
+        return os.path.join(model_dir, 'model.pt')
+
+
     def load_qml_model(self, level_i: int, set_i: int, root_dir: str) -> tq.QuantumModule:
         '''given the level and set index, return the according QML model
         Args:
@@ -783,37 +1116,51 @@ class QuantumLocalization:
         Return:
             the QML model
         '''
-        model_dir = os.path.join(os.getcwd(), root_dir.replace('data', 'model'), f'level-{level_i}-set-{set_i}')
-        model_file = os.path.join(model_dir, 'model.pt')
-        if os.path.exists(model_file) is False:
-            raise Exception(f'model does not exist: {model_file}')
-        with open(model_file, 'rb') as f:
-            use_cuda = torch.cuda.is_available()
-            device = torch.device('cuda' if use_cuda else 'cpu')
-            model = pickle.load(f)
-            model.to(device)
-            model.eval()
-        return model
+        return self.load_qml_model_filename(self.qml_model_file(level_i, set_i, root_dir))
 
 
     def load_qml_model_filename(self, model_file: str) -> tq.QuantumModule:
-        '''given the filename of the model, return the according QML model
+        '''given the filename of the model, return the according QML model, through the model cache
         Args:
             model_file -- the filename (including directory)
         Return:
             the QML model
         '''
-        if os.path.exists(model_file) is False:
+        if ModelArtifact.exists(model_file) is False:
             raise Exception(f'model does not exist: {model_file}')
-        with open(model_file, 'rb') as f:
-            use_cuda = torch.cuda.is_available()
-            device = torch.device('cuda' if use_cuda else 'cpu')
-            model = pickle.load(f)
-            model.to(device)
-            model.eval()
+        json_file, _ = ModelArtifact.paths(model_file)
+        cache_file = json_file if os.path.exists(json_file) else model_file   # the modified time of the model
+        return self.model_cache.get(cache_file, lambda _: self.read_qml_model(model_file))
+
+
+    @staticmethod
+    def read_qml_model(model_file: str) -> tq.QuantumModule:
+        '''read a QML model from the disk (see ModelArtifact), move it to the device and set it to the evaluation mode
+        '''
+        use_cuda = torch.cuda.is_available()
+        device = torch.device('cuda' if use_cuda else 'cpu')
+        model = ModelArtifact.load(model_file, device)
+        model.eval()
         return model
 
 
+    def preload_qml_models(self, root_dir: str, two_level: bool):
+        '''load the QML models into the model cache before the testing phase
+        Args:
+            root_dir  -- the root directory of the training data
+            two_level -- if True, the models of all the sets of qml_two(), otherwise the model of qml()
+        '''
+        if two_level:
+            model_files = [self.qml_model_file(0, 0, root_dir)]
+            model_files += [self.qml_model_file(1, set_.split('-')[-1], root_dir) for set_ in self.network.sets('level-1')]
+        else:
+            model_files = [os.path.join(os.getcwd(), root_dir.replace('data', 'model'), 'model.pt')]
+        if len(model_files) > self.model_cache.max_models:
+            print(f'warning: {len(model_files)} models, but the model cache holds {self.model_cache.max_models}')
+        for model_file in model_files:
+            self.load_qml_model_filename(model_file)
+
+
     def check_block_correct_qml(self, tx_truth: tuple, max_i: int, block_cell_ratio: int, grid_length_block) -> Tuple:
         '''check if the max_i (block index) is correct
         Args:
@@ -846,8 +1193,9 @@ class QuantumLocalization:
         # prepare model
         level_i = 0
         set_i = 0
-        set_ = self.sensordata['levels'][f'level-{level_i}'][f'set-{set_i}']
-        sensors = set_['sensors']
+        sensors = self.network.sensors(f'level-{level_i}', f'set-{set_i}')
+        area = self.network.area(f'level-{level_i}', f'set-{set_i}')
+        block_cell_ratio = self.network.block_cell_ratio(f'level-{level_i}', f'set-{set_i}')
         model_file = os.path.join(os.getcwd(), root_dir.replace('data', 'model'), 'model.pt')
         model = self.load_qml_model_filename(model_file)
         # prepare sensing data
@@ -857,14 +1205,11 @@ class QuantumLocalization:
         output = output.cpu().detach().numpy()
         if continuous is False:
             max_i = int(np.argmax(output[0]))  # numpy.int64 --> int
-            area = set_['area']
-            block_cell_ratio = set_['block_cell_ratio']
             grid_length_block = (area[1][0] - area[0][0]) // block_cell_ratio  # grid length in terms of blocks
             level0_correct, tx_level0 = self.check_block_correct_qml(tx_truth, max_i, block_cell_ratio, grid_length_block)
             print('level-0 tx', tx_level0, level0_correct)
             return level0_correct, tx_level0
         else:
-            area = set_['area']
             grid_dimension = area[1][0] - area[0][0]
             tx_level0 = (output[0][0] * grid_dimension, output[0][1] * grid_dimension)
             error = Utility.distance(tx_level0, tx_truth, self.cell_length)
@@ -897,8 +1242,9 @@ class QuantumLocalization:
         # prepare model
         level_i = 0
         set_i = 0
-        set_ = self.sensordata['levels'][f'level-{level_i}'][f'set-{set_i}']
-        sensors = set_['sensors']
+        sensors = self.network.sensors(f'level-{level_i}', f'set-{set_i}')
+        area = self.network.area(f'level-{level_i}', f'set-{set_i}')
+        block_cell_ratio = self.network.block_cell_ratio(f'level-{level_i}', f'set-{set_i}')
         model = self.load_qml_model(level_i, set_i, root_dir)
         # prepare sensing data
         q_device = self.get_sensor_data_qml(tx_truth, sensors, noise=True, Hamiltonian=True) # forgot the damn Hamiltonian!!!
@@ -907,14 +1253,11 @@ class QuantumLocalization:
         output = output.cpu().detach().numpy()
         if continuous is False:
             max_i = int(np.argmax(output[0]))  # numpy.int64 --> int
-            area = set_['area']
-            block_cell_ratio = set_['block_cell_ratio']
             grid_length_block = (area[1][0] - area[0][0]) // block_cell_ratio  # grid length in terms of blocks
             level0_correct, tx_level0 = self.check_block_correct_qml(tx_truth, max_i, block_cell_ratio, grid_length_block)
             print('level-0 tx', tx_level0, level0_correct, end='; ')
         else:
             ### directly return the result of level0
-            # area = set_['area']
             # grid_length = area[1][0] - area[0][0]
             # tx_level0 = (output[0][0] * grid_length, output[0][1] * grid_length)
             # error = Utility.distance(tx_level0, tx_truth, self.cell_length)
@@ -922,11 +1265,9 @@ class QuantumLocalization:
             # return False, error, tx_level0
             #################
             
-            area = set_['area']
             area_length = area[1][0] - area[0][0]
             self.limit_output(output)
             tx_level0 = (output[0][0] * area_length, output[0][1] * area_length)
-            block_cell_ratio = set_['block_cell_ratio']
             block = (int(tx_level0[0] / block_cell_ratio), int(tx_level0[1] / block_cell_ratio))
             grid_length_block = (area[1][0] - area[0][0]) // block_cell_ratio  # grid length in terms of blocks
             max_i = block[0] * grid_length_block + block[1]
@@ -937,8 +1278,9 @@ class QuantumLocalization:
         # prepare model
         level_i = 1
         set_i = max_i
-        set_ = self.sensordata['levels'][f'level-{level_i}'][f'set-{set_i}']
-        sensors = set_['sensors']
+        sensors = self.network.sensors(f'level-{level_i}', f'set-{set_i}')
+        area = self.network.area(f'level-{level_i}', f'set-{set_i}')
+        block_cell_ratio = self.network.block_cell_ratio(f'level-{level_i}', f'set-{set_i}')
         model = self.load_qml_model(level_i, set_i, root_dir)
         # prepare sensing data
         q_device = self.get_sensor_data_qml(tx_truth, sensors, noise=True, Hamiltonian=True) # forgot the damn Hamiltonian!!!
@@ -947,8 +1289,7 @@ class QuantumLocalization:
         output = output.cpu().detach().numpy()
         if continuous is False:
             max_i = int(np.argmax(output[0]))  # numpy.int64 --> int
-            area = set_['area']
-            block_cell_ratio = set_['block_cell_ratio']  # should be 1
+            # block_cell_ratio should be 1
             block_length = (area[1][0] - area[0][0]) // block_cell_ratio  # block length in terms of cells
             tx_relative = (max_i // block_length, max_i % block_length)
             tx_level1 = (area[0][0] + tx_relative[0] + block_cell_ratio/2, area[0][1] + tx_relative[1] + block_cell_ratio/2)
@@ -956,7 +1297,6 @@ class QuantumLocalization:
             print('level-1 tx', tx_level1, level1_correct)
             return level1_correct, tx_level1
         else:
-            area = set_['area']
             area_length = area[1][0] - area[0][0]
             tx_relative = (output[0][0] * area_length, output[0][1] * area_length)
             base = (area[0][0], area[0][1])
@@ -4,6 +4,7 @@ the main
 
 import argparse
 import time
+import multiprocessing
 import numpy as np
 from localization import QuantumLocalization
 from default import Default
@@ -11,6 +12,59 @@ from my_logger import MyLogger
 from unitary_operator import UnitaryOperator
 from input_output import Input, Output
 from utility import Utility
+from povm_cache import PovmCache
+
+
+def oracle_outputs(qls: dict, methods: list, tx_list: list, continuous: bool) -> dict:
+    '''the outputs of the POVM-Loc methods by QuantumLocalization.oracle(), i.e., the expected accuracy instead of a simulated run.
+       The Output.method is tagged, e.g. 'povmloc-oracle', so that the expected accuracy is never mixed with the simulated runs.
+       There is no per tx time and no shots, so elapse and shots are -1
+    Return:
+        method (not tagged) --> a list of Output, one for each tx in tx_list
+    '''
+    outputs = {}
+    for method in ['povmloc-one', 'povmloc', 'povmloc-pro']:
+        if method not in methods:
+            continue
+        ql = qls['povmloc-one'] if method == 'povmloc-one' else qls['povmloc']
+        start = time.time()
+        oracle = ql.oracle(method, tx_list)
+        elapse = time.time() - start
+        outputs[method] = []
+        for accuracy, error, predictions in zip(oracle['accuracy'], oracle['error'], oracle['predictions']):
+            pred = oracle['locations'][int(np.argmax(predictions))]   # the most likely prediction
+            localization_error = round(float(error), 3) if continuous else -1
+            outputs[method].append(Output(f'{method}-oracle', round(float(accuracy), 4), localization_error=localization_error, pred=pred, elapse=-1))
+        print(f'{method} oracle: mean accuracy = {np.mean(oracle["accuracy"]):.4f}, mean error = {np.mean(oracle["error"]):.3f}, time = {elapse:.2f}')
+    return outputs
+
+
+_localize = None   # the function that localizes the i-th testing tx, inherited by the forked workers
+
+
+def _localize_task(i: int) -> tuple:
+    return _localize(i)
+
+
+def evaluate(localize, num_tx: int, workers: int):
+    '''localize the testing txs, in a pool of forked processes if workers > 1.
+       The trained QuantumLocalization objects are shared with the workers copy-on-write, only the tx index and the results are pickled.
+       Every tx seeds its own random state, so the results are identical to the serial run
+    Args:
+        localize -- localize(i) returns (Input, a list of Output) of the i-th tx
+        num_tx   -- the number of testing txs
+        workers  -- the number of processes
+    Return:
+        a generator of localize(i), in the order of i
+    '''
+    if workers <= 1:
+        for i in range(num_tx):
+            yield localize(i)
+        return
+    global _localize
+    _localize = localize
+    with multiprocessing.get_context('fork').Pool(workers) as pool:
+        yield from pool.imap(_localize_task, range(num_tx))
 
 
 
@@ -22,10 +76,22 @@ if __name__ == '__main__':
     parser.add_argument('-s', '--sensor_num', type=int, nargs=1, default=[Default.sensor_num])
     parser.add_argument('-c', '--continuous', action='store_true', default=False, help='whether the testing locations are continuous or discrete')
     parser.add_argument('-n', '--noise', type=float, nargs=1, default=[Default.std], help='the standard deviation of the zero mean shadowing')
+    parser.add_argument('-en', '--E_noise_perc', type=float, nargs=1, default=[Default.E_noise_perc], help='the electric field noise in percentage, 0 means noise free sensing')
     parser.add_argument('-od', '--output_dir', type=str, nargs=1, default=[Default.output_dir], help='the directory of the logged outputs')
     parser.add_argument('-of', '--output_file', type=str, nargs=1, default=[Default.output_file], help='the filename of the logged outputs')
     parser.add_argument('-rd', '--root_dir', type=str, nargs=1, default=[Default.root_dir], help='the root directory for training data in the quantum ml method')
     parser.add_argument('-gd', '--generate_data', action='store_true', default=False, help='generate new training data, for QML')
+    parser.add_argument('-ov', '--overlap', action='store_true', default=False, help='POVM-Loc by the overlaps of the sensing states, no 2^N state vectors')
+    parser.add_argument('-pc', '--povm_cache', type=str, nargs=1, default=[Default.povm_cache_dir], help='the directory of the trained POVM cache')
+    parser.add_argument('-nc', '--no_cache', action='store_true', default=False, help='always train the POVMs, do not use the POVM cache')
+    parser.add_argument('-tw', '--train_workers', type=int, nargs=1, default=[Default.train_workers], help='the number of processes that train the POVMs')
+    parser.add_argument('-bt', '--blas_threads', type=int, nargs=1, default=[Default.blas_threads], help='the number of BLAS threads per training process')
+    parser.add_argument('-sr', '--stop_rule', type=str, nargs=1, default=[Default.stop_rule], help='the early stop rule of the sensing protocol, heuristic or bayes')
+    parser.add_argument('-se', '--stop_error', type=float, nargs=1, default=[Default.stop_error], help='the target error of the bayes early stop rule')
+    parser.add_argument('-et', '--eager_train', action='store_true', default=False, help='train all the POVMs up front, instead of on the first use')
+    parser.add_argument('-w', '--workers', type=int, nargs=1, default=[Default.test_workers], help='the number of processes that localize the testing txs in parallel')
+    parser.add_argument('-pm', '--preload_models', action='store_true', default=False, help='load all the QML models before the testing phase')
+    parser.add_argument('-or', '--oracle', action='store_true', default=False, help='POVM-Loc outputs the expected accuracy computed from the POVMs, no simulation. Logged as {method}-oracle')
 
     args         = parser.parse_args()
     methods      = args.methods
@@ -35,19 +101,25 @@ if __name__ == '__main__':
     noise        = args.noise[0]
     output_dir   = args.output_dir[0]
     output_file  = args.output_file[0]
+    overlap      = args.overlap
+    povm_cache   = None if args.no_cache else PovmCache(args.povm_cache[0])
     
-    unitary_operator = UnitaryOperator(Default.pathloss_expo, noise, Default.power_ref)
+    unitary_operator = UnitaryOperator(Default.pathloss_expo, noise, Default.power_ref, args.E_noise_perc[0])
     ## training phase ##
     qls = {}
     if 'povmloc-one' in methods:
         sensordata = f'sensordata/onelevel.{grid_length}x{grid_length}.{sensor_num}.json'
-        ql = QuantumLocalization(grid_length=grid_length, cell_length=Default.cell_length, sensordata=sensordata, unitary_operator=unitary_operator)
-        ql.train_povmloc_one()
+        ql = QuantumLocalization(grid_length=grid_length, cell_length=Default.cell_length, sensordata=sensordata, unitary_operator=unitary_operator,
+                                 povm_cache=povm_cache)
+        ql.train_povmloc_one(overlap)
+        ql.stop_rule, ql.stop_error = args.stop_rule[0], args.stop_error[0]
         qls['povmloc-one'] = ql
     if 'povmloc' in methods or 'povmloc-pro' in methods:
         sensordata = f'sensordata/twolevel.{grid_length}x{grid_length}.{sensor_num}.json'
-        ql = QuantumLocalization(grid_length=grid_length, cell_length=Default.cell_length, sensordata=sensordata, unitary_operator=unitary_operator)
-        ql.train_povmloc()
+        ql = QuantumLocalization(grid_length=grid_length, cell_length=Default.cell_length, sensordata=sensordata, unitary_operator=unitary_operator,
+                                 povm_cache=povm_cache)
+        ql.train_povmloc(overlap, workers=args.train_workers[0], blas_threads=args.blas_threads[0], lazy=not args.eager_train)
+        ql.stop_rule, ql.stop_error = args.stop_rule[0], args.stop_error[0]
         qls['povmloc'] = ql
     if 'qml' in methods:
         sensordata = f'sensordata/onelevel.{grid_length}x{grid_length}.{sensor_num}.json'
@@ -59,6 +131,8 @@ if __name__ == '__main__':
                 ql.train_quantum_ml_continuous(root_dir, generate_data)
             else:
                 ql.train_quantum_ml(root_dir, generate_data)
+        elif args.preload_models:
+            ql.preload_qml_models(root_dir, two_level=False)
         qls['qml'] = ql
     if 'qml-two' in methods:
         sensordata = f'sensordata/twolevel.{grid_length}x{grid_length}.{sensor_num}.json'
@@ -70,37 +144,47 @@ if __name__ == '__main__':
                 ql.train_quantum_ml_two_continuous(root_dir)
             else:
                 ql.train_quantum_ml_two(root_dir)
+        elif args.preload_models:
+            ql.preload_qml_models(root_dir, two_level=True)
         qls['qml-two'] = ql
 
 
     ## testing phase ##
+    workers = args.workers[0]
+    if workers > 1:   # train the lazy POVMs before forking, so that the workers share them instead of training their own
+        for ql in qls.values():
+            list(ql.povms.values())
     mylogger = MyLogger(output_dir, output_file)
     if continuous == False:
         # testing discrete
         tx_list = [(x + 0.5, y + 0.5) for x in range(grid_length) for y in range(grid_length)]
-        for i, tx in enumerate(tx_list):
+        oracles = oracle_outputs(qls, methods, tx_list, continuous=False) if args.oracle else {}
+        def localize(i: int) -> tuple:
+            tx = tx_list[i]
             # if i <= 225:
             #     continue
             myinput = Input(tx, grid_length, sensor_num, noise, continuous)
             outputs = []
-            if 'povmloc-one' in methods:
+            if 'povmloc-one' in methods and 'povmloc-one' not in oracles:
                 ql = qls['povmloc-one']
                 start = time.time()
                 correct, pred = ql.povmloc_one(tx)
                 elapse = round(time.time() - start, 2)
-                outputs.append(Output('povmloc-one', correct, localization_error=-1, pred=pred, elapse=elapse))
-            if 'povmloc' in methods:
+                outputs.append(Output('povmloc-one', correct, localization_error=-1, pred=pred, elapse=elapse, shots=ql.shots))
+            if 'povmloc' in methods and 'povmloc' not in oracles:
                 ql = qls['povmloc']
                 start = time.time()
                 correct, pred = ql.povmloc(tx)
                 elapse = round(time.time() - start, 2)
-                outputs.append(Output('povmloc', correct, localization_error=-1, pred=pred, elapse=elapse))
-            if 'povmloc-pro' in methods:
-                ql = qls['povmloc']
+                outputs.append(Output('povmloc', correct, localization_error=-1, pred=pred, elapse=elapse, shots=ql.shots))
+            if 'povmloc-pro' in methods and 'povmloc-pro' not in oracles:
+                ql = qls['povmloc']   # continues from the level 0 and level 1 results of povmloc for the same tx
                 start = time.time()
                 correct, pred = ql.povmloc_pro(tx)
                 elapse = round(time.time() - start, 2)
-                outputs.append(Output('povmloc-pro', correct, localization_error=-1, pred=pred, elapse=elapse))
+                outputs.append(Output('povmloc-pro', correct, localization_error=-1, pred=pred, elapse=elapse, shots=ql.shots))
+            for method in oracles:
+                outputs.append(oracles[method][i])
             if 'qml' in methods:
                 if not args.generate_data:
                     ql = qls['qml']
@@ -119,8 +203,9 @@ if __name__ == '__main__':
                     elapse = round(time.time() - start, 2)
                     outputs.append(Output('qml-c-two', correct, localization_error=-1, pred=pred, elapse=elapse))
 
+            return myinput, outputs
+        for myinput, outputs in evaluate(localize, len(tx_list), workers):
             mylogger.log(myinput, outputs)
-            # time.sleep(0.5)
     else:
         # testing: continuous
         np.random.seed(1)
@@ -131,29 +216,33 @@ if __name__ == '__main__':
             tx_list.extend(Utility.generate_tx_list('filter-5meter', grid_length, sensordata))
             if (grid_length <= 10 and len(tx_list) > 100) or grid_length > 10:
                 break
-        for i, tx in enumerate(tx_list):
+        oracles = oracle_outputs(qls, methods, tx_list, continuous=True) if args.oracle else {}
+        def localize(i: int) -> tuple:
+            tx = tx_list[i]
             # if i > 3:
             #     continue
             myinput = Input((round(tx[0], 3), round(tx[1], 3)), grid_length, sensor_num, noise, continuous)
             outputs = []
-            if 'povmloc-one' in methods:
+            if 'povmloc-one' in methods and 'povmloc-one' not in oracles:
                 ql = qls['povmloc-one']
                 start = time.time()
                 correct, error, pred = ql.povmloc_one(tx, continuous=True)
                 elapse = round(time.time() - start, 2)
-                outputs.append(Output('povmloc-one', correct, localization_error=round(error, 3), pred=pred, elapse=elapse))
-            if 'povmloc' in methods:
+                outputs.append(Output('povmloc-one', correct, localization_error=round(error, 3), pred=pred, elapse=elapse, shots=ql.shots))
+            if 'povmloc' in methods and 'povmloc' not in oracles:
                 ql = qls['povmloc']
                 start = time.time()
                 correct, error, pred = ql.povmloc(tx, continuous=True)
                 elapse = round(time.time() - start, 2)
-                outputs.append(Output('povmloc', correct, localization_error=round(error, 3), pred=pred, elapse=elapse))
-            if 'povmloc-pro' in methods:
-                ql = qls['povmloc']
+                outputs.append(Output('povmloc', correct, localization_error=round(error, 3), pred=pred, elapse=elapse, shots=ql.shots))
+            if 'povmloc-pro' in methods and 'povmloc-pro' not in oracles:
+                ql = qls['povmloc']   # continues from the level 0 and level 1 results of povmloc for the same tx
                 start = time.time()
                 correct, error, pred = ql.povmloc_pro(tx, continuous=True)
                 elapse = round(time.time() - start, 2)
-                outputs.append(Output('povmloc-pro', correct, localization_error=round(error, 3), pred=pred, elapse=elapse))
+                outputs.append(Output('povmloc-pro', correct, localization_error=round(error, 3), pred=pred, elapse=elapse, shots=ql.shots))
+            for method in oracles:
+                outputs.append(oracles[method][i])
             if 'qml' in methods:
                 if not args.generate_data:
                     ql = qls['qml']
@@ -170,8 +259,9 @@ if __name__ == '__main__':
                     correct, error, pred = ql.qml_two(tx, root_dir, continuous=True)
                     elapse = round(time.time() - start, 2)
                     outputs.append(Output('qml-r-two', correct, error, pred, elapse))
+            return myinput, outputs
+        for myinput, outputs in evaluate(localize, len(tx_list), workers):
             mylogger.log(myinput, outputs)
-            # time.sleep(0.5)
 
 
 # python main.py -m qml-two -l 40 -s 20 -n 1 -rd qml-data/40x40.two.H.cont -gd -c
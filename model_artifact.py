@@ -0,0 +1,159 @@
+'''
+The saved QML models: an architecture descriptor and a flat, memory mappable container of the tensors, instead of pickling the whole module
+'''
+
+import os
+import glob
+import inspect
+import json
+import pickle
+import argparse
+import numpy as np
+import torch
+from qnn import QuantumMLclassification, QuantumMLregression, QuantumMLclassificationIBM, QuantumMLregressionIBM
+
+
+class ModelArtifact:
+    '''A model saved as model.pt is stored next to it as
+           model.json -- {'version', 'class', 'n_wires', 'n_blocks', 'n_locations', 'tensors': {name: {'dtype', 'shape', 'offset'}}}
+           model.bin  -- the tensors of the state_dict, back to back (aligned), opened by np.memmap
+       Loading only needs the class in qnn.py. With torch >= 2.1 the parameters of a loaded model are the memory mapped tensors
+       (load_state_dict(assign=True)), so the processes that load the same model share the pages of its .bin file until they write them.
+       With an older torch, load_state_dict copies the tensors and every loaded model has its own copy of the weights.
+       The pickled model.pt is still loaded if there is no artifact, see migrate() for the existing models
+    '''
+    version = 1
+    alignment = 64
+    assign = 'assign' in inspect.signature(torch.nn.Module.load_state_dict).parameters   # torch >= 2.1
+    classes = {    # class name --> (class, the arguments of the constructor)
+        'QuantumMLclassification': (QuantumMLclassification, ['n_wires', 'n_locations']),
+        'QuantumMLregression': (QuantumMLregression, ['n_wires']),
+        'QuantumMLclassificationIBM': (QuantumMLclassificationIBM, ['n_wires', 'n_locations']),
+        'QuantumMLregressionIBM': (QuantumMLregressionIBM, ['n_wires']),
+    }
+
+    @staticmethod
+    def paths(model_file: str) -> tuple:
+        '''the .json and .bin filenames of a model filename, e.g. model.pt --> (model.json, model.bin)
+        '''
+        stem = os.path.splitext(model_file)[0]
+        return f'{stem}.json', f'{stem}.bin'
+
+    @staticmethod
+    def exists(model_file: str) -> bool:
+        '''whether the model can be loaded, either as an artifact or as a pickled model
+        '''
+        return os.path.exists(ModelArtifact.paths(model_file)[0]) or os.path.exists(model_file)
+
+    @staticmethod
+    def architecture(model: torch.nn.Module) -> dict:
+        '''the architecture descriptor of a model
+        '''
+        name = type(model).__name__
+        if name not in ModelArtifact.classes:
+            raise Exception(f'model class {name} not supported')
+        return {'class': name, 'n_wires': model.n_wires, 'n_blocks': model.arch['n_blocks'], 'n_locations': model.linear.out_features}
+
+    @staticmethod
+    def save(model: torch.nn.Module, model_file: str):
+        '''save a model as an artifact
+        Args:
+            model      -- one of ModelArtifact.classes
+            model_file -- e.g. qml-model/16x16.8.two/level-1-set-0/model.pt
+        '''
+        json_file, bin_file = ModelArtifact.paths(model_file)
+        meta = {'version': ModelArtifact.version, **ModelArtifact.architecture(model), 'tensors': {}}
+        tmp_bin = f'{bin_file}.{os.getpid()}.tmp'    # write then rename, a test process may be loading the model
+        with open(tmp_bin, 'wb') as f:
+            offset = 0
+            for name, tensor in model.state_dict().items():
+                array = np.ascontiguousarray(tensor.detach().cpu().numpy())
+                padding = -offset % ModelArtifact.alignment
+                f.write(b'\0' * padding)
+                offset += padding
+                meta['tensors'][name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+                f.write(array.tobytes())
+                offset += array.nbytes
+        tmp_json = f'{json_file}.{os.getpid()}.tmp'
+        with open(tmp_json, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_bin, bin_file)
+        os.replace(tmp_json, json_file)    # the .json is the last, its modified time is the time of the model
+
+    @staticmethod
+    def tensors(model_file: str) -> dict:
+        '''the tensors of an artifact, memory mapped (copy-on-write) and read lazily
+        Return:
+            name --> np.array
+        '''
+        json_file, bin_file = ModelArtifact.paths(model_file)
+        with open(json_file, 'r') as f:
+            meta = json.load(f)
+        if meta['version'] != ModelArtifact.version:
+            raise Exception(f'model artifact version {meta["version"]} not supported: {json_file}')
+        if os.path.getsize(bin_file) == 0:
+            return {name: np.zeros(info['shape'], dtype=info['dtype']) for name, info in meta['tensors'].items()}
+        buffer = np.memmap(bin_file, dtype=np.uint8, mode='c')
+        return {name: np.ndarray(info['shape'], dtype=info['dtype'], buffer=buffer, offset=info['offset'])
+                for name, info in meta['tensors'].items()}
+
+    @staticmethod
+    def load(model_file: str, device: torch.device = None) -> torch.nn.Module:
+        '''rebuild a model from its artifact, or unpickle model_file if there is no artifact
+        Args:
+            model_file -- e.g. qml-model/16x16.8.two/level-1-set-0/model.pt
+            device     -- move the model to the device. If None, the model stays on the cpu (a pickled model stays where it was saved)
+        Return:
+            the model, in the training mode like a freshly constructed (or unpickled) model.
+            On the cpu, its parameters are the memory mapped tensors if ModelArtifact.assign, see tensors()
+        '''
+        json_file, _ = ModelArtifact.paths(model_file)
+        if os.path.exists(json_file):
+            with open(json_file, 'r') as f:
+                meta = json.load(f)
+            if meta['class'] not in ModelArtifact.classes:
+                raise Exception(f'model class {meta["class"]} not supported: {json_file}')
+            cls, arguments = ModelArtifact.classes[meta['class']]
+            model = cls(**{argument: meta[argument] for argument in arguments})
+            if model.arch['n_blocks'] != meta['n_blocks']:
+                raise Exception(f'{meta["class"]} has {model.arch["n_blocks"]} blocks, the artifact has {meta["n_blocks"]}: {json_file}')
+            state_dict = {name: torch.from_numpy(array) for name, array in ModelArtifact.tensors(model_file).items()}
+            if ModelArtifact.assign:
+                model.load_state_dict(state_dict, assign=True)
+            else:
+                model.load_state_dict(state_dict)
+        else:
+            with open(model_file, 'rb') as f:
+                model = pickle.load(f)
+        if device is not None:
+            model.to(device)
+        return model
+
+    @staticmethod
+    def migrate(root_dir: str, remove: bool = False) -> list:
+        '''convert the pickled models {root_dir}/**/*.pt to artifacts
+        Args:
+            root_dir -- e.g. qml-model
+            remove   -- whether to remove the pickled model after the conversion
+        Return:
+            the converted model filenames
+        '''
+        converted = []
+        for model_file in sorted(glob.glob(os.path.join(root_dir, '**', '*.pt'), recursive=True)):
+            with open(model_file, 'rb') as f:
+                model = pickle.load(f)
+            ModelArtifact.save(model, model_file)
+            converted.append(model_file)
+            print(f'{model_file} --> {ModelArtifact.paths(model_file)}')
+            if remove:
+                os.remove(model_file)
+        return converted
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Convert the pickled QML models to model artifacts')
+    parser.add_argument('-rd', '--root_dir', type=str, nargs=1, default=['qml-model'], help='the directory of the pickled models, searched recursively')
+    parser.add_argument('-rm', '--remove', action='store_true', default=False, help='remove the pickled models after the conversion')
+    args = parser.parse_args()
+    ModelArtifact.migrate(args.root_dir[0], args.remove)
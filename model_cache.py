@@ -0,0 +1,64 @@
+'''
+The loaded QML models, so that the inference of every TX does not load the model from the disk
+'''
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable
+from default import Default
+
+
+class ModelCache:
+    '''A least recently used cache of the loaded models, keyed by the model file and its modified time.
+       A model file that is modified (e.g. retrained) is loaded again.
+       ModelCache.shared() is the process-wide cache, forked processes inherit the loaded models copy-on-write
+    '''
+    _shared = None
+
+    def __init__(self, max_models: int = Default.model_cache_size):
+        '''
+        Args:
+            max_models -- the maximum number of loaded models, the least recently used are evicted
+        '''
+        self.max_models = max_models
+        self._models = OrderedDict()    # absolute path --> (mtime, model)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def shared(cls) -> 'ModelCache':
+        '''the process-wide cache
+        '''
+        if cls._shared is None:
+            cls._shared = cls()
+        return cls._shared
+
+    def get(self, model_file: str, loader: Callable[[str], object]):
+        '''return the model of a file, loader(model_file) loads it if it is not in the cache or the file is modified
+        Args:
+            model_file -- the filename of the model
+            loader     -- loads the model from the file
+        '''
+        path = os.path.abspath(model_file)
+        mtime = os.stat(path).st_mtime_ns
+        with self._lock:
+            if path in self._models and self._models[path][0] == mtime:
+                self._models.move_to_end(path)
+                return self._models[path][1]
+        model = loader(path)
+        with self._lock:
+            self._models[path] = (mtime, model)
+            self._models.move_to_end(path)
+            while len(self._models) > self.max_models:
+                self._models.popitem(last=False)
+        return model
+
+    def __contains__(self, model_file: str) -> bool:
+        return os.path.abspath(model_file) in self._models
+
+    def __len__(self) -> int:
+        return len(self._models)
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
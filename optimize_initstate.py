@@ -1,9 +1,8 @@
-import copy
 import numpy as np
 from typing import Tuple
 from qiskit_textbook.tools import random_state
 from qiskit.quantum_info.operators.operator import Operator
-from quantum_state import QuantumState
+from quantum_state import QuantumState, StateBatch
 from povm import Povm
 
 
@@ -31,21 +30,18 @@ class OptimizeInitialState:
         '''evaluate a qstate using pretty good measurement and simulation
         Args:
             init_state -- the initial state to be evaluated
-            evolution_operators -- a list of unitary operators
+            evolution_operators -- a list of unitary operators, or the diagonals of diagonal unitary operators (see Utility.rz_diagonal)
             priors -- a list of priors
             povm   -- positive operator valued measurement
         Return:
-            (score, a list povm operator elements)
+            (score, the measurement vectors of the rank one povm, see Povm.vectors)
         '''
-        quantum_states = []
-        for operator in evolution_operators:
-            init_state_copy = copy.deepcopy(init_state)
-            init_state_copy.evolve(operator)
-            quantum_states.append(init_state_copy)
+        quantum_states = StateBatch(init_state.num_sensor, np.tile(init_state.state_vector, (len(evolution_operators), 1)))
+        quantum_states.evolve(list(evolution_operators))   # one evolution operator for each copy of the initial state
         povm.pretty_good_measurement(quantum_states, priors, debug=False)
         # error = povm.simulate(quantum_states, priors, seed=0, repeat=1000)
         accuracy = povm.compute_theoretical_accuracy(quantum_states, priors)
-        return accuracy.real, povm.operators
+        return accuracy.real, povm.vectors
 
 
     def _find_neighbor(self, qstate: QuantumState, i: int, step_size: float) -> QuantumState:
@@ -74,7 +70,7 @@ class OptimizeInitialState:
         '''optimize the initial state by simulated annealing
         Args:
             num_sensor -- number of sensors
-            evolution_operators -- a list of unitary operators
+            evolution_operators -- a list of unitary operators, or the diagonals of diagonal unitary operators
         Return:
             (the initial state, list of povm operators)
         '''
@@ -129,4 +125,4 @@ class OptimizeInitialState:
             temperature = min(temperature * cooling_rate, std * std_ratio)
             stepsize *= stepsize_decreasing_rate
         
-        return qstate, povm_operators1
+        return qstate, Povm.rank_one_operators(povm_operators1)
@@ -0,0 +1,48 @@
+'''
+Closed-form overlaps between the sensing states, without the 2^N state vectors
+'''
+
+import numpy as np
+
+
+class OverlapKernel:
+    '''Every sensing state is the tensor product RZ(phase_j)|+> over the sensors j, see Utility.rz_product_state.
+       For each sensor, <+|RZ(a)^dagger RZ(b)|+> = (exp(i(a-b)/2) + exp(-i(a-b)/2)) / 2 = cos((a-b)/2), so
+           <psi(a)|psi(b)> = prod_j cos((a_j - b_j)/2)
+       which is real (the global phase is exactly one with the RZ convention of UnitaryOperator).
+       The cost is O(A*B*N) for A x B overlaps of N sensors, so it also works for 30+ sensors.
+    '''
+    max_elements = 2**24    # bound the A * B * N temporary array of a batch
+
+    @staticmethod
+    def overlaps(phases_a: np.array, phases_b: np.array) -> np.array:
+        '''the overlaps <psi(a)|psi(b)> between two batches of sensing states, e.g. shots x hypotheses
+        Args:
+            phases_a -- shape (A, N) or (N,), the phase shifts of the sensors, e.g. from UnitaryOperator.compute_H_batch
+            phases_b -- shape (B, N) or (N,)
+        Return:
+            np.array -- shape (A, B), real
+        '''
+        phases_a = np.atleast_2d(np.asarray(phases_a, dtype=float))
+        phases_b = np.atleast_2d(np.asarray(phases_b, dtype=float))
+        if phases_a.shape[1] != phases_b.shape[1]:
+            raise Exception('the two batches of phases do not have the same number of sensors')
+        A, N = phases_a.shape
+        B = phases_b.shape[0]
+        half_b = 0.5 * phases_b
+        chunk = max(1, OverlapKernel.max_elements // max(1, B * N))
+        overlaps = np.empty((A, B))
+        for start in range(0, A, chunk):
+            half_a = 0.5 * phases_a[start:start + chunk]
+            np.prod(np.cos(half_a[:, np.newaxis, :] - half_b[np.newaxis, :, :]), axis=2, out=overlaps[start:start + chunk])
+        return overlaps
+
+    @staticmethod
+    def gram(phases: np.array) -> np.array:
+        '''the Gram matrix G_ij = <psi_i|psi_j> of K hypotheses
+        Args:
+            phases -- shape (K, N)
+        Return:
+            np.array -- shape (K, K), real symmetric with unit diagonal
+        '''
+        return OverlapKernel.overlaps(phases, phases)
@@ -3,14 +3,14 @@ Positive operator valued measurement
 '''
 
 import math
-import random
 import numpy as np
 import cvxpy as cp
-from itertools import accumulate
-from bisect import bisect_left
 from scipy.linalg import sqrtm
+from scipy.special import ndtri
 from qiskit.quantum_info.operators.operator import Operator
 from utility import Utility
+from overlap_kernel import OverlapKernel
+from quantum_state import StateBatch
 from default import Default
 
 
@@ -18,14 +18,57 @@ class Povm:
     '''encapsulate positive operator valued measurement
     '''
     def __init__(self, operators: list = None):
-        self._operators = operators   # a list of Operator
+        self._elements = None if operators is None else np.ascontiguousarray([operator.data for operator in operators])  # shape (K, d, d)
+        self._vectors = None          # shape (K, d), the rank one elements P_i = |w_i><w_i|, in place of self._elements
+        self._overlap = None          # (hypothesis phases (K, N), coefficients (K, K)), w_i = sum_k coefficients[k, i] psi_k, in place of self._vectors
         self._method = ''
         self._theoretical_error = -1
         self._theoretical_success = -1
 
     @property
     def operators(self):
-        return self._operators
+        '''the POVM elements as a list of Operator. For a rank one POVM, the dense operators are materialized on request
+        '''
+        if self._vectors is not None or self._overlap is not None:
+            return self.rank_one_operators(self.vectors)
+        if self._elements is None:
+            return None
+        return [Operator(element) for element in self._elements]
+
+    @property
+    def elements(self) -> np.array:
+        '''the POVM elements stacked into one contiguous array of shape (K, d, d). For a rank one POVM, materialized on request
+        '''
+        if self._vectors is not None or self._overlap is not None:
+            vectors = self.vectors
+            return np.einsum('ki,kj->kij', vectors, np.conj(vectors))
+        return self._elements
+
+    @property
+    def vectors(self):
+        '''the measurement vectors w_i of a rank one POVM, P_i = |w_i><w_i|. None if the POVM is not stored as rank one.
+           For a POVM stored by overlaps, the vectors are materialized on request (2^N dimensional)
+        '''
+        if self._overlap is not None:
+            hypothesis_phases, coefficients = self._overlap
+            return coefficients.T @ Utility.rz_product_state(hypothesis_phases)
+        return self._vectors
+
+    @property
+    def num_elements(self) -> int:
+        '''the number of POVM elements, i.e., measurement outcomes
+        '''
+        if self._overlap is not None:
+            return len(self._overlap[1])
+        if self._vectors is not None:
+            return len(self._vectors)
+        return len(self._elements)
+
+    @staticmethod
+    def rank_one_operators(vectors: np.array) -> list:
+        '''materialize the dense operators |w_i><w_i| from the measurement vectors
+        '''
+        return [Operator(np.outer(w, np.conj(w))) for w in vectors]
 
     @property
     def theoretical_error(self):
@@ -39,83 +82,198 @@ class Povm:
     def method(self):
         return self._method
 
+    def to_arrays(self) -> dict:
+        '''the arrays that define the POVM, in its compact representation, see from_arrays()
+        '''
+        if self._overlap is not None:
+            return {'hypothesis_phases': self._overlap[0], 'coefficients': self._overlap[1]}
+        if self._vectors is not None:
+            return {'vectors': self._vectors}
+        return {'operators': self._elements}
+
+    @classmethod
+    def from_arrays(cls, arrays: dict, method: str = '') -> 'Povm':
+        '''build a POVM from the output of to_arrays(), the arrays can be memory mapped
+        '''
+        povm = cls()
+        if 'coefficients' in arrays:
+            povm._overlap = (arrays['hypothesis_phases'], arrays['coefficients'])
+        elif 'vectors' in arrays:
+            povm._vectors = arrays['vectors']
+        else:
+            povm._elements = arrays['operators']
+        povm._method = method
+        return povm
+
     def __str__(self):
         string = ''
-        for M in self._operators:
+        for M in self.operators:
             string += str(M.data) + '\n\n'
         return string
 
-    def _sample(self, prefix):
-        '''sample from a prefix sum array (the total summation is one)
+    def probabilities(self, state_vectors: np.array) -> np.array:
+        '''the probability of each measurement outcome, Re<psi|P_k|psi>, for one or a batch of pure states
+           For a rank one POVM, it is |<w_k|psi>|^2, which is O(K*d) instead of O(K*d^2)
+        Args:
+            state_vectors -- shape (d,) or (B, d), or a StateBatch
         Return:
-            int: the index of the randomly picked quantum state
+            np.array -- shape (K,) or (B, K)
         '''
-        pick = random.random()
-        return bisect_left(prefix, pick)
+        if isinstance(state_vectors, StateBatch):
+            state_vectors = state_vectors.state_vectors
+        state_vectors = np.asarray(state_vectors)
+        batch = np.atleast_2d(state_vectors)
+        if self._vectors is not None or self._overlap is not None:
+            probs = np.abs(batch @ np.conj(self.vectors).T) ** 2
+        else:
+            probs = np.einsum('bi,kij,bj->bk', np.conj(batch), self._elements, batch, optimize=True).real
+        return probs if state_vectors.ndim == 2 else probs[0]
 
-    def simulate(self, quantum_states: list, priors: list, seed: int = 0, repeat: int = 10_000):
-        '''repeat the single-shot measurement many times
+    def probabilities_mixed(self, density_matrices: np.array) -> np.array:
+        '''the probability of each measurement outcome, Re tr(P_k rho) = Re sum(P_k * rho^T), for one or a batch of mixed states
+        Args:
+            density_matrices -- shape (d, d) or (B, d, d)
         Return:
-            float: the error probability
+            np.array -- shape (K,) or (B, K)
+        '''
+        density_matrices = np.asarray(density_matrices)
+        batch = density_matrices.reshape((-1,) + density_matrices.shape[-2:])
+        if self._vectors is not None or self._overlap is not None:
+            vectors = self.vectors
+            probs = np.einsum('ki,bij,kj->bk', np.conj(vectors), batch, vectors, optimize=True).real
+        else:
+            probs = np.einsum('kij,bji->bk', self._elements, batch, optimize=True).real
+        return probs if density_matrices.ndim == 3 else probs[0]
+
+    def probabilities_from_phases(self, phases: np.array) -> np.array:
+        '''the probability of each measurement outcome for one or a batch of sensing states, i.e., RZ(phase_j)|+> at each sensor
+           For a POVM stored by overlaps, no 2^N state vector is formed: |<w_i|phi>|^2 = |sum_k coefficients[k, i] <psi_k|phi>|^2
+        Args:
+            phases -- shape (N,) or (B, N), the phase shifts at the sensors
+        Return:
+            np.array -- shape (K,) or (B, K)
         '''
-        memory = {}
-        def compute_prob(pick: int, density_operator: Operator, i: int, Pi: Operator):
-            '''use memory to save time
-            '''
-            if (pick, i) in memory:
-                return memory[(pick, i)]
-            tmp = Pi.dot(density_operator)
-            prob = np.trace(tmp.data)
-            memory[(pick, i)] = prob
-            return prob
-
-        random.seed(seed)
-        prior_prefix = list(accumulate(priors))
-        index = 0
+        phases = np.asarray(phases, dtype=float)
+        if self._overlap is None:
+            probs = self.probabilities(StateBatch.from_phases(phases))
+        else:
+            hypothesis_phases, coefficients = self._overlap
+            probs = (OverlapKernel.overlaps(phases, hypothesis_phases) @ coefficients) ** 2   # the overlaps are real
+        return probs if phases.ndim == 2 else probs[0]
+
+    def confusion_matrix(self, quantum_states: list) -> np.array:
+        '''the probability of each measurement outcome given each prepared state
+        Args:
+            quantum_states -- a StateBatch, or a list of QuantumState objects
+        Return:
+            np.array -- shape (number of states, K), each row is normalized
+        '''
+        confusion = np.maximum(self.probabilities(StateBatch.as_vectors(quantum_states)), 0)
+        return confusion / confusion.sum(axis=1, keepdims=True)
+
+    def simulate_error(self, quantum_states: list, priors: list, seed: int = 0, repeat: int = 10_000, tolerance: float = None,
+                       confidence: float = 0.95, chunk: int = 1000) -> tuple:
+        '''Monte Carlo estimation of the error probability: alice prepares a state by the priors, bob measures it by the POVM.
+           The confusion matrix is computed once, then the states and the outcomes of a chunk of rounds are sampled at once
+        Args:
+            quantum_states -- a StateBatch, or a list of QuantumState objects
+            priors         -- a list of prior probabilities
+            seed           -- the seed of the random generator
+            repeat         -- the maximum number of rounds
+            tolerance      -- stop once the half width of the confidence interval is at most tolerance. If None, do all the rounds
+            confidence     -- the confidence level of the (Wilson score) interval
+            chunk          -- the number of rounds sampled at once
+        Return:
+            (error probability, (lower bound, upper bound) of the confidence interval, number of rounds)
+        '''
+        confusion = self.confusion_matrix(quantum_states)
+        priors = np.array(priors, dtype=float) / np.sum(priors)
+        rng = np.random.default_rng(seed)
+        z = ndtri((1 + confidence) / 2)
+        rounds = 0
         error_count = 0
-        while index < repeat:
-            # step 1: alice sample a quantum state during preparation, and send to bob
-            pick = self._sample(prior_prefix)
-            prepared_quantum_state = quantum_states[pick]
-
-            # step 2: bob receives the quantum state and does the measurement
-            probs = []
-            for i, Pi in enumerate(self._operators):
-                density_operator = Operator(prepared_quantum_state.density_matrix)
-                # tmp = Pi.dot(density_operator)
-                # prob = np.trace(tmp.data)
-                prob = compute_prob(pick, density_operator, i, Pi)
-                probs.append(prob)
-            
-            # step 3: collect the error stats
-            probs_prefix = list(accumulate(probs))
-            measure = self._sample(probs_prefix)
-            if pick != measure:
-                error_count += 1
-            index += 1
-
-        return 1.*error_count / repeat
+        while rounds < repeat:
+            size = min(chunk, repeat - rounds)
+            picks = rng.choice(len(priors), size=size, p=priors)               # step 1: alice prepares the states
+            measures = Utility.sample_outcomes(confusion[picks], rng=rng)     # step 2: bob measures the states
+            error_count += int(np.count_nonzero(picks != measures))          # step 3: collect the error stats
+            rounds += size
+            low, high = Utility.wilson_interval(error_count, rounds, z)
+            if tolerance is not None and (high - low) / 2 <= tolerance:
+                break
+        return error_count / rounds, (low, high), rounds
+
+    @staticmethod
+    def majority_vote_distribution(confusion: np.array, shots: int, samples: int = Default.oracle_votes,
+                                   rng: np.random.Generator = None, max_bytes: int = Default.oracle_bytes) -> np.array:
+        '''the distribution of the most frequent outcome of shots independent measurements, i.e., the decision of the sensing protocol.
+           One shot is exact, otherwise the histograms of the shots are sampled from the multinomial distribution (early stopping is not modeled).
+           Ties go to the smallest outcome index, while QuantumLocalization.sense_measure_index() takes the tied outcome that was observed first
+        Args:
+            confusion -- shape (T, K), the probability of each outcome for each TX, see confusion_matrix()
+            shots     -- the number of shots
+            samples   -- the number of sampled histograms for each TX
+            rng       -- the random generator. If None, a generator with seed 0
+            max_bytes -- the memory of the histograms sampled at once, the numbers of TXs and samples per batch are derived from it and K
+        Return:
+            np.array -- shape (T, K), row t is the probability that each outcome is the majority vote for TX t
+        '''
+        confusion = np.asarray(confusion, dtype=float)
+        if shots == 1:
+            return confusion.copy()
+        rng = np.random.default_rng(0) if rng is None else rng
+        T, K = confusion.shape
+        histogram_bytes = K * np.dtype(np.int64).itemsize                    # one sampled histogram
+        sample_chunk = int(min(samples, max(1, max_bytes // histogram_bytes)))
+        chunk = int(max(1, max_bytes // (sample_chunk * histogram_bytes)))   # the number of TXs sampled at once
+        votes = np.zeros((T, K))
+        for start in range(0, T, chunk):
+            pvals = confusion[start:start + chunk]
+            for done in range(0, samples, sample_chunk):
+                size = min(sample_chunk, samples - done)
+                histograms = rng.multinomial(shots, pvals[:, np.newaxis, :], size=(len(pvals), size))   # (chunk, size, K)
+                winners = np.argmax(histograms, axis=2)
+                for t, winner in enumerate(winners):
+                    votes[start + t] += np.bincount(winner, minlength=K)
+        return votes / samples
+
+    def expected_accuracy(self, quantum_states: list, priors: list, shots: int = 1, samples: int = Default.oracle_votes,
+                          seed: int = 0) -> float:
+        '''the success probability of the majority vote over shots measurements, without simulating the measurements one by one
+           shots = 1 is the theoretical success probability of the single-shot measurement
+        Args:
+            quantum_states -- a StateBatch, or a list of QuantumState objects, state i is expected to give outcome i
+            priors         -- a list of prior probabilities
+            shots          -- the number of shots of the majority vote
+            samples        -- see majority_vote_distribution()
+            seed           -- the seed of the random generator
+        '''
+        votes = Povm.majority_vote_distribution(self.confusion_matrix(quantum_states), shots, samples, np.random.default_rng(seed))
+        return float(np.dot(priors, np.diag(votes)) / np.sum(priors))
+
+    def simulate(self, quantum_states: list, priors: list, seed: int = 0, repeat: int = 10_000) -> float:
+        '''repeat the single-shot measurement many times, see simulate_error()
+        Return:
+            float: the error probability
+        '''
+        error, _, _ = self.simulate_error(quantum_states, priors, seed=seed, repeat=repeat)
+        return error
 
     def compute_theoretical_accuracy(self, quantum_states: list, priors: list) -> float:
-        if not (len(quantum_states) == len(self._operators) == len(priors)):
+        if not (len(quantum_states) == self.num_elements == len(priors)):
             raise Exception('not satisfied: number of quantum states == number of POVM elements == length of priors')
-        accuracy = []
-        for qstate, operator in zip(quantum_states, self.operators):
-            accuracy.append(np.trace(np.dot(qstate.density_matrix, operator.data)))
+        probs = self.probabilities(StateBatch.as_vectors(quantum_states))
+        accuracy = np.diag(probs)   # the probability that state i is measured as outcome i
         return sum([acc * prior for acc, prior in zip(accuracy, priors)])
 
     def computational_basis(self, num_sensor: int, quantum_states: list, priors: list):
         '''using a fixed computational basis, get the success probability empirically through simulation
         '''
-        self._operators = []
-        vec_template = [0] * 2**num_sensor
-        for i in range(2**num_sensor):
-            vec = vec_template.copy()
-            vec[i] = 1
-            M = Operator(np.outer(vec, vec))
-            self._operators.append(M)
-
-        self._theoretical_error = self.simulate(quantum_states, priors)
+        self._overlap = None
+        self._elements = None
+        self._vectors = np.eye(2**num_sensor, dtype=complex)   # element i is |i><i|
+
+        self._theoretical_error, _, _ = self.simulate_error(quantum_states, priors)
         self._theoretical_success = 1 - self._theoretical_error
         self._method = 'computational'
 
@@ -140,7 +298,9 @@ class Povm:
 
         if eigenvals[eig1] < 0:  # positive and negative parts NOTE: python's complex datatype cannot be compared with complex or int. Only numpy.complex128 can compare
             M0, M1 = M1, M0                                        # how numpy.complex128 compare: first compare the the real part, then compare the imaginary part
-        self._operators = [Operator(M0), Operator(M1)]
+        self._vectors = None
+        self._overlap = None
+        self._elements = np.array([M0, M1])
         self._theoretical_error = 1 - (1 + abs(eigenvals[eig1]) + abs(eigenvals[eig2])) / 2
         self._method = 'Minimum Error'
 
@@ -166,7 +326,7 @@ class Povm:
             tmp = np.dot(quantum_states[0].density_matrix, quantum_states[1].density_matrix)
             print('theoretical error 4 =', 0.5 * (1 - math.sqrt(1 - 4*priors[0]*priors[1]*np.trace(tmp))) )
             # I found four different expressions for the theoretical value for minimum error. The four are equivalent
-            print(f'Check POVM optimality: {Utility.check_optimal(quantum_states, priors, self._operators)}')
+            print(f'Check POVM optimality: {Utility.check_optimal(quantum_states, priors, self.operators)}')
             # Utility.print_matrix('check condition 1: M0*X*M1', np.dot(M0, np.dot(X, M1)))
             # print(f'check condition 1: M0*X*M1 = \n{np.dot(M0, np.dot(X, M1))}')
             # gamma = priors[0]*np.dot(M0, quantum_states[0].density_matrix) + priors[1]*np.dot(M1, quantum_states[1].density_matrix)
@@ -194,7 +354,9 @@ class Povm:
             Pi2 = (1 - q2_opt) / (sintheta**2) * np.outer(qs1_ortho, np.conj(qs1_ortho))
             identity = np.array([[1, 0], [0, 1]])
             Pi0 = identity - Pi1 - Pi2
-            self._operators = [Operator(Pi1), Operator(Pi2), Operator(Pi0)]
+            self._vectors = None
+            self._overlap = None
+            self._elements = np.array([Pi1, Pi2, Pi0], dtype=complex)
             self._theoretical_error = 2 * math.sqrt(priors[0]*priors[1]) * costheta
         
         elif priors[0] < left:
@@ -222,40 +384,113 @@ class Povm:
             print('right', right)
 
 
-    def pretty_good_measurement(self, quantum_states: list, priors: list, debug=True):
+    @staticmethod
+    def _inverse_sqrt(hermitian: np.array) -> np.array:
+        '''the (pseudo) inverse square root of a positive semidefinite Hermitian matrix, by eigendecomposition.
+           Eigenvalues below Default.EPSILON_RANK relative to the largest one are treated as zero
+        '''
+        eigenvalues, eigenvectors = np.linalg.eigh(hermitian)
+        keep = eigenvalues > Default.EPSILON_RANK * max(eigenvalues[-1], 0)
+        inv_sqrt = np.zeros_like(eigenvalues)
+        inv_sqrt[keep] = 1 / np.sqrt(eigenvalues[keep])
+        return (eigenvectors * inv_sqrt) @ np.conj(eigenvectors).T
+
+    def pretty_good_measurement(self, quantum_states: list, priors: list, debug=True, solver: str = 'dense'):
         '''For any given set of states, we can construct an associated measurement, the square root measurement
            Implementing paper: https://arxiv.org/pdf/0810.1970.pdf
+        Args:
+            quantum_states -- a StateBatch, or a list of QuantumState objects (pure states)
+            priors         -- a list of prior probabilities
+            debug          -- print the POVM elements
+            solver         -- 'dense': sqrtm and inv of rho in the full 2^N space, the original solver.
+                                       If rho is rank deficient (K < 2^N), the inverse is numerically unreliable
+                              'thin':  works on the K x K Gram matrix (or on rho if K > 2^N), O(min(K, 2^N)^3),
+                                       the pseudo inverse square root handles rank deficiency. Used by train_pretty_good()
         '''
         if len(quantum_states) != len(priors):
             raise Exception('length of quantum_states and priors are not equal')
-        rho = 0
-        for qs, p in zip(quantum_states, priors):
-            rho += (p * qs.density_matrix)
-        rho_invsqrt = np.linalg.inv(sqrtm(rho))
-        self._operators = []
-        for qs, p in zip(quantum_states, priors):
-            # Pi = p * np.dot(rho_invsqrt, np.dot(qs.density_matrix, rho_invsqrt))
-            # Pi = p * np.dot(np.dot(rho_invsqrt, qs.density_matrix), rho_invsqrt)
-            Pi = p * rho_invsqrt @ qs.density_matrix @ rho_invsqrt
-            self._operators.append(Operator(Pi))
+        # the states are pure, so Pi = p * rho_invsqrt @ |psi><psi| @ rho_invsqrt = |w><w|, where w = sqrt(p) * rho_invsqrt @ psi
+        # only the K x d measurement vectors are kept, instead of K dense d x d operators
+        states = StateBatch.as_vectors(quantum_states)
+        weighted = np.sqrt(np.array(priors))[:, np.newaxis] * states     # row i is sqrt(p_i) * psi_i
+        rho, rho_invsqrt = None, None
+        if solver == 'dense':
+            rho = weighted.T @ np.conj(weighted)                         # sum_i p_i |psi_i><psi_i|
+            rho_invsqrt = np.linalg.inv(sqrtm(rho))
+            self._vectors = weighted @ rho_invsqrt.T
+        elif solver == 'thin':
+            K, d = weighted.shape
+            if K <= d:
+                # with Psi = weighted^T (d x K), rho = Psi Psi^dagger and rho^{-1/2} Psi = Psi G^{-1/2}, where G = Psi^dagger Psi
+                gram = np.conj(weighted) @ weighted.T
+                self._vectors = (weighted.T @ self._inverse_sqrt(gram)).T
+            else:
+                rho = weighted.T @ np.conj(weighted)
+                rho_invsqrt = self._inverse_sqrt(rho)
+                self._vectors = weighted @ rho_invsqrt.T
+        else:
+            raise Exception(f'solver {solver} not implemented')
+        self._overlap = None
+        self._elements = None
         self._method = 'Pretty Good'
         self._theoretical_error = None
         
         if debug:
             print('\nDebug information inside Povm.pretty_good_measurement()')
             print(f'prior list {priors}')
-            Utility.print_matrix('rho:', rho)
-            Utility.print_matrix('rho_invsqrt:', rho_invsqrt)
+            if rho is not None:
+                Utility.print_matrix('rho:', rho)
+                Utility.print_matrix('rho_invsqrt:', rho_invsqrt)
             summ = 0
             string = ''
-            for i, Pi in enumerate(self._operators):
+            operators = self.operators
+            for i, Pi in enumerate(operators):
                 summ += Pi.data
                 tmp_str = f'Pi{i}:'
                 Utility.print_matrix(tmp_str, Pi.data)
                 string += f'{tmp_str[:-1]} + '
             string = f'{string[:-2]}='
             Utility.print_matrix(string, summ)
-            print(f'Check POVM optimality: {Utility.check_optimal(quantum_states, priors, self._operators)}')
+            print(f'Check POVM optimality: {Utility.check_optimal(quantum_states, priors, operators)}')
+
+
+    def pretty_good_measurement_overlap(self, hypothesis_phases: np.array, priors: list):
+        '''The pretty good measurement for the sensing states RZ(phase_j)|+>, in the K dimensional span of the hypothesis states.
+           With the prior weighted Gram matrix G_kl = sqrt(p_k p_l) <psi_k|psi_l> (see OverlapKernel), the measurement vectors are
+           w_i = sum_k sqrt(p_k) psi_k (G^{-1/2})_ki, so only the K x K coefficients are kept and no 2^N vector is formed
+        Args:
+            hypothesis_phases -- shape (K, N), the (noiseless) phase shifts at the N sensors of each hypothesis
+            priors            -- a list of prior probabilities
+        '''
+        hypothesis_phases = np.asarray(hypothesis_phases, dtype=float)
+        if len(hypothesis_phases) != len(priors):
+            raise Exception('length of hypothesis_phases and priors are not equal')
+        sqrt_priors = np.sqrt(np.array(priors))
+        gram = np.outer(sqrt_priors, sqrt_priors) * OverlapKernel.gram(hypothesis_phases)
+        coefficients = sqrt_priors[:, np.newaxis] * self._inverse_sqrt(gram).real   # the Gram matrix is real symmetric
+        self._overlap = (hypothesis_phases, coefficients)
+        self._vectors = None
+        self._elements = None
+        self._method = 'Pretty Good'
+        self._theoretical_error = None
+
+
+    @staticmethod
+    def train_pretty_good(phases: np.array, priors: list, overlap: bool = False) -> 'Povm':
+        '''train the pretty good measurement of the sensing states RZ(phase_j)|+>, e.g. in a worker process
+        Args:
+            phases  -- shape (K, N), the (noiseless) phase shifts at the N sensors of each of the K hypotheses
+            priors  -- a list of prior probabilities
+            overlap -- if True, pretty_good_measurement_overlap(), otherwise pretty_good_measurement(solver='thin') on the 2^N state vectors
+        Return:
+            Povm
+        '''
+        povm = Povm()
+        if overlap:
+            povm.pretty_good_measurement_overlap(phases, priors)
+        else:
+            povm.pretty_good_measurement(StateBatch.from_phases(phases), priors, debug=False, solver='thin')
+        return povm
 
 
     def semidefinite_programming_minerror(self, quantum_states: list, priors: list, debug=True):
@@ -286,7 +521,9 @@ class Povm:
         if prob.status == 'optimal':
             self._theoretical_success = prob.value
             self._theoretical_error = 1 - prob.value
-            self._operators = [Operator(PI.value) for PI in PIs]
+            self._vectors = None
+            self._overlap = None
+            self._elements = np.array([PI.value for PI in PIs])
         else:
             raise Exception('prob.value is not optimal')
 
@@ -295,7 +532,7 @@ class Povm:
             print(f'prior list {priors}')
             summ = 0
             string = ''
-            for i, Pi in enumerate(self._operators):
+            for i, Pi in enumerate(self.operators):
                 summ += Pi.data
                 tmp_str = f'Pi{i}:'
                 Utility.print_matrix(tmp_str, Pi.data)
@@ -304,7 +541,7 @@ class Povm:
             Utility.print_matrix(string, summ)
             print(f'Number of contraints = {len(constraints)}')
             print(f'The theoretical error is {self._theoretical_error}')
-            print(f'Check POVM optimality: {Utility.check_optimal(quantum_states, priors, self._operators)}')
+            print(f'Check POVM optimality: {Utility.check_optimal(quantum_states, priors, self.operators)}')
 
 
     def semidefinite_programming_unambiguous(self, quantum_states: list, priors: list, debug=True):
@@ -341,7 +578,9 @@ class Povm:
         if prob.status == 'optimal' or prob.status == 'optimal_inaccurate':
             self._theoretical_success = prob.value
             self._theoretical_error = 1 - prob.value
-            self._operators = [Operator(MI.value) for MI in Ms]
+            self._vectors = None
+            self._overlap = None
+            self._elements = np.array([MI.value for MI in Ms])
         else:
             raise Exception(f'prob.status={prob.status}')
         
@@ -350,7 +589,7 @@ class Povm:
             print(f'prior list {priors}')
             summ = 0
             string = ''
-            for i, Pi in enumerate(self._operators):
+            for i, Pi in enumerate(self.operators):
                 summ += Pi.data
                 tmp_str = f'Pi{i}:'
                 Utility.print_matrix(tmp_str, Pi.data)
@@ -359,7 +598,7 @@ class Povm:
             Utility.print_matrix(string, summ)
             print(f'Number of contraints = {len(constraints)}')
             print(f'The theoretical error is {self._theoretical_error}')
-            # print(f'Check POVM optimality: {Utility.check_optimal(quantum_states, priors, self._operators)}')
+            # print(f'Check POVM optimality: {Utility.check_optimal(quantum_states, priors, self.operators)}')
    
 
 
@@ -0,0 +1,110 @@
+'''
+Persistent cache of the trained POVMs, so that runs with the same sensor layout do not retrain
+'''
+
+import os
+import json
+import shutil
+import hashlib
+import numpy as np
+from typing import Tuple
+from povm import Povm
+from default import Default
+
+
+class PovmCache:
+    '''A content addressed directory of trained POVMs. Each entry is a directory named by the key:
+           {root_dir}/{key}/meta.json   -- the method, the array names, the tx locations of the outcomes, the configuration
+           {root_dir}/{key}/{name}.npy  -- the arrays of Povm.to_arrays(), loaded memory mapped
+       The least recently used entries are evicted when the total size is over max_bytes
+    '''
+    version = 1     # bump when the format or the training changes
+
+    def __init__(self, root_dir: str = Default.povm_cache_dir, max_bytes: int = Default.povm_cache_size):
+        self.root_dir = root_dir
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def make_key(config: dict) -> str:
+        '''the key of a trained POVM is the hash of everything the training depends on
+        Args:
+            config -- json serializable, e.g. the canonical geometry of the set, the unitary operator parameters, the method
+        '''
+        string = json.dumps({'version': PovmCache.version, **config}, sort_keys=True)
+        return hashlib.sha256(string.encode()).hexdigest()[:32]
+
+    def _entry_dir(self, key: str) -> str:
+        return os.path.join(self.root_dir, key)
+
+    def load(self, key: str) -> Tuple[Povm, dict]:
+        '''load a trained POVM, the arrays are memory mapped
+        Return:
+            (Povm, tx_loc) where tx_loc maps the outcome index to the tx location. None if the key is not in the cache
+        '''
+        entry_dir = self._entry_dir(key)
+        meta_file = os.path.join(entry_dir, 'meta.json')
+        try:
+            with open(meta_file, 'r') as f:
+                meta = json.load(f)
+            arrays = {name: np.load(os.path.join(entry_dir, f'{name}.npy'), mmap_mode='r') for name in meta['arrays']}
+        except (OSError, ValueError, KeyError):
+            return None
+        try:
+            os.utime(meta_file)   # the modified time of meta.json is the last used time
+        except OSError:
+            pass
+        tx_loc = {i: tuple(tx) for i, tx in enumerate(meta['tx_loc'])}
+        return Povm.from_arrays(arrays, meta['method']), tx_loc
+
+    def save(self, key: str, povm: Povm, tx_loc: dict, config: dict = None):
+        '''save a trained POVM, then evict the least recently used entries if the cache is too large
+        Args:
+            key    -- from make_key()
+            povm   -- the trained POVM
+            tx_loc -- the outcome index --> the tx location, the indices are 0, 1, ..., K-1
+            config -- the configuration of the key, saved for reference
+        '''
+        entry_dir = self._entry_dir(key)
+        if os.path.exists(entry_dir):
+            return
+        os.makedirs(self.root_dir, exist_ok=True)
+        tmp_dir = f'{entry_dir}.{os.getpid()}.tmp'   # write then rename, other processes may be loading the cache
+        os.makedirs(tmp_dir, exist_ok=True)
+        arrays = povm.to_arrays()
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp_dir, f'{name}.npy'), np.ascontiguousarray(array))
+        meta = {'method': povm.method, 'arrays': list(arrays.keys()), 'tx_loc': [list(tx_loc[i]) for i in range(len(tx_loc))],
+                'config': config}
+        with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+        try:
+            os.rename(tmp_dir, entry_dir)
+        except OSError:
+            shutil.rmtree(tmp_dir, ignore_errors=True)   # another process saved the same key first
+        self.evict(keep=key)
+
+    def evict(self, keep: str = None):
+        '''remove the least recently used entries until the total size is at most max_bytes
+        Args:
+            keep -- never evict this key
+        '''
+        entries = []
+        total = 0
+        for key in os.listdir(self.root_dir):
+            entry_dir = self._entry_dir(key)
+            meta_file = os.path.join(entry_dir, 'meta.json')
+            if key.endswith('.tmp') or not os.path.exists(meta_file):
+                continue
+            try:
+                size = sum(os.path.getsize(os.path.join(entry_dir, name)) for name in os.listdir(entry_dir))
+                entries.append((os.path.getmtime(meta_file), size, key))
+            except OSError:
+                continue   # evicted by another process
+            total += size
+        for _, size, key in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+            total -= size
@@ -2,10 +2,8 @@ import torch
 import torch.nn as nn
 import torch.nn.functional as F
 import torchquantum as tq
-import torchquantum.functional as tqf
 import numpy as np
 from qiskit import QuantumCircuit
-from torch.utils.data import DataLoader
 from dataset import QuantumSensingDataset
 from torchquantum.plugins import (
     append_fixed_gate,
@@ -40,7 +38,10 @@ def op_history2qiskit_expand_params_and_fixed(n_wires, op_history, bsz):
 
 class QuantumSensing(tq.QuantumModule):
     '''Model the quantum sensing process (state preparation).
-       For a single quantum state
+       Every sensor j prepares RZ(theta_j) H|0>, so the state of a sample is the product state
+           prod_j (exp(-i*theta_j/2)|0> + exp(i*theta_j/2)|1>) / sqrt(2)
+       whose amplitude of basis |b_0 b_1 ... b_{n-1}> is exp(-i/2 * sum_j s_j theta_j) / 2^(n/2), where s_j = +1 if b_j = 0 else -1.
+       The phases of a batch are one matrix product thetas @ signs, no gates are applied (and it is differentiable w.r.t. thetas)
     '''
     def __init__(self, n_qubits: int, device: torch.device):
         '''
@@ -51,32 +52,28 @@ class QuantumSensing(tq.QuantumModule):
         super().__init__()
         self.n_wires = n_qubits
         self.device = device
+        bits = (np.arange(2**n_qubits)[np.newaxis, :] >> np.arange(n_qubits - 1, -1, -1)[:, np.newaxis]) & 1   # wire 0 is the most significant
+        self.signs = torch.tensor(1 - 2 * bits, dtype=torch.float32, device=device)   # (n_qubits, 2^n_qubits)
 
     def forward(self, list_of_thetas: list):
-        '''         
+        '''
         Args:
-            list_of_thetas -- a list of (list of parameters) for the RZ gate
+            list_of_thetas -- (bsz, n_qubits) parameters for the RZ gates, a tensor or a list of (list of parameters)
         Return:
             tq.QuantumDevice
         '''
-        if self.n_wires != len(list_of_thetas[0]):
+        if torch.is_tensor(list_of_thetas):
+            thetas = list_of_thetas.to(device=self.device, dtype=torch.float32)
+        else:
+            thetas = torch.tensor(np.array(list_of_thetas, dtype=np.float32), device=self.device)
+        if self.n_wires != thetas.shape[1]:
             raise Exception('n_qubit != len(thetas)')
 
-        bsz = len(list_of_thetas)
+        bsz = thetas.shape[0]
+        phases = -0.5 * (thetas @ self.signs)                        # (bsz, 2^n_qubits)
+        magnitude = torch.full_like(phases, 2 ** (-self.n_wires / 2))
         q_device = tq.QuantumDevice(n_wires=self.n_wires, bsz=bsz, device=self.device)
-        rzs = []    # rotation z basis 
-        for thetas in list_of_thetas:
-            rzs.append([tq.RZ(has_params=True, init_params=theta.item()) for theta in thetas])
-
-        q_state_list = []
-        for i in range(bsz):
-            q_device_tmp = tq.QuantumDevice(n_wires=self.n_wires, bsz=1)
-            for j in range(self.n_wires):
-                tqf.h(q_device_tmp, wires=j)       # hadamard gate --> super position
-            for j, rz in enumerate(rzs[i]):
-                rz(q_device_tmp, wires=j)          # quantum sensing model
-            q_state_list.append(q_device_tmp.states)
-        q_device.set_states(torch.cat(q_state_list).to(self.device))
+        q_device.set_states(torch.polar(magnitude, phases))
         return q_device
 
 
@@ -378,7 +375,7 @@ def test2():
     qlocalize = QuantumMLclassification(n_wires=4, n_locations=4).to(device)
     root_dir = 'qml-data/toy/train'
     train_dataset = QuantumSensingDataset(root_dir)
-    train_dataloader = DataLoader(train_dataset, batch_size=3, shuffle=False, num_workers=2)
+    train_dataloader = train_dataset.dataloader(batch_size=3, shuffle=False, num_workers=2)
     for t, sample in enumerate(train_dataloader):
         X = sample['phase']
         y = sample['label']
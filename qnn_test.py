@@ -3,7 +3,6 @@ import numpy as np
 import glob
 import os
 import json
-import pickle
 import torch
 import torch.nn.functional as F
 import torchquantum as tq
@@ -11,8 +10,8 @@ import threading
 from qiskit import IBMQ
 from typing import Tuple
 from collections import Counter
-from torch.utils.data import DataLoader
 from dataset import QuantumSensingDataset
+from model_artifact import ModelArtifact
 from utility import Utility
 from default import Default
 from torchquantum.plugins import QiskitProcessor
@@ -87,13 +86,12 @@ def test_onelevel_continuous_ibm(length: int, sen: int, noise_in_training: bool,
     bsz = len(test_dataset)
     if bsz > 500:
         raise Exception('testing dataset too large!')
-    test_dataloader = DataLoader(test_dataset, batch_size=bsz, shuffle=False, num_workers=4)
+    test_dataloader = test_dataset.dataloader(batch_size=bsz, shuffle=False, num_workers=4)
     use_cuda = torch.cuda.is_available()
     device = torch.device('cuda' if use_cuda else 'cpu')
     model_dir = dataset_dir.replace('data', 'model')
     model_name = 'model-ibm.pt' if noise_in_training else 'model.pt'
-    with open(os.path.join(model_dir, model_name), 'rb') as f:
-        model = pickle.load(f)
+    model = ModelArtifact.load(os.path.join(model_dir, model_name))
     from qiskit import IBMQ
     IBMQ.load_account()
     if ibm_in_testing:
@@ -143,13 +141,12 @@ def test_onelevel_continuous(length: int, sen: int, output_dir: str, output_file
     bsz = len(test_dataset)
     if bsz > 500:
         raise Exception('testing dataset too large!')
-    test_dataloader = DataLoader(test_dataset, batch_size=bsz, shuffle=False, num_workers=4)
+    test_dataloader = test_dataset.dataloader(batch_size=bsz, shuffle=False, num_workers=4)
     use_cuda = torch.cuda.is_available()
     device = torch.device('cuda' if use_cuda else 'cpu')
     model_dir = dataset_dir.replace('data', 'model')
     model_name = 'model.pt'
-    with open(os.path.join(model_dir, model_name), 'rb') as f:
-        model = pickle.load(f)
+    model = ModelArtifact.load(os.path.join(model_dir, model_name))
     model.eval()
     
     loss_list = []
@@ -195,13 +192,12 @@ def test_onelevel_discrete_ibm(length: int, sen: int, noise_in_training: bool, i
     bsz = len(test_dataset)
     if bsz > 500:
         raise Exception('testing dataset too large!')
-    test_dataloader = DataLoader(test_dataset, batch_size=bsz, shuffle=False, num_workers=4)
+    test_dataloader = test_dataset.dataloader(batch_size=bsz, shuffle=False, num_workers=4)
     use_cuda = torch.cuda.is_available()
     device = torch.device('cuda' if use_cuda else 'cpu')
     model_dir = dataset_dir.replace('data', 'model')
     model_name = 'model-ibm.pt' if noise_in_training else 'model.pt'
-    with open(os.path.join(model_dir, model_name), 'rb') as f:
-        model = pickle.load(f)
+    model = ModelArtifact.load(os.path.join(model_dir, model_name))
     from qiskit import IBMQ
     IBMQ.load_account()
     if ibm_in_testing:
@@ -256,13 +252,12 @@ def test_onelevel_discrete(length: int, sen: int, output_dir: str, output_file:
     bsz = len(test_dataset)
     if bsz > 500:
         raise Exception('testing dataset too large!')
-    test_dataloader = DataLoader(test_dataset, batch_size=bsz, shuffle=False, num_workers=4)
+    test_dataloader = test_dataset.dataloader(batch_size=bsz, shuffle=False, num_workers=4)
     use_cuda = torch.cuda.is_available()
     device = torch.device('cuda' if use_cuda else 'cpu')
     model_dir = dataset_dir.replace('data', 'model')
     model_name = 'model.pt'
-    with open(os.path.join(model_dir, model_name), 'rb') as f:
-        model = pickle.load(f)
+    model = ModelArtifact.load(os.path.join(model_dir, model_name))
     model.eval()
     
     loss_list  = []
@@ -328,18 +323,16 @@ def test_twolevel_continuous(length: int, sen: int, output_dir: str, output_file
         bsz = len(test_dataset)
         if bsz > 500:
             raise Exception('testing dataset too large!')
-        test_dataloader = DataLoader(test_dataset, batch_size=bsz, shuffle=False, num_workers=4)
+        test_dataloader = test_dataset.dataloader(batch_size=bsz, shuffle=False, num_workers=4)
         device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
 
         # 2. fine level model:
         model_path = os.path.join(dataset_dir.replace('data', 'model'), f'level-{level_i}-set-{set_i}', 'model.pt')
-        if os.path.exists(model_path) is False:
+        if ModelArtifact.exists(model_path) is False:
             raise Exception(f'model does not exist: {model_path}')
-        with open(model_path, 'rb') as f:
-            device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-            model = pickle.load(f)
-            model.to(device=device)
-            model.eval()
+        device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+        model = ModelArtifact.load(model_path, device)
+        model.eval()
 
         target_all = []
         output_all = []
@@ -384,12 +377,10 @@ def test_twolevel_continuous(length: int, sen: int, output_dir: str, output_file
     total_blocks = grid_length_block ** 2
     block_sample_counter = Counter()
     testing_folder_template = os.path.join(dataset_dir, 'level-1-set-{}', 'test')
+    block_phases = {i: [] for i in range(total_blocks)}    # the level 1 testing datasets, saved after running the coarse level
+    block_labels = {i: [] for i in range(total_blocks)}
     for i in range(total_blocks):
         Utility.remove_make(testing_folder_template.format(i))
-        test_phase_dir = os.path.join(testing_folder_template.format(i), 'phase')
-        test_label_dir = os.path.join(testing_folder_template.format(i), 'label')
-        os.makedirs(test_phase_dir)
-        os.makedirs(test_label_dir)
     
     # 2. the level 0 testing dataset
     root_dir = os.path.join(dataset_dir, f'level-{level_i}-set-{set_i}', 'test')
@@ -397,18 +388,16 @@ def test_twolevel_continuous(length: int, sen: int, output_dir: str, output_file
     bsz = len(test_dataset)
     if bsz > 500:
         raise Exception('testing dataset too large!')
-    test_dataloader = DataLoader(test_dataset, batch_size=bsz, shuffle=False, num_workers=4)
+    test_dataloader = test_dataset.dataloader(batch_size=bsz, shuffle=False, num_workers=4)
     device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
     
     # 3. first coarse level model
     model_path = os.path.join(dataset_dir.replace('data', 'model'), f'level-{level_i}-set-{set_i}', 'model.pt')
-    if os.path.exists(model_path) is False:
+    if ModelArtifact.exists(model_path) is False:
         raise Exception(f'model does not exist: {model_path}')
-    with open(model_path, 'rb') as f:
-        device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-        model = pickle.load(f)
-        model.to(device=device)
-        model.eval()
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    model = ModelArtifact.load(model_path, device)
+    model.eval()
     
     # 4. run the coarse level model
     with torch.no_grad():
@@ -433,17 +422,16 @@ def test_twolevel_continuous(length: int, sen: int, output_dir: str, output_file
                 block_i = block[0] * grid_length_block + block[1]
                 # generate new thetas, and save to the new testing dataset
                 sensors = sensordata['levels'][f'level-1'][f'set-{block_i}']['sensors']  # set_i == block_i
-                thetas = []
-                for rx_i in sensors:
-                    rx = sensordata['sensors'][f'{rx_i}']
-                    distance = Utility.distance(tx_truth, rx, Default.cell_length)
-                    phase_shift, _ = unitary_operator.compute_H(distance, noise=True)
-                    thetas.append(phase_shift)
-                counter = block_sample_counter[block_i]
-                np.save(os.path.join(testing_folder_template.format(block_i), 'phase', f'{counter}.npy'), np.array(thetas).astype(np.float32))
-                np.save(os.path.join(testing_folder_template.format(block_i), 'label', f'{counter}.npy'), np.array(target).astype(np.float32))
+                distances = [Utility.distance(tx_truth, sensordata['sensors'][f'{rx_i}'], Default.cell_length) for rx_i in sensors]
+                thetas, _ = unitary_operator.compute_H_batch(np.array(distances), noise=True)
+                block_phases[block_i].append(thetas)
+                block_labels[block_i].append(target)
                 block_sample_counter[block_i] += 1
             print(f'one level error = {np.mean(errors)}')
+    for i in range(total_blocks):
+        n_sensor = len(sensordata['levels']['level-1'][f'set-{i}']['sensors'])
+        QuantumSensingDataset.save(testing_folder_template.format(i), np.array(block_phases[i], dtype=np.float32).reshape(-1, n_sensor),
+                                   np.array(block_labels[i], dtype=np.float32).reshape(-1, 2))
 
     # 5. start the second fine level threads
     threads = []
@@ -491,16 +479,15 @@ def test_twolevel_continuous_ibm(length: int, sen: int, output_dir: str, output_
             raise Exception('testing dataset too large!')
         elif bsz == 0:
             raise Exception(f'block_id = {block_id}, testing dataset is zero...')
-        test_dataloader = DataLoader(test_dataset, batch_size=bsz, shuffle=False, num_workers=4)
+        test_dataloader = test_dataset.dataloader(batch_size=bsz, shuffle=False, num_workers=4)
         device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
 
         # 2. fine level model:
         model_path = os.path.join(dataset_dir.replace('data', 'model'), f'level-{level_i}-set-{set_i}', 'model.pt')
-        if os.path.exists(model_path) is False:
+        if ModelArtifact.exists(model_path) is False:
             raise Exception(f'model does not exist: {model_path}')
-        with open(model_path, 'rb') as f:
-            device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-            model = pickle.load(f)
+        device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+        model = ModelArtifact.load(model_path)
 
         if ibm_in_testing:
             processor = QiskitProcessor(use_real_qc=True, backend_name=backend_name)
@@ -554,12 +541,10 @@ def test_twolevel_continuous_ibm(length: int, sen: int, output_dir: str, output_
     total_blocks = grid_length_block ** 2
     block_sample_counter = Counter()
     testing_folder_template = os.path.join(dataset_dir, 'level-1-set-{}', 'test')
+    block_phases = {i: [] for i in range(total_blocks)}    # the level 1 testing datasets, saved after running the coarse level
+    block_labels = {i: [] for i in range(total_blocks)}
     for i in range(total_blocks):
         Utility.remove_make(testing_folder_template.format(i))
-        test_phase_dir = os.path.join(testing_folder_template.format(i), 'phase')
-        test_label_dir = os.path.join(testing_folder_template.format(i), 'label')
-        os.makedirs(test_phase_dir)
-        os.makedirs(test_label_dir)
     
     # 2. the level 0 testing dataset
     root_dir = os.path.join(dataset_dir, f'level-{level_i}-set-{set_i}', 'test')
@@ -567,16 +552,15 @@ def test_twolevel_continuous_ibm(length: int, sen: int, output_dir: str, output_
     bsz = len(test_dataset)
     if bsz > 500:
         raise Exception('testing dataset too large!')
-    test_dataloader = DataLoader(test_dataset, batch_size=bsz, shuffle=False, num_workers=4)
+    test_dataloader = test_dataset.dataloader(batch_size=bsz, shuffle=False, num_workers=4)
     device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
     
     # 3. first coarse level model
     model_path = os.path.join(dataset_dir.replace('data', 'model'), f'level-{level_i}-set-{set_i}', 'model.pt')
-    if os.path.exists(model_path) is False:
+    if ModelArtifact.exists(model_path) is False:
         raise Exception(f'model does not exist: {model_path}')
-    with open(model_path, 'rb') as f:
-        device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-        model = pickle.load(f)
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    model = ModelArtifact.load(model_path)
     
     IBMQ.load_account()
     if ibm_in_testing:
@@ -608,18 +592,17 @@ def test_twolevel_continuous_ibm(length: int, sen: int, output_dir: str, output_
                 block_i = block[0] * grid_length_block + block[1]
                 # generate new thetas, and save to the new testing dataset
                 sensors = sensordata['levels'][f'level-1'][f'set-{block_i}']['sensors']  # set_i == block_i
-                thetas = []
-                for rx_i in sensors:
-                    rx = sensordata['sensors'][f'{rx_i}']
-                    distance = Utility.distance(tx_truth, rx, Default.cell_length)
-                    phase_shift, _ = unitary_operator.compute_H(distance, noise=True)
-                    thetas.append(phase_shift)
-                counter = block_sample_counter[block_i]
-                np.save(os.path.join(testing_folder_template.format(block_i), 'phase', f'{counter}.npy'), np.array(thetas).astype(np.float32))
-                np.save(os.path.join(testing_folder_template.format(block_i), 'label', f'{counter}.npy'), np.array(target).astype(np.float32))
+                distances = [Utility.distance(tx_truth, sensordata['sensors'][f'{rx_i}'], Default.cell_length) for rx_i in sensors]
+                thetas, _ = unitary_operator.compute_H_batch(np.array(distances), noise=True)
+                block_phases[block_i].append(thetas)
+                block_labels[block_i].append(target)
                 block_sample_counter[block_i] += 1
             print(f'one level error = {np.mean(errors)}')
             print(f'block_sample_counter = {block_sample_counter}')
+    for i in range(total_blocks):
+        n_sensor = len(sensordata['levels']['level-1'][f'set-{i}']['sensors'])
+        QuantumSensingDataset.save(testing_folder_template.format(i), np.array(block_phases[i], dtype=np.float32).reshape(-1, n_sensor),
+                                   np.array(block_labels[i], dtype=np.float32).reshape(-1, 2))
 
     # 5. start the second fine level threads
     threads = []
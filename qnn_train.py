@@ -4,7 +4,6 @@ import glob
 import os
 import json
 import torch
-import pickle
 import torchquantum as tq
 import torchquantum.functional as tqf
 import torch.nn.functional as F
@@ -13,11 +12,13 @@ import torch.optim as optim
 from torch import Tensor
 from torchquantum.plugins.qiskit_plugin import tq2qiskit
 from torch.optim.lr_scheduler import CosineAnnealingLR
-from torch.utils.data import DataLoader
 from dataset import QuantumSensingDataset
+from model_artifact import ModelArtifact
 from qnn import QuantumSensing, QuantumMLclassification, QuantumMLregression, QuantumMLregressionIBM, QuantumMLclassificationIBM
 from utility import Utility
 from default import Default
+from unitary_operator import UnitaryOperator
+from localization import QuantumLocalization
 from torchquantum.plugins import QiskitProcessor
 
 
@@ -44,7 +45,7 @@ def train_save_onelevel(dataset_dir: str):
     print(info)
     root_dir = os.path.join(dataset_dir, 'train')
     train_dataset = QuantumSensingDataset(root_dir)
-    train_dataloader = DataLoader(train_dataset, batch_size=32, shuffle=True, num_workers=4)
+    train_dataloader = train_dataset.dataloader(batch_size=32, shuffle=True, num_workers=4)
     use_cuda = torch.cuda.is_available()
     device = torch.device('cuda' if use_cuda else 'cpu')
     n_qubits = info['sensor_num']
@@ -95,8 +96,7 @@ def train_save_onelevel(dataset_dir: str):
             model_dir = dataset_dir.replace('qml-data', 'qml-model')
             if not os.path.exists(model_dir):
                 os.makedirs(model_dir)
-            with open(os.path.join(model_dir, 'model.pt'), 'wb') as f:
-                pickle.dump(model, f, pickle.HIGHEST_PROTOCOL)
+            ModelArtifact.save(model, os.path.join(model_dir, 'model.pt'))
 
     print('\nfinal train loss:\n', train_loss)
     print('final train accu:\n', train_acc)
@@ -108,7 +108,7 @@ def train_save_onelevel_continuous(dataset_dir: str):
     print(info)
     root_dir = os.path.join(dataset_dir, 'train')
     train_dataset = QuantumSensingDataset(root_dir)
-    train_dataloader = DataLoader(train_dataset, batch_size=32, shuffle=True, num_workers=4)
+    train_dataloader = train_dataset.dataloader(batch_size=32, shuffle=True, num_workers=4)
     use_cuda = torch.cuda.is_available()
     device = torch.device('cuda' if use_cuda else 'cpu')
     n_qubits = info['sensor_num']
@@ -157,8 +157,7 @@ def train_save_onelevel_continuous(dataset_dir: str):
             model_dir = dataset_dir.replace('qml-data', 'qml-model')
             if not os.path.exists(model_dir):
                 os.makedirs(model_dir)
-            with open(os.path.join(model_dir, f'model.pt'), 'wb') as f:
-                pickle.dump(model, f, pickle.HIGHEST_PROTOCOL)
+            ModelArtifact.save(model, os.path.join(model_dir, 'model.pt'))
 
     print('\nfinal train loss:\n', train_loss)
     print('final train accu:\n', train_error)
@@ -173,7 +172,7 @@ def train_save_onelevel_continuous_ibm(dataset_dir: str):
     print(info)
     root_dir = os.path.join(dataset_dir, 'train')
     train_dataset = QuantumSensingDataset(root_dir)
-    train_dataloader = DataLoader(train_dataset, batch_size=32, shuffle=True, num_workers=4)
+    train_dataloader = train_dataset.dataloader(batch_size=32, shuffle=True, num_workers=4)
     use_cuda = torch.cuda.is_available()
     device = torch.device('cuda' if use_cuda else 'cpu')
     n_qubits = info['sensor_num']
@@ -223,8 +222,7 @@ def train_save_onelevel_continuous_ibm(dataset_dir: str):
             model_dir = dataset_dir.replace('qml-data', 'qml-model')
             if not os.path.exists(model_dir):
                 os.makedirs(model_dir)
-            with open(os.path.join(model_dir, f'model.pt'), 'wb') as f:
-                pickle.dump(model, f, pickle.HIGHEST_PROTOCOL)
+            ModelArtifact.save(model, os.path.join(model_dir, 'model.pt'))
 
         print('\nfinal train loss:\n', train_loss)
         print('final train accu:\n', train_error)
@@ -236,7 +234,7 @@ def train_save_onelevel_discrete_ibm(dataset_dir: str):
     print(info)
     root_dir = os.path.join(dataset_dir, 'train')
     train_dataset = QuantumSensingDataset(root_dir)
-    train_dataloader = DataLoader(train_dataset, batch_size=32, shuffle=True, num_workers=4)
+    train_dataloader = train_dataset.dataloader(batch_size=32, shuffle=True, num_workers=4)
     use_cuda = torch.cuda.is_available()
     device = torch.device('cuda' if use_cuda else 'cpu')
     n_qubits = info['sensor_num']
@@ -290,13 +288,83 @@ def train_save_onelevel_discrete_ibm(dataset_dir: str):
             model_dir = dataset_dir.replace('qml-data', 'qml-model')
             if not os.path.exists(model_dir):
                 os.makedirs(model_dir)
-            with open(os.path.join(model_dir, f'model.pt'), 'wb') as f:
-                pickle.dump(model, f, pickle.HIGHEST_PROTOCOL)
+            ModelArtifact.save(model, os.path.join(model_dir, 'model.pt'))
 
     print('\nfinal train loss:\n', train_loss)
     print('final train accu:\n', train_error)
 
 
+'''two level, train and save the model of a set'''
+def train_twolevel_set(info: dict, dataloader, model_dir: str, continuous: bool):
+    '''
+    Args:
+        info       -- the info of the set, e.g. the info file of qml-data/16x16.8.two/level-0-set-0
+        dataloader -- epoch --> the training batches of the epoch
+        model_dir  -- e.g. qml-model/16x16.8.two/level-0-set-0, the model is saved as model.pt
+        continuous -- the continuous (regression) or the discrete (classification) case
+    '''
+    use_cuda = torch.cuda.is_available()
+    device = torch.device('cuda' if use_cuda else 'cpu')
+    n_qubits = info['sensor_num']
+    area = info['area']
+    area_length = area[1][0] - area[0][0]   # area is either the whole grid (level0) or a block (level1)
+    if continuous:
+        model = QuantumMLregression(n_wires=n_qubits).to(device)
+        save_every = 10
+    else:
+        grid_length = area_length // info['block_cell_ratio']
+        n_locations = grid_length ** 2
+        model = QuantumMLclassification(n_wires=n_qubits, n_locations=n_locations).to(device)
+        save_every = 5
+    n_epochs = 80
+    optimizer = optim.Adam(model.parameters(), lr=5e-3, weight_decay=1e-4)
+    scheduler = CosineAnnealingLR(optimizer, T_max=n_epochs)
+
+    model.train()
+    train_loss = []
+    train_metric = []   # the accuracy (discrete) or the localization error (continuous)
+    for e in range(n_epochs):
+        start = time.time()
+        loss_list = []
+        target_all = []
+        output_all = []
+        for _, sample in enumerate(dataloader(e)):
+            thetas = sample['phase']
+            targets = sample['label'].to(device)
+            # preparing sensing data
+            qsensing = QuantumSensing(n_qubits=n_qubits, device=device)
+            q_device = qsensing(thetas)
+            # the model
+            outputs = model(q_device)
+            # compute loss, gradient, optimize ...
+            loss = F.mse_loss(outputs, targets) if continuous else F.nll_loss(outputs, targets)
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            loss_list.append(loss.item())
+            target_all.append(targets)
+            output_all.append(outputs)
+        train_loss.append(np.mean(loss_list))
+        target_all = torch.cat(target_all)
+        output_all = torch.cat(output_all)
+        if continuous:
+            train_metric.append(compute_loc_error(output_all, target_all, area_length * Default.cell_length))
+        else:
+            train_metric.append(compute_accuracy(output_all, target_all))
+        scheduler.step()
+        epoch_time = time.time() - start
+
+        print(f'epoch={e}, time = {epoch_time:.2f}, train loss={train_loss[-1]:.4f}, train accuracy={train_metric[-1]:.4f}')
+
+        if e % save_every == save_every - 1: # save a model every 5 (discrete) or 10 (continuous) epochs
+            if not os.path.exists(model_dir):
+                os.makedirs(model_dir)
+            ModelArtifact.save(model, os.path.join(model_dir, 'model.pt'))
+
+    print('\nfinal train loss:\n', train_loss)
+    print('final train accu:\n', train_metric)
+
+
 '''two level + discrete, save model'''
 def train_save_twolevel(folder: str):
     for i, dataset_dir in enumerate(sorted(glob.glob(folder + '/*'))):   # dataset_dir: ../40x40.two/level-0-set-0
@@ -306,62 +374,9 @@ def train_save_twolevel(folder: str):
         print(info)
         root_dir = os.path.join(dataset_dir, 'train')
         train_dataset = QuantumSensingDataset(root_dir)
-        train_dataloader = DataLoader(train_dataset, batch_size=32, shuffle=True, num_workers=4)
-        use_cuda = torch.cuda.is_available()
-        device = torch.device('cuda' if use_cuda else 'cpu')
-        n_qubits = info['sensor_num']
-        area = info['area']
-        block_cell_ratio = info['block_cell_ratio']
-        grid_length = (area[1][0] - area[0][0]) // block_cell_ratio
-        n_locations = grid_length ** 2
-        model = QuantumMLclassification(n_wires=n_qubits, n_locations=n_locations).to(device)
-        n_epochs = 80
-        optimizer = optim.Adam(model.parameters(), lr=5e-3, weight_decay=1e-4)
-        scheduler = CosineAnnealingLR(optimizer, T_max=n_epochs)
-        
-        model.train()
-        train_loss = []
-        train_acc = []
-        for e in range(n_epochs):
-            start = time.time()
-            loss_list = []
-            target_all = []
-            output_all = []
-            for _, sample in enumerate(train_dataloader):
-                thetas = sample['phase']
-                targets = sample['label'].to(device)
-                # preparing sensing data
-                qsensing = QuantumSensing(n_qubits=n_qubits, device=device)
-                q_device = qsensing(thetas)
-                # the model
-                outputs = model(q_device)
-                # compute loss, gradient, optimize ...
-                loss = F.nll_loss(outputs, targets)
-                optimizer.zero_grad()
-                loss.backward()
-                optimizer.step()
-                loss_list.append(loss.item())
-                target_all.append(targets)
-                output_all.append(outputs)
-            train_loss.append(np.mean(loss_list))
-            target_all = torch.cat(target_all)
-            output_all = torch.cat(output_all)
-            accuracy = compute_accuracy(output_all, target_all)
-            train_acc.append(accuracy)
-            scheduler.step()
-            epoch_time = time.time() - start
-        
-            print(f'epoch={e}, time = {epoch_time:.2f}, test loss={train_loss[-1]:.4f}, test accuracy={train_acc[-1]:.4f}')
-
-            if e % 5 == 4: # save a model every 5 epochs
-                model_dir = dataset_dir.replace('qml-data', 'qml-model')
-                if not os.path.exists(model_dir):
-                    os.makedirs(model_dir)
-                with open(os.path.join(model_dir, 'model.pt'), 'wb') as f:
-                    pickle.dump(model, f, pickle.HIGHEST_PROTOCOL)
-
-    print('\nfinal train loss:\n', train_loss)
-    print('final train accu:\n', train_acc)
+        train_dataloader = train_dataset.dataloader(batch_size=32, shuffle=True, num_workers=4)
+        model_dir = dataset_dir.replace('qml-data', 'qml-model')
+        train_twolevel_set(info, lambda e: train_dataloader, model_dir, continuous=False)
 
 
 '''two level + continuous, save model'''
@@ -373,60 +388,9 @@ def train_save_twolevel_continuous(folder: str):
         print(info)
         root_dir = os.path.join(dataset_dir, 'train')
         train_dataset = QuantumSensingDataset(root_dir)
-        train_dataloader = DataLoader(train_dataset, batch_size=32, shuffle=False, num_workers=4)
-        use_cuda = torch.cuda.is_available()
-        device = torch.device('cuda' if use_cuda else 'cpu')
-        n_qubits = info['sensor_num']
-        area = info['area']
-        area_length = area[1][0] - area[0][0]   # area is either the whole grid (level0) or a block (level1)
-        model = QuantumMLregression(n_wires=n_qubits).to(device)
-        n_epochs = 80
-        optimizer = optim.Adam(model.parameters(), lr=5e-3, weight_decay=1e-4)
-        scheduler = CosineAnnealingLR(optimizer, T_max=n_epochs)
-        
-        model.train()
-        train_loss = []
-        train_error = []
-        for e in range(n_epochs):
-            start = time.time()
-            loss_list = []
-            target_all = []
-            output_all = []
-            for _, sample in enumerate(train_dataloader):
-                thetas = sample['phase']
-                targets = sample['label'].to(device)
-                # preparing sensing data
-                qsensing = QuantumSensing(n_qubits=n_qubits, device=device)
-                q_device = qsensing(thetas)
-                # the model
-                outputs = model(q_device)
-                # compute loss, gradient, optimize ...
-                loss = F.mse_loss(outputs, targets)
-                optimizer.zero_grad()
-                loss.backward()
-                optimizer.step()
-                loss_list.append(loss.item())
-                target_all.append(targets)
-                output_all.append(outputs)
-            train_loss.append(np.mean(loss_list))
-            target_all = torch.cat(target_all)
-            output_all = torch.cat(output_all)
-            loc_error = compute_loc_error(output_all, target_all, area_length * Default.cell_length)
-            train_error.append(loc_error)
-            scheduler.step()
-            epoch_time = time.time() - start
-        
-            print(f'epoch={e}, time = {epoch_time:.2f}, train loss={train_loss[-1]:.4f}, train accuracy={train_error[-1]:.4f}')
-
-            if e % 10 == 9: # save a model every 10 epochs
-                model_dir = dataset_dir.replace('qml-data', 'qml-model')
-                if not os.path.exists(model_dir):
-                    os.makedirs(model_dir)
-                with open(os.path.join(model_dir, 'model.pt'), 'wb') as f:
-                    pickle.dump(model, f, pickle.HIGHEST_PROTOCOL)
-
-        print('\nfinal train loss:\n', train_loss)
-        print('final train accu:\n', train_error)
+        train_dataloader = train_dataset.dataloader(batch_size=32, shuffle=False, num_workers=4)
+        model_dir = dataset_dir.replace('qml-data', 'qml-model')
+        train_twolevel_set(info, lambda e: train_dataloader, model_dir, continuous=True)
 
 
 '''twolevel level + continuous, save model + ibm version'''
@@ -441,7 +405,7 @@ def train_save_twolevel_continuous_ibm(folder: str):
         print(info)
         root_dir = os.path.join(dataset_dir, 'train')
         train_dataset = QuantumSensingDataset(root_dir)
-        train_dataloader = DataLoader(train_dataset, batch_size=32, shuffle=True, num_workers=4)
+        train_dataloader = train_dataset.dataloader(batch_size=32, shuffle=True, num_workers=4)
         use_cuda = torch.cuda.is_available()
         device = torch.device('cuda' if use_cuda else 'cpu')
         n_qubits = info['sensor_num']
@@ -491,13 +455,43 @@ def train_save_twolevel_continuous_ibm(folder: str):
                 model_dir = dataset_dir.replace('qml-data', 'qml-model')
                 if not os.path.exists(model_dir):
                     os.makedirs(model_dir)
-                with open(os.path.join(model_dir, f'model.pt'), 'wb') as f:
-                    pickle.dump(model, f, pickle.HIGHEST_PROTOCOL)
+                ModelArtifact.save(model, os.path.join(model_dir, 'model.pt'))
 
         print('\nfinal train loss:\n', train_loss)
         print('final train accu:\n', train_error)
 
 
+'''two level + discrete/continuous, the training data is generated in memory every epoch, save model'''
+def train_save_twolevel_synthetic(grid_length: int, sensor_num: int, continuous: bool, seed: int = None,
+                                  samples_per_epoch: int = Default.synthetic_samples):
+    '''
+    Args:
+        grid_length       -- the grid length, the sensors are in sensordata/twolevel.{grid_length}x{grid_length}.{sensor_num}.json
+        sensor_num        -- the number of sensors
+        continuous        -- the continuous (regression) or the discrete (classification) case
+        seed              -- the seed of the training data, None for never repeating samples
+        samples_per_epoch -- the number of generated samples per epoch
+    '''
+    sensordata = f'sensordata/twolevel.{grid_length}x{grid_length}.{sensor_num}.json'
+    unitary_operator = UnitaryOperator(Default.pathloss_expo, Default.std, Default.power_ref)
+    ql = QuantumLocalization(grid_length=grid_length, cell_length=Default.cell_length, sensordata=sensordata,
+                             unitary_operator=unitary_operator)
+    prefix = 'c.' if continuous else ''
+    model_folder = os.path.join(os.getcwd(), 'qml-model', f'{prefix}{grid_length}x{grid_length}.{sensor_num}.two')
+    for level_ in ql.network.levels:
+        for set_ in ql.network.sets(level_):
+            info = ql.qml_info(level_, set_, continuous)
+            print(info)
+            train_dataset = ql.qml_synthetic_dataset(level_, set_, continuous, samples_per_epoch, batch_size=32, seed=seed)
+            train_dataloader = train_dataset.dataloader(num_workers=4)
+
+            def dataloader(e: int):
+                train_dataset.set_epoch(e)
+                return train_dataloader
+
+            train_twolevel_set(info, dataloader, os.path.join(model_folder, f'{level_}-{set_}'), continuous)
+
+
 '''for training qml one level'''
 def main1level(continuous: bool, ibm: bool = False):
     if ibm:
@@ -527,7 +521,11 @@ def main1level(continuous: bool, ibm: bool = False):
 
 
 '''for training qml two level'''
-def main2level(continuous: bool, ibm: bool):
+def main2level(continuous: bool, ibm: bool, synthetic: bool = False):
+    '''
+    Args:
+        synthetic -- generate the training data in memory instead of reading qml-data, same layouts as reading qml-data
+    '''
     if ibm:
         if continuous:
             length = 4
@@ -542,6 +540,9 @@ def main2level(continuous: bool, ibm: bool):
             # for length in [4,9,12,16]:
             length = 16
             for sen in [4,16]:
+                if synthetic:
+                    train_save_twolevel_synthetic(length, sen, continuous=True)
+                    continue
                 folder = os.path.join(os.getcwd(), 'qml-data', f'c.{length}x{length}.{sen}.two')
                 train_save_twolevel_continuous(folder)        
         else:
@@ -551,6 +552,9 @@ def main2level(continuous: bool, ibm: bool):
             # length = 16
             # sennum = [4, 16]
             # for sen in sennum:
+                if synthetic:
+                    train_save_twolevel_synthetic(length, sen, continuous=False)
+                    continue
                 folder = os.path.join(os.getcwd(), 'qml-data', f'{length}x{length}.{sen}.two')
                 train_save_twolevel(folder)
 
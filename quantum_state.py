@@ -11,7 +11,10 @@ class QuantumState:
        Using two-level quantum state, i.e., qubits
        One quantum sensor is represented by a single qubit quantum state
        N quantum sensor are represented by a N qubit quantum state
+       The density matrix (4^N complex numbers) is computed on the first access
     '''
+    __slots__ = ('_num_sensor', '_state_vector', '_density_matrix')
+
     def __init__(self, num_sensor: int, state_vector: np.array = None):
         '''
         Args:
@@ -20,7 +23,7 @@ class QuantumState:
         '''
         self._num_sensor = num_sensor
         self._state_vector = state_vector
-        self._density_matrix = np.outer(self._state_vector, np.conj(self._state_vector))
+        self._density_matrix = None
 
     @property
     def num_sensor(self):
@@ -33,10 +36,12 @@ class QuantumState:
     @state_vector.setter
     def state_vector(self, vector: np.array):
         self._state_vector = vector
-        self._density_matrix = np.outer(self._state_vector, np.conj(self._state_vector))
+        self._density_matrix = None
 
     @property
     def density_matrix(self):
+        if self._density_matrix is None:
+            self._density_matrix = np.outer(self._state_vector, np.conj(self._state_vector))
         return self._density_matrix
 
     def check_state(self):
@@ -70,13 +75,20 @@ class QuantumState:
     def evolve(self, operator: Operator):
         '''the evolution of a quantum state
         Args:
-            operator: describe the interaction of the environment, essentily a matrix
+            operator: describe the interaction of the environment, essentily a matrix.
+                      A 1-D np.array is the diagonal of a diagonal operator (e.g. Utility.rz_diagonal), applied elementwise
         '''
         dim = self._state_vector.shape[0]  # for N qubits, the dimension is 2**N
+        if isinstance(operator, np.ndarray) and operator.ndim == 1:
+            if dim != operator.shape[0]:
+                raise Exception('state_vector and operator dimension not equal')
+            self._state_vector = operator * self._state_vector
+            self._density_matrix = None
+            return
         operator_dim = np.product(operator.input_dims()) # for N qubits, the input_dims() return (2, 2, ..., 2), N twos.
         if dim == operator_dim:
             self._state_vector = np.dot(operator._data, self._state_vector)
-            self._density_matrix = np.outer(self._state_vector, np.conj(self._state_vector))
+            self._density_matrix = None
         else:
             raise Exception('state_vector and operator dimension not equal')
 
@@ -122,4 +134,120 @@ class QuantumState:
                 imag = float(imag[:-1].strip())
                 statevector.append(complex(real, imag))
         self._state_vector = np.array(statevector)
-        self._density_matrix = np.outer(self._state_vector, np.conj(self._state_vector))
+        self._density_matrix = None
+
+
+class StateBatch:
+    '''Encapsulate a batch of (pure) quantum states of the same number of sensors, as one (B, 2**num_sensor) array
+    '''
+    __slots__ = ('_num_sensor', '_state_vectors')
+
+    def __init__(self, num_sensor: int, state_vectors: np.array):
+        '''
+        Args:
+            num_sensor: number of sensor (i.e, detector)
+            state_vectors: shape (B, 2**num_sensor), one state vector per row
+        '''
+        state_vectors = np.atleast_2d(np.asarray(state_vectors))
+        if state_vectors.shape[1] != 2**num_sensor:
+            raise Exception('the dimension of the state vectors is not 2**num_sensor')
+        self._num_sensor = num_sensor
+        self._state_vectors = state_vectors
+
+    @classmethod
+    def from_phases(cls, phases: np.array) -> 'StateBatch':
+        '''the sensing states, i.e., tensor product RZ(phase_j)|+> over the sensors (the simple initial state evolved)
+        Args:
+            phases -- shape (B, N), the phase shifts at the N sensors
+        '''
+        phases = np.atleast_2d(np.asarray(phases, dtype=float))
+        return cls(phases.shape[1], Utility.rz_product_state(phases))
+
+    @classmethod
+    def from_states(cls, quantum_states: list) -> 'StateBatch':
+        '''stack a list of QuantumState
+        '''
+        return cls(quantum_states[0].num_sensor, np.array([qstate.state_vector for qstate in quantum_states]))
+
+    @staticmethod
+    def as_vectors(quantum_states) -> np.array:
+        '''the (B, d) state vectors of a StateBatch or of a list of QuantumState
+        '''
+        if isinstance(quantum_states, StateBatch):
+            return quantum_states.state_vectors
+        return np.array([qstate.state_vector for qstate in quantum_states])
+
+    @property
+    def num_sensor(self):
+        return self._num_sensor
+
+    @property
+    def state_vectors(self):
+        return self._state_vectors
+
+    @property
+    def density_matrices(self):
+        '''shape (B, d, d), not cached
+        '''
+        return np.einsum('bi,bj->bij', self._state_vectors, np.conj(self._state_vectors))
+
+    def __len__(self):
+        return len(self._state_vectors)
+
+    def __getitem__(self, index):
+        '''an integer index returns a QuantumState (sharing the memory), a slice or an index array returns a StateBatch
+        '''
+        if isinstance(index, (int, np.integer)):
+            return QuantumState(self._num_sensor, self._state_vectors[index])
+        return StateBatch(self._num_sensor, self._state_vectors[index])
+
+    def __iter__(self):
+        for state_vector in self._state_vectors:
+            yield QuantumState(self._num_sensor, state_vector)
+
+    def check_state(self) -> np.array:
+        '''check if the amplitudes norm_squared add up to one, for each state
+        Return:
+            np.array -- shape (B,), bool
+        '''
+        summ = np.sum(np.abs(self._state_vectors)**2, axis=1)
+        return np.abs(summ - 1) < Default.EPSILON
+
+    def normalize(self) -> 'StateBatch':
+        '''Normalize the state vectors
+        Return:
+            StateBatch -- the normalized states
+        '''
+        magnitude = np.sqrt(np.sum(np.abs(self._state_vectors)**2, axis=1, keepdims=True))
+        return StateBatch(self._num_sensor, self._state_vectors / magnitude)
+
+    def evolve(self, operator):
+        '''the evolution of the quantum states
+        Args:
+            operator: a 1-D np.array diagonal (see Utility.rz_diagonal) or an Operator, applied to every state;
+                      a (B, d) np.array of diagonals, or a list of B diagonals/Operators, one for each state
+        '''
+        dim = self._state_vectors.shape[1]
+        if isinstance(operator, list):
+            if all(isinstance(op, np.ndarray) and op.ndim == 1 for op in operator):
+                operator = np.array(operator)
+            else:
+                if len(operator) != len(self):
+                    raise Exception('the number of operators and states are not equal')
+                evolved = []
+                for state_vector, op in zip(self._state_vectors, operator):
+                    qstate = QuantumState(self._num_sensor, state_vector)
+                    qstate.evolve(op)
+                    evolved.append(qstate.state_vector)
+                self._state_vectors = np.array(evolved)
+                return
+        if isinstance(operator, np.ndarray):
+            if operator.shape[-1] != dim or operator.ndim > 2 or (operator.ndim == 2 and len(operator) != len(self)):
+                raise Exception('state_vector and operator dimension not equal')
+            self._state_vectors = operator * self._state_vectors
+            return
+        operator_dim = np.prod(operator.input_dims())
+        if dim == operator_dim:
+            self._state_vectors = self._state_vectors @ operator._data.T
+        else:
+            raise Exception('state_vector and operator dimension not equal')
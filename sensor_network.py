@@ -0,0 +1,173 @@
+'''
+The sensor network (layout of the sensors), compiled from the sensordata json file
+'''
+
+import os
+import json
+import numpy as np
+from typing import List
+
+
+class SensorNetwork:
+    '''Encapsulate the sensordata json file as numpy arrays.
+       The json file is {'info': str, 'sensors': {id: (x, y)}, 'levels': {level: {set: {'area', 'block_cell_ratio', 'sensors'}}}}
+       The compiled arrays are cached to a binary .npz file next to the json file
+    '''
+    def __init__(self, info: str, sensor_ids: np.array, coordinates: np.array, set_levels: np.array, set_names: np.array,
+                 set_offsets: np.array, set_sensors: np.array, areas: np.array, block_cell_ratios: np.array):
+        '''
+        Args:
+            info              -- the description of the sensordata
+            sensor_ids        -- shape (M,), the id of the sensors
+            coordinates       -- shape (M, 2), the (x, y) location of the sensors, in the unit of grid cell
+            set_levels        -- shape (S,), the level of each set, e.g., 'level-0'
+            set_names         -- shape (S,), the name of each set, e.g., 'set-0'
+            set_offsets       -- shape (S+1,), set i has sensors set_sensors[set_offsets[i]: set_offsets[i+1]]
+            set_sensors       -- the concatenated sensor ids of all sets
+            areas             -- shape (S, 2, 2), the top left and bottom right corners of each set's area
+            block_cell_ratios -- shape (S,), the ratio of block to cell in length of each set
+        '''
+        self.info = info
+        self.sensor_ids = sensor_ids
+        self.coordinates = coordinates
+        self.set_levels = set_levels
+        self.set_names = set_names
+        self.set_offsets = set_offsets
+        self.set_sensors = set_sensors
+        self.areas = areas
+        self.block_cell_ratios = block_cell_ratios
+        self._row = {int(sensor_id): row for row, sensor_id in enumerate(sensor_ids)}  # sensor id --> row in coordinates
+        self._set = {(str(level), str(set_)): i for i, (level, set_) in enumerate(zip(set_levels, set_names))}
+
+    @property
+    def num_sensor(self):
+        return len(self.sensor_ids)
+
+    @property
+    def levels(self) -> List[str]:
+        '''the levels in the order of the json file
+        '''
+        levels = []
+        for level in self.set_levels:
+            if str(level) not in levels:
+                levels.append(str(level))
+        return levels
+
+    def sets(self, level: str) -> List[str]:
+        '''the sets of a level in the order of the json file
+        '''
+        return [str(set_) for lev, set_ in zip(self.set_levels, self.set_names) if lev == level]
+
+    def level_areas(self, level: str) -> np.array:
+        '''the areas of all the sets of a level, in the same order as sets(level)
+        Return:
+            np.array -- shape (number of sets, 2, 2)
+        '''
+        return self.areas[self.set_levels == level]
+
+    def _set_index(self, level: str, set_: str) -> int:
+        try:
+            return self._set[(level, set_)]
+        except KeyError:
+            raise Exception(f'{level}-{set_} does not exist in the sensor network')
+
+    def sensors(self, level: str, set_: str) -> np.array:
+        '''the sensor ids of a set
+        '''
+        i = self._set_index(level, set_)
+        return self.set_sensors[self.set_offsets[i]:self.set_offsets[i+1]]
+
+    def area(self, level: str, set_: str) -> list:
+        '''the area of a set, [top left, bottom right]
+        '''
+        return self.areas[self._set_index(level, set_)].tolist()
+
+    def block_cell_ratio(self, level: str, set_: str) -> int:
+        return int(self.block_cell_ratios[self._set_index(level, set_)])
+
+    def sensor_coordinates(self, sensors: list = None) -> np.array:
+        '''the coordinates of some sensors
+        Args:
+            sensors -- a list of sensor ids. If None, all sensors
+        Return:
+            np.array -- shape (len(sensors), 2)
+        '''
+        if sensors is None:
+            return self.coordinates
+        return self.coordinates[[self._row[int(sensor_id)] for sensor_id in sensors]]
+
+    def distances(self, txs: np.array, sensors: list = None, cell_length: float = 1) -> np.array:
+        '''the pairwise distances between the TX locations and the sensors
+        Args:
+            txs         -- tx locations, shape (T, 2)
+            sensors     -- a list of sensor ids. If None, all sensors
+            cell_length -- the length of a grid cell
+        Return:
+            np.array -- shape (T, len(sensors))
+        '''
+        txs = np.asarray(txs, dtype=float).reshape(-1, 2)
+        rxs = self.sensor_coordinates(sensors)
+        return cell_length * np.sqrt(((txs[:, np.newaxis, :] - rxs[np.newaxis, :, :]) ** 2).sum(axis=2))
+
+    @classmethod
+    def from_dict(cls, sensordata: dict) -> 'SensorNetwork':
+        '''compile the json dictionary
+        '''
+        sensor_ids = np.array([int(sensor_id) for sensor_id in sensordata['sensors']], dtype=np.int64)
+        coordinates = np.array(list(sensordata['sensors'].values()), dtype=float).reshape(-1, 2)
+        set_levels, set_names, set_offsets, set_sensors, areas, block_cell_ratios = [], [], [0], [], [], []
+        for level, sets in sensordata['levels'].items():
+            for set_, set_data in sets.items():
+                set_levels.append(level)
+                set_names.append(set_)
+                set_sensors.extend(set_data['sensors'])
+                set_offsets.append(len(set_sensors))
+                areas.append(set_data['area'])
+                block_cell_ratios.append(set_data['block_cell_ratio'])
+        return cls(sensordata.get('info', ''), sensor_ids, coordinates, np.array(set_levels), np.array(set_names),
+                   np.array(set_offsets, dtype=np.int64), np.array(set_sensors, dtype=np.int64), np.array(areas).reshape(-1, 2, 2),
+                   np.array(block_cell_ratios, dtype=np.int64))
+
+    @staticmethod
+    def cache_filename(filename: str) -> str:
+        '''the .npz cache is next to the json file
+        '''
+        return os.path.splitext(filename)[0] + '.npz'
+
+    def save(self, filename: str, source_stat: os.stat_result):
+        '''save the compiled arrays to a .npz file
+        Args:
+            filename    -- the .npz filename
+            source_stat -- the os.stat of the json file, to detect a stale cache
+        '''
+        tmp_file = f'{filename}.{os.getpid()}.tmp'   # write then rename, other processes may be loading the cache
+        with open(tmp_file, 'wb') as f:
+            np.savez(f, info=np.array(self.info), sensor_ids=self.sensor_ids, coordinates=self.coordinates,
+                     set_levels=self.set_levels, set_names=self.set_names, set_offsets=self.set_offsets, set_sensors=self.set_sensors,
+                     areas=self.areas, block_cell_ratios=self.block_cell_ratios,
+                     source=np.array([source_stat.st_mtime_ns, source_stat.st_size], dtype=np.int64))
+        os.replace(tmp_file, filename)
+
+    @classmethod
+    def load(cls, filename: str, cache: bool = True) -> 'SensorNetwork':
+        '''load the sensor network from the sensordata json file, through the .npz cache if it is up to date
+        Args:
+            filename -- the sensordata json filename
+            cache    -- whether to read/write the .npz cache
+        '''
+        cache_file = cls.cache_filename(filename)
+        stat = os.stat(filename)
+        if cache and os.path.exists(cache_file):
+            with np.load(cache_file) as npz:
+                mtime_ns, size = npz['source']
+                if mtime_ns == stat.st_mtime_ns and size == stat.st_size:
+                    return cls(str(npz['info']), npz['sensor_ids'], npz['coordinates'], npz['set_levels'], npz['set_names'],
+                               npz['set_offsets'], npz['set_sensors'], npz['areas'], npz['block_cell_ratios'])
+        with open(filename, 'r') as f:
+            network = cls.from_dict(json.load(f))
+        if cache:
+            try:
+                network.save(cache_file, stat)
+            except OSError:
+                pass   # e.g. read-only directory, the cache is optional
+        return network
@@ -0,0 +1,30 @@
+'''tests of the closed-form overlaps, run with python -m pytest test_overlap_kernel.py
+'''
+
+import numpy as np
+from overlap_kernel import OverlapKernel
+from utility import Utility
+
+
+def test_overlaps_equal_inner_products():
+    rng = np.random.default_rng(0)
+    phases_a = rng.uniform(0, 2 * np.pi, size=(5, 4))
+    phases_b = rng.uniform(0, 2 * np.pi, size=(3, 4))
+    inner = np.conj(Utility.rz_product_state(phases_a)) @ Utility.rz_product_state(phases_b).T
+    assert np.allclose(OverlapKernel.overlaps(phases_a, phases_b), inner.real)
+    assert np.allclose(inner.imag, 0)
+
+
+def test_overlaps_in_chunks(monkeypatch):
+    rng = np.random.default_rng(1)
+    phases_a = rng.uniform(0, 2 * np.pi, size=(7, 3))
+    phases_b = rng.uniform(0, 2 * np.pi, size=(4, 3))
+    expected = OverlapKernel.overlaps(phases_a, phases_b)
+    monkeypatch.setattr(OverlapKernel, 'max_elements', 12)   # one row of A at a time
+    assert np.allclose(OverlapKernel.overlaps(phases_a, phases_b), expected)
+
+
+def test_gram_unit_diagonal():
+    gram = OverlapKernel.gram(np.random.default_rng(2).uniform(0, 2 * np.pi, size=(6, 5)))
+    assert np.allclose(np.diag(gram), 1)
+    assert np.allclose(gram, gram.T)
@@ -0,0 +1,57 @@
+'''tests of the pretty good measurement solvers, run with python -m pytest test_povm.py
+'''
+
+import numpy as np
+import pytest
+
+pytest.importorskip('cvxpy')
+pytest.importorskip('qiskit')
+from povm import Povm
+from quantum_state import StateBatch
+
+
+def random_phases(num_hypothesis: int, num_sensor: int, seed: int = 0) -> np.array:
+    return np.random.default_rng(seed).uniform(0, 2 * np.pi, size=(num_hypothesis, num_sensor))
+
+
+def pretty_good(phases: np.array, solver: str) -> Povm:
+    priors = [1 / len(phases)] * len(phases)
+    povm = Povm()
+    if solver == 'overlap':
+        povm.pretty_good_measurement_overlap(phases, priors)
+    else:
+        povm.pretty_good_measurement(StateBatch.from_phases(phases), priors, debug=False, solver=solver)
+    return povm
+
+
+@pytest.mark.parametrize('num_hypothesis', [4, 6])   # K = 2^N uses the Gram matrix in the thin solver, K > 2^N uses rho
+def test_solvers_give_the_same_povm(num_hypothesis: int):
+    phases = random_phases(num_hypothesis, 2)
+    dense = pretty_good(phases, 'dense').elements
+    for solver in ['thin', 'overlap']:
+        assert np.allclose(pretty_good(phases, solver).elements, dense, atol=1e-8), solver
+
+
+@pytest.mark.parametrize('solver', ['dense', 'thin', 'overlap'])
+def test_elements_sum_to_identity(solver: str):
+    phases = random_phases(6, 2, seed=1)   # rho has full rank
+    summ = pretty_good(phases, solver).elements.sum(axis=0)
+    assert np.allclose(summ, np.eye(4), atol=1e-8)
+
+
+@pytest.mark.parametrize('solver', ['thin', 'overlap'])
+def test_rank_deficient_sum_to_projector(solver: str):
+    phases = random_phases(3, 3, seed=2)   # 3 hypotheses in 8 dimensions
+    summ = pretty_good(phases, solver).elements.sum(axis=0)
+    states = StateBatch.from_phases(phases).state_vectors.T          # (8, 3)
+    basis, _ = np.linalg.qr(states)
+    assert np.allclose(summ, basis @ np.conj(basis).T, atol=1e-8)
+
+
+def test_train_pretty_good_overlap_equals_thin():
+    phases = random_phases(5, 3, seed=3)
+    priors = [0.2] * 5
+    thin = Povm.train_pretty_good(phases, priors, overlap=False)
+    overlap = Povm.train_pretty_good(phases, priors, overlap=True)
+    states = StateBatch.from_phases(random_phases(7, 3, seed=4))
+    assert np.allclose(thin.probabilities(states), overlap.probabilities(states), atol=1e-8)
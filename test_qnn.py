@@ -0,0 +1,47 @@
+'''tests of the QML sensing encoder, run with python -m pytest test_qnn.py
+'''
+
+import numpy as np
+import pytest
+
+torch = pytest.importorskip('torch')
+tq = pytest.importorskip('torchquantum')
+tqf = pytest.importorskip('torchquantum.functional')
+from qnn import QuantumSensing
+
+
+def sensing_per_gate(thetas: torch.Tensor) -> torch.Tensor:
+    '''the states of the per gate QuantumSensing.forward before the vectorization: H then RZ(theta_j) on every wire j
+    '''
+    n_wires = thetas.shape[1]
+    states = []
+    for sample in thetas:
+        q_device = tq.QuantumDevice(n_wires=n_wires, bsz=1)
+        for j in range(n_wires):
+            tqf.h(q_device, wires=j)
+        for j, theta in enumerate(sample):
+            tq.RZ(has_params=True, init_params=theta.item())(q_device, wires=j)
+        states.append(q_device.states)
+    return torch.cat(states)
+
+
+@pytest.mark.parametrize('n_qubits', [1, 3, 4])
+def test_vectorized_forward_equals_per_gate(n_qubits: int):
+    rng = np.random.default_rng(0)
+    thetas = torch.tensor(rng.uniform(-np.pi, np.pi, size=(5, n_qubits)), dtype=torch.float32)
+    q_device = QuantumSensing(n_qubits=n_qubits, device=torch.device('cpu'))(thetas)
+    expected = sensing_per_gate(thetas)
+    assert q_device.states.shape == expected.shape
+    assert torch.allclose(q_device.states, expected.to(q_device.states.dtype), atol=1e-5)
+
+
+def test_forward_accepts_a_list():
+    thetas = [[0.1, -0.7, 2.0], [1.5, 0.0, -3.0]]
+    from_list = QuantumSensing(n_qubits=3, device=torch.device('cpu'))(thetas).states
+    from_tensor = QuantumSensing(n_qubits=3, device=torch.device('cpu'))(torch.tensor(thetas)).states
+    assert torch.allclose(from_list, from_tensor)
+
+
+def test_wrong_number_of_thetas():
+    with pytest.raises(Exception):
+        QuantumSensing(n_qubits=3, device=torch.device('cpu'))([[0.1, 0.2]])
@@ -0,0 +1,46 @@
+'''tests of the numeric utilities, run with python -m pytest test_utility.py
+'''
+
+import numpy as np
+from functools import reduce
+from scipy.linalg import expm
+from utility import Utility
+
+
+def rz_product_state_kron(phases: np.array) -> np.array:
+    '''the sensing state by the dense operators: the kron of expm(-i * Z/2 * phase) applied to |+>^N
+    '''
+    pauliz_half = np.array([[0.5, 0], [0, -0.5]])
+    operator = reduce(np.kron, [expm(-1j * pauliz_half * phase) for phase in phases])
+    plus = np.ones(2**len(phases)) / np.sqrt(2**len(phases))
+    return operator @ plus
+
+
+def test_rz_product_state_equals_kron():
+    phases = np.random.default_rng(0).uniform(0, 2 * np.pi, size=(4, 3))
+    states = Utility.rz_product_state(phases)
+    for phase, state in zip(phases, states):
+        assert np.allclose(state, rz_product_state_kron(phase))
+    assert np.allclose(Utility.rz_product_state(phases[0]), rz_product_state_kron(phases[0]))
+
+
+class _FixedPick:
+    '''a random generator whose uniform() always returns value'''
+    def __init__(self, value: float):
+        self.value = value
+
+    def uniform(self, low, high, size):
+        return np.full(size, self.value)
+
+
+def test_sample_outcomes_row_boundary():
+    probs = np.array([[0.2, 0.3, 0.5], [0.5, 0.5, 0.0], [0.0, 0.4, 0.6]])
+    assert Utility.sample_outcomes(probs, _FixedPick(0.0)).tolist() == [0, 0, 0]
+    assert Utility.sample_outcomes(probs, _FixedPick(1.0)).tolist() == [2, 1, 2]
+    assert Utility.sample_outcomes(probs, _FixedPick(0.5)).tolist() == [1, 0, 2]
+
+
+def test_sample_outcomes_distribution():
+    probs = np.tile([0.1, 0.6, 0.3], (20000, 1))
+    outcomes = Utility.sample_outcomes(probs, np.random.default_rng(0))
+    assert np.allclose(np.bincount(outcomes, minlength=3) / len(outcomes), [0.1, 0.6, 0.3], atol=0.01)
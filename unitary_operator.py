@@ -13,9 +13,10 @@ from default import Default
 
 
 class UnitaryOperator:
-    def __init__(self, alpha: float, std: float, power_reference: float):
+    def __init__(self, alpha: float, std: float, power_reference: float, E_noise_perc: float = Default.E_noise_perc):
         self._alpha = alpha                                 # the alpha in the propagation model
         self._std = std                                     # the std in the propagation model
+        self._E_noise_perc = E_noise_perc                   # the electric field noise in percentage (%), for the Hamiltonian model
         self._power_reference = power_reference             # the RF signal's power at 1 meters
         self._frequency = Default.frequency                 # the RF signal's carrier frequency
         self._sensing_time = Default.sensing_time           # sensing time in seconds
@@ -33,6 +34,15 @@ class UnitaryOperator:
     def power_reference(self):
         return self._power_reference
 
+    @property
+    def E_noise_perc(self):
+        return self._E_noise_perc
+
+    def is_deterministic(self, noise: bool = True) -> bool:
+        '''whether compute_H() / compute_H_batch() return the same phase shift every time for the same distance
+        '''
+        return not noise or self._E_noise_perc == 0
+
     # @property
     # def frequency(self):
     #     return self._frequency
@@ -103,18 +113,8 @@ class UnitaryOperator:
             phase shift      -- the phase shift at the RF-Photonic senser
             unitary_operator -- the effect of the RF wave on the qubit at of the RF-Phonotic sensor
         '''
-        def dist_modify(distance: float) -> float:
-            return max(distance, 1)
-        
-        c = 2 * np.pi / (Default.power_ref - Default.noise_floor)
-        freespace = 10 * self.alpha * math.log10(dist_modify(distance))
-        if noise:
-            shadowing = np.random.normal(0, self.std)
-            power = self._power_reference - freespace + shadowing
-        else:
-            power = self._power_reference - freespace
-        power_scaled = max(power - Default.noise_floor, 0)     # power cannot be lower than noise floor
-        phase_shift = c * power_scaled
+        phase_shift, _ = self.compute_batch(distance, noise)
+        phase_shift = float(phase_shift)
         generator = np.array([[0.5, 0], [0, -0.5]])            # half of Pauli z matrix
         exponent = -complex(0, 1) * generator * phase_shift
         unitary_operator = expm(exponent)
@@ -130,27 +130,27 @@ class UnitaryOperator:
             phase shift      -- the phase shift at the RF-Photonic senser
             unitary_operator -- the effect of the RF wave on the qubit at of the RF-Phonotic sensor
         '''
-        def dist_modify(distance: float) -> float:
-            return max(distance, 1)
-        
-        c = 2 * (np.pi - Default.alpha_nf_q) / (Default.power_ref - Default.noise_floor_q)
-        freespace = 10 * self.alpha * math.log10(dist_modify(distance))
-        if noise:
-            shadowing = np.random.normal(0, self.std)
-            power = min(self._power_reference - freespace + shadowing, self._power_reference)
-        else:
-            power = self._power_reference - freespace
-        if qsensor:
-            power_sensed = max(power - Default.noise_floor_q, 0)     # power cannot be lower than noise floor
-        else:
-            power_sensed = max(power - Default.noise_floor, 0) + (Default.noise_floor - Default.noise_floor_q)
-        phase_shift = c * power_sensed + Default.alpha_nf_q
+        phase_shift, _ = self.compute_new_batch(distance, noise, qsensor)
+        phase_shift = float(phase_shift)
         generator = np.array([[0.5, 0], [0, -0.5]])            # half of Pauli z matrix
         exponent = -complex(0, 1) * generator * phase_shift
         unitary_operator = expm(exponent)
         return phase_shift, unitary_operator
 
 
+    def compute_H_phase(self, distance: float, noise: bool = False) -> float:
+        '''the phase shift of compute_H only, without building the unitary operator through expm
+           the unitary operator is exp(-i * Z/2 * phase_shift), i.e., diag(e^{-i*phase_shift/2}, e^{i*phase_shift/2})
+        Args:
+            distance -- the distance between the TX and RX
+            noise    -- whether consider the shadowing effect
+        Return:
+            phase shift      -- the phase shift at the RF-Photonic senser
+        '''
+        phase_shift, _ = self.compute_H_batch(distance, noise)
+        return float(phase_shift)
+
+
     def compute_H(self, distance: float, noise: bool = False) -> Tuple[float, np.array]:
         '''this version is based on Hamiltonian
         Args:
@@ -160,15 +160,100 @@ class UnitaryOperator:
             phase shift      -- the phase shift at the RF-Photonic senser
             unitary_operator -- the effect of the RF wave on the qubit at of the RF-Phonotic sensor
         '''
-        def dist_modify(distance: float) -> float:
-            return max(distance, Default.cell_length / 2)
-        
+        phase_shift = self.compute_H_phase(distance, noise)
+        pauliz_half = np.array([[0.5, 0], [0, -0.5]])            # half of Pauli z matrix
+        exponent = -complex(0, 1) * pauliz_half * phase_shift
+        unitary_operator = expm(exponent)
+        return phase_shift, unitary_operator
+
+
+    @staticmethod
+    def rz_unitary_batch(phase_shift: np.array) -> np.array:
+        '''the unitary operators exp(-i * Z/2 * phase_shift) stacked, without expm
+        Args:
+            phase_shift -- an array of phase shifts of any shape
+        Return:
+            np.array -- an array of shape phase_shift.shape + (2, 2)
+        '''
+        phase_shift = np.asarray(phase_shift)
+        unitary_operator = np.zeros(phase_shift.shape + (2, 2), dtype=complex)
+        unitary_operator[..., 0, 0] = np.exp(-0.5j * phase_shift)
+        unitary_operator[..., 1, 1] = np.exp(0.5j * phase_shift)
+        return unitary_operator
+
+
+    def compute_batch(self, distance: np.array, noise: bool = False, rng: np.random.Generator = None,
+                      unitary: bool = False) -> Tuple[np.array, np.array]:
+        '''the vectorized version of compute()
+        Args:
+            distance -- an array of distances between the TX and RX, any shape
+            noise    -- whether consider the shadowing effect
+            rng      -- the random generator for the noise. If None, use the global np.random
+            unitary  -- whether also return the stacked unitary operators
+        Return:
+            phase shift      -- an array of phase shifts, same shape as distance
+            unitary_operator -- an array of shape distance.shape + (2, 2) if unitary is True, otherwise None
+        '''
+        rng = np.random if rng is None else rng
+        distance = np.asarray(distance, dtype=float)
+        c = 2 * np.pi / (Default.power_ref - Default.noise_floor)
+        freespace = 10 * self.alpha * np.log10(np.maximum(distance, 1))
+        power = self._power_reference - freespace
+        if noise:
+            power = power + rng.normal(0, self.std, size=distance.shape)
+        power_scaled = np.maximum(power - Default.noise_floor, 0)    # power cannot be lower than noise floor
+        phase_shift = c * power_scaled
+        return phase_shift, self.rz_unitary_batch(phase_shift) if unitary else None
+
+
+    def compute_new_batch(self, distance: np.array, noise: bool = False, qsensor: bool = True, rng: np.random.Generator = None,
+                          unitary: bool = False) -> Tuple[np.array, np.array]:
+        '''the vectorized version of compute_new()
+        Args:
+            distance -- an array of distances between the TX and RX, any shape
+            noise    -- whether consider the shadowing effect
+            rng      -- the random generator for the noise. If None, use the global np.random
+            unitary  -- whether also return the stacked unitary operators
+        Return:
+            phase shift      -- an array of phase shifts, same shape as distance
+            unitary_operator -- an array of shape distance.shape + (2, 2) if unitary is True, otherwise None
+        '''
+        rng = np.random if rng is None else rng
+        distance = np.asarray(distance, dtype=float)
+        c = 2 * (np.pi - Default.alpha_nf_q) / (Default.power_ref - Default.noise_floor_q)
+        freespace = 10 * self.alpha * np.log10(np.maximum(distance, 1))
+        power = self._power_reference - freespace
+        if noise:
+            shadowing = rng.normal(0, self.std, size=distance.shape)
+            power = np.minimum(power + shadowing, self._power_reference)
+        if qsensor:
+            power_sensed = np.maximum(power - Default.noise_floor_q, 0)     # power cannot be lower than noise floor
+        else:
+            power_sensed = np.maximum(power - Default.noise_floor, 0) + (Default.noise_floor - Default.noise_floor_q)
+        phase_shift = c * power_sensed + Default.alpha_nf_q
+        return phase_shift, self.rz_unitary_batch(phase_shift) if unitary else None
+
+
+    def compute_H_batch(self, distance: np.array, noise: bool = False, rng: np.random.Generator = None,
+                        unitary: bool = False) -> Tuple[np.array, np.array]:
+        '''the vectorized version of compute_H()
+        Args:
+            distance -- an array of distances between the TX and RX, any shape
+            noise    -- whether consider the (percentage) noise of the electric field
+            rng      -- the random generator for the noise. If None, use the global np.random
+            unitary  -- whether also return the stacked unitary operators
+        Return:
+            phase shift      -- an array of phase shifts, same shape as distance
+            unitary_operator -- an array of shape distance.shape + (2, 2) if unitary is True, otherwise None
+        '''
+        rng = np.random if rng is None else rng
+        distance = np.asarray(distance, dtype=float)
         T = 1 / self._frequency  # time period of a cycle
-        E = np.sqrt(30 * Default.tx_power) / (dist_modify(distance))  # electric field
+        E = np.sqrt(30 * Default.tx_power) / np.maximum(distance, Default.cell_length / 2)  # electric field
         if noise:
             # percentage noise
-            rand = np.random.uniform(100 - Default.E_noise_perc, 100 + Default.E_noise_perc) / 100
-            E *= rand
+            rand = rng.uniform(100 - self._E_noise_perc, 100 + self._E_noise_perc, size=distance.shape) / 100
+            E = E * rand
 
         n = self._sensing_time / T
         # to make 5 meters distance have a phase shift of 2pi
@@ -176,11 +261,7 @@ class UnitaryOperator:
         gamma = (np.pi**2 * constants.h) / (E_5 * self._sensing_time)
         phi_T = 2 / (np.pi * constants.h) * gamma * E * T
         phase_shift = n * phi_T
-        pauliz_half = np.array([[0.5, 0], [0, -0.5]])            # half of Pauli z matrix
-        exponent = -complex(0, 1) * pauliz_half * phase_shift
-        unitary_operator = expm(exponent)
-        return phase_shift, unitary_operator
-
+        return phase_shift, self.rz_unitary_batch(phase_shift) if unitary else None
 
 
 def main1():
@@ -47,6 +47,73 @@ class Utility:
         return length * np.sqrt((loc1[0] - loc2[0]) ** 2 + (loc1[1] - loc2[1]) ** 2)
 
 
+    @staticmethod
+    def rz_diagonal(phases: np.array) -> np.array:
+        '''the diagonal of the tensor product of RZ-type unitary operators, exp(-i * Z/2 * phase) for each sensor
+           equals to np.diag(np.kron(np.kron(U_0, U_1), ..., U_{N-1})), but in O(N*2^N) and without the dense matrix
+        Args:
+            phases -- the phase shifts, shape (N,) or (B, N) for a batch. The first sensor is the most significant qubit
+        Return:
+            np.array -- a complex array of shape (2**N,) or (B, 2**N)
+        '''
+        phases = np.asarray(phases, dtype=float)
+        batch_shape = phases.shape[:-1]
+        diagonal = np.ones(batch_shape + (1,), dtype=complex)
+        for j in range(phases.shape[-1]):
+            single = np.stack([np.exp(-0.5j * phases[..., j]), np.exp(0.5j * phases[..., j])], axis=-1)
+            diagonal = (diagonal[..., :, np.newaxis] * single[..., np.newaxis, :]).reshape(batch_shape + (-1,))
+        return diagonal
+
+
+    @staticmethod
+    def rz_product_state(phases: np.array) -> np.array:
+        '''the state vector of tensor product RZ(phase_j)|+>, i.e., the simple initial state evolved by the sensors
+        Args:
+            phases -- the phase shifts, shape (N,) or (B, N) for a batch
+        Return:
+            np.array -- a complex array of shape (2**N,) or (B, 2**N)
+        '''
+        phases = np.asarray(phases, dtype=float)
+        return Utility.rz_diagonal(phases) / np.sqrt(2**phases.shape[-1])
+
+
+    @staticmethod
+    def sample_outcomes(probs: np.array, rng: np.random.Generator = None) -> np.array:
+        '''vectorized inverse-CDF sampling, one outcome for each row of probs.
+           For each row, equals to bisect_left(cumulate, np.random.uniform(0, cumulate[-1]))
+        Args:
+            probs -- shape (B, K), non-negative, each row does not need to sum up to one
+            rng   -- the random generator. If None, use the global np.random
+        Return:
+            np.array -- shape (B,), the index of the sampled outcome of each row
+        '''
+        rng = np.random if rng is None else rng
+        B, K = probs.shape
+        cumulate = np.cumsum(probs, axis=1)
+        cumulate /= cumulate[:, -1:]
+        pick = rng.uniform(0, 1, size=B)
+        offset = np.arange(B)           # shift row i to [i, i+1], so that all rows are searched in one flat sorted array
+        index = np.searchsorted((cumulate + offset[:, np.newaxis]).ravel(), pick + offset, side='left') - offset * K
+        return np.clip(index, 0, K - 1)    # a pick of 0 finds the end of the previous row (-1), rounding can overshoot K - 1
+
+
+    @staticmethod
+    def wilson_interval(count: int, total: int, z: float) -> tuple:
+        '''the Wilson score interval of a binomial proportion, which behaves well when count is close to 0 or total
+        Args:
+            count -- the number of successes (e.g. errors)
+            total -- the number of trials
+            z     -- the standard normal quantile of the confidence level, e.g. 1.96 for 95%
+        Return:
+            (lower bound, upper bound)
+        '''
+        p = count / total
+        denominator = 1 + z**2 / total
+        center = (p + z**2 / (2 * total)) / denominator
+        half = z * np.sqrt(p * (1 - p) / total + z**2 / (4 * total**2)) / denominator
+        return float(max(0., center - half)), float(min(1., center + half))
+
+
     @staticmethod
     def check_zero(matrix) -> bool:
         '''check if a matrix contains all zero entries